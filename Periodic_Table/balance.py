@@ -0,0 +1,353 @@
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from math import gcd, lcm
+
+from formula import parse_formula, composition_matrix, import_numpy
+
+# Arrows that separate the reactants from the products, e.g. 'H2 + O2 -> H2O'
+ARROW = re.compile(r'\s*(?:->|=>|→|=)\s*')
+# A coefficient written in front of a formula, e.g. the 2 in '2 H2O'
+COEFFICIENT = re.compile(r'^\d+\s*')
+# How elements occur on their own, for formation reactions; the rest are single atoms
+ELEMENTAL_FORMS = {'H': 'H2', 'N': 'N2', 'O': 'O2', 'F': 'F2', 'Cl': 'Cl2', 'Br': 'Br2',
+                   'I': 'I2', 'P': 'P4', 'S': 'S8'}
+
+# Reactions balanced together by balance_many, when NumPy is installed
+BLOCK_SIZE = 1024
+# Numbers in a block stay below this, so multiplying two can't overflow int64;
+# reactions that outgrow it are balanced again with Python's unbounded ints
+SAFE_ENTRY = 2 ** 31
+
+# How many ways of writing reactions canonical_reaction remembers
+CANONICAL_CACHE_SIZE = 65536
+# How many canonical reactions' answers balanced keeps
+BALANCED_CACHE_SIZE = 65536
+
+# Balanced coefficients (or the reason there are none) for the canonical
+# reactions used most recently, shared by balance and balance_many
+balanced = OrderedDict()
+
+
+def parse_reaction(text):
+    # Split 'H2 + O2 -> H2O' into the reactant and product formulas.
+    # Coefficients already written in are dropped, since they get worked out again.
+    sides = ARROW.split(text.strip())
+    if len(sides) != 2:
+        raise ValueError(f"A reaction needs one arrow, like 'H2 + O2 -> H2O': {text!r}")
+    reactants, products = ([COEFFICIENT.sub('', part.strip()) for part in side.split('+')]
+                           for side in sides)
+    if not all(reactants) or not all(products):
+        raise ValueError(f"Missing formula in reaction {text!r}")
+    return tuple(reactants), tuple(products)
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_reaction(reactants, products):
+    # The same reaction whatever order the formulas are given in, and either
+    # way round: each side sorted, the smaller side first. Returns the key and
+    # where each given formula (reactants, then products) is in it.
+    # reactants and products are tuples; a batch often repeats a reaction
+    # written the same way, so this is memoized too.
+    left, right = tuple(sorted(reactants)), tuple(sorted(products))
+    if len(set(left)) < len(left) or len(set(right)) < len(right):
+        raise ValueError("A formula is given twice on the same side of the reaction")
+    if right < left:
+        first, second = products, reactants
+        left, right = right, left
+    else:
+        first, second = reactants, products
+    place = {formula: i for i, formula in enumerate(left)}
+    place_right = {formula: len(left) + i for i, formula in enumerate(right)}
+    positions = [place[formula] for formula in first] + [place_right[formula] for formula in second]
+    if first is products:
+        positions = positions[len(products):] + positions[:len(products)]
+    return (left, right), tuple(positions)
+
+
+def reaction_rows(key):
+    # The composition matrix of a canonical reaction without NumPy: one row
+    # per element and one column per formula, products counted negative
+    left, right = key
+    compositions = [dict(parse_formula(formula)) for formula in left + right]
+    symbols = sorted({symbol for composition in compositions for symbol in composition})
+    return [[composition.get(symbol, 0) * (1 if i < len(left) else -1)
+             for i, composition in enumerate(compositions)] for symbol in symbols]
+
+
+def nullspace(rows, columns):
+    # A basis of the vectors x with rows · x = 0, in exact rational arithmetic
+    # kept as whole numbers: Gauss-Jordan elimination where each row is scaled
+    # rather than divided (then reduced by its gcd), so nothing is ever rounded,
+    # and no Fraction objects are needed, which were most of the time taken.
+    rows = [row for row in rows if any(row)]
+    pivots = []
+    for column in range(columns):
+        r = len(pivots)
+        if r == len(rows):
+            break
+        pivot = next((i for i in range(r, len(rows)) if rows[i][column]), None)
+        if pivot is None:
+            continue
+        rows[r], rows[pivot] = rows[pivot], rows[r]
+        pivot_row = rows[r]
+        p = pivot_row[column]
+        for i, row in enumerate(rows):
+            factor = row[column]
+            if i != r and factor:
+                row = [a * p - b * factor for a, b in zip(row, pivot_row)]
+                divisor = gcd(*row)
+                rows[i] = [a // divisor for a in row] if divisor > 1 else row
+        pivots.append(column)
+    # One basis vector per column without a pivot: the pivot columns take
+    # whatever cancels it. Each pivot row gives its column as a fraction, so
+    # everything is scaled by the pivots' lcm to keep whole numbers.
+    scale = lcm(*(row[column] for row, column in zip(rows, pivots)))
+    basis = []
+    for free in range(columns):
+        if free in pivots:
+            continue
+        vector = [0] * columns
+        vector[free] = scale
+        for row, column in zip(rows, pivots):
+            vector[column] = -row[free] * scale // row[column]
+        basis.append(vector)
+    return basis
+
+
+def solve(key, rows):
+    # The smallest whole coefficients that balance a canonical reaction, from
+    # its composition matrix. Raises ValueError if there are none, or if it
+    # balances in more than one independent way. The message is only the
+    # reason, since the key is the reaction reordered; balance adds the
+    # reaction as the caller wrote it.
+    left, right = key
+    basis = nullspace(rows, len(left) + len(right))
+    if not basis:
+        raise ValueError("can't be balanced")
+    if len(basis) > 1:
+        raise ValueError(f"balances in {len(basis)} independent ways; "
+                         f"split it into separate reactions")
+    coefficients = basis[0]
+    divisor = gcd(*coefficients)
+    if coefficients[0] < 0:
+        divisor = -divisor
+    coefficients = tuple(n // divisor for n in coefficients)
+    if min(coefficients) <= 0:
+        raise ValueError("can only be balanced with some formulas left out "
+                         "or moved to the other side")
+    return coefficients
+
+
+def recall(key):
+    # The memoized answer for a canonical reaction, or None
+    answer = balanced.get(key)
+    if answer is not None:
+        balanced.move_to_end(key)
+    return answer
+
+
+def remember(key, answer):
+    # Memoize an answer, dropping the least recently used past BALANCED_CACHE_SIZE
+    balanced[key] = answer
+    if len(balanced) > BALANCED_CACHE_SIZE:
+        balanced.popitem(last=False)
+
+
+def lookup(answer, positions):
+    # A canonical reaction's answer, in the order the reaction was given
+    if isinstance(answer, str):
+        raise ValueError(answer)
+    return tuple([answer[i] for i in positions])
+
+
+def split_reaction(reaction):
+    # A reaction is either text or a (reactants, products) pair
+    if isinstance(reaction, str):
+        return parse_reaction(reaction)
+    reactants, products = reaction
+    return tuple(reactants), tuple(products)
+
+
+def balance(reaction):
+    # The smallest whole coefficients for 'H2 + O2 -> H2O', or for
+    # (reactants, products), in the order given: reactants, then products.
+    # Raises ValueError for a reaction that can't be balanced.
+    reactants, products = split_reaction(reaction)
+    key, positions = canonical_reaction(reactants, products)
+    answer = recall(key)
+    if answer is None:
+        try:
+            answer = solve(key, reaction_rows(key))
+        except ValueError as error:
+            answer = str(error)
+        remember(key, answer)
+    try:
+        return lookup(answer, positions)
+    except ValueError as error:
+        raise ValueError(f"{format_reaction(reactants, products)} {error}") from None
+
+
+def solve_block(block):
+    # Needs NumPy. solve for a block of reactions at once: block holds one
+    # (elements, formulas) composition matrix per reaction, products negative.
+    # The same whole-number elimination as nullspace runs on every matrix
+    # together, each picking its own pivots. Returns the coefficients, and
+    # which reactions they're right for: those with exactly one balance,
+    # every coefficient positive, and no number big enough to overflow.
+    np = import_numpy()
+    block = block.copy()
+    count, rows, columns = block.shape
+    rank = np.zeros(count, dtype=np.intp)
+    pivot_columns = np.zeros((count, rows), dtype=np.intp)
+    row_numbers = np.arange(rows)
+    safe = np.abs(block).max(axis=(1, 2)) < SAFE_ENTRY
+    for column in range(columns):
+        # The first row at or below each matrix's rank with something in this column
+        candidates = (block[:, :, column] != 0) & (row_numbers >= rank[:, None])
+        which = np.flatnonzero(candidates.any(axis=1))
+        if not len(which):
+            continue
+        r = rank[which]
+        pivot = candidates[which].argmax(axis=1)
+        top = block[which, r]
+        block[which, r] = block[which, pivot]
+        block[which, pivot] = top
+        matrices = block[which]
+        pivot_row = block[which, r]
+        # Every other row times the pivot, less the pivot row times its entry
+        factor = matrices[:, :, column].copy()
+        factor[np.arange(len(which)), r] = 0
+        scale = np.where(row_numbers == r[:, None], 1, pivot_row[:, column, None])
+        matrices = matrices * scale[:, :, None] - factor[:, :, None] * pivot_row[:, None, :]
+        divisor = np.gcd.reduce(matrices, axis=2)
+        divisor[divisor == 0] = 1
+        matrices //= divisor[:, :, None]
+        block[which] = matrices
+        pivot_columns[which, r] = column
+        rank[which] += 1
+        safe[which] &= np.abs(matrices).max(axis=(1, 2)) < SAFE_ENTRY
+    # Exactly one column without a pivot, and its vector, scaled to whole numbers
+    good = safe & (rank == columns - 1)
+    is_pivot = np.zeros((count, columns), dtype=bool)
+    for i in range(rows):
+        has = np.flatnonzero(rank > i)
+        is_pivot[has, pivot_columns[has, i]] = True
+    free = is_pivot.argmin(axis=1)
+    everyone = np.arange(count)
+    pivots = np.where(row_numbers < rank[:, None],
+                      block[everyone[:, None], row_numbers, pivot_columns], 1)
+    lcm_of = np.ones(count, dtype=np.int64)
+    for i in range(rows):
+        lcm_of = np.lcm(lcm_of, np.abs(pivots[:, i]))
+        good &= lcm_of < SAFE_ENTRY
+        lcm_of[~good] = 1
+    coefficients = np.zeros((count, columns), dtype=np.int64)
+    coefficients[everyone, free] = lcm_of
+    for i in range(rows):
+        has = np.flatnonzero(rank > i)
+        coefficients[has, pivot_columns[has, i]] = \
+            -block[has, i, free[has]] * (lcm_of[has] // pivots[has, i])
+    divisor = np.gcd.reduce(coefficients, axis=1)
+    divisor[divisor == 0] = 1
+    divisor[coefficients[:, 0] < 0] *= -1
+    coefficients //= divisor[:, None]
+    good &= (coefficients > 0).all(axis=1)
+    return coefficients, good
+
+
+def balance_many(reactions):
+    # Balance a large batch of reactions; each answer is a tuple of
+    # coefficients as from balance, or None if the reaction can't be balanced.
+    # Each distinct reaction (in any order, either way round) is solved once.
+    # With NumPy, the new reactions' composition matrices come from one matrix
+    # over their distinct formulas, and are solved BLOCK_SIZE at a time by
+    # solve_block; what it can't settle (and everything without NumPy) goes
+    # through solve, which also says why a reaction can't be balanced.
+    # The batch keeps its own answers, so it can be bigger than the memo.
+    keys = []
+    for reaction in reactions:
+        try:
+            keys.append(canonical_reaction(*split_reaction(reaction)))
+        except ValueError:
+            keys.append(None)
+    solved = {}
+    for entry in keys:
+        if entry is not None and entry[0] not in solved:
+            answer = recall(entry[0])
+            if answer is not None:
+                solved[entry[0]] = answer
+    new = list(dict.fromkeys(entry[0] for entry in keys
+                             if entry is not None and entry[0] not in solved))
+    np = import_numpy()
+    if new and np is not None:
+        formulas = list(dict.fromkeys(formula for left, right in new for formula in left + right))
+        row = {formula: i for i, formula in enumerate(formulas)}
+        try:
+            # (elements, formulas), so matrix[:, ids] is a reaction's composition matrix
+            matrix = composition_matrix(formulas)[0].T.copy()
+        except ValueError:
+            # A formula doesn't parse; solving each reaction below finds which
+            matrix = None
+        # Reactions with the same number of reactants and products are
+        # gathered into (reactions, elements, formulas) blocks
+        shapes = {}
+        for key in new if matrix is not None else ():
+            shapes.setdefault((len(key[0]), len(key[1])), []).append(key)
+        for (reactant_count, _), group in shapes.items():
+            for start in range(0, len(group), BLOCK_SIZE):
+                keys_in_block = group[start:start + BLOCK_SIZE]
+                ids = np.array([[row[formula] for formula in left + right]
+                                for left, right in keys_in_block])
+                block = matrix[:, ids].transpose(1, 0, 2)
+                block[:, :, reactant_count:] *= -1
+                # Move the elements each reaction has to the top, and drop
+                # the rows no reaction in the block needs
+                present = block.any(axis=2)
+                order = np.argsort(~present, axis=1, kind='stable')[:, :present.sum(axis=1).max()]
+                block = np.take_along_axis(block, order[:, :, None], axis=1)
+                coefficients, good = solve_block(block)
+                for key, answer, ok in zip(keys_in_block, coefficients.tolist(), good.tolist()):
+                    if ok:
+                        solved[key] = tuple(answer)
+    for key in new:
+        if key not in solved:
+            try:
+                solved[key] = solve(key, reaction_rows(key))
+            except ValueError as error:
+                solved[key] = str(error)
+        remember(key, solved[key])
+    answers = []
+    for entry in keys:
+        try:
+            answers.append(lookup(solved[entry[0]], entry[1]) if entry is not None else None)
+        except ValueError:
+            answers.append(None)
+    return answers
+
+
+def format_reaction(reactants, products, coefficients=None, arrow='->'):
+    # 'H2 + O2 -> H2O', or with coefficients '2 H2 + O2 -> 2 H2O'
+    if coefficients is None:
+        coefficients = [1] * (len(reactants) + len(products))
+    terms = [f"{n} {formula}" if n != 1 else formula
+             for n, formula in zip(coefficients, list(reactants) + list(products))]
+    return f"{' + '.join(terms[:len(reactants)])} {arrow} {' + '.join(terms[len(reactants):])}"
+
+
+def formation_reaction(formula):
+    # The balanced reaction making formula from its elements as they occur on
+    # their own (H2, O2, Na, ...), as text, or None if there isn't one
+    # (e.g. O2 itself, or a formula that doesn't parse)
+    try:
+        symbols = [symbol for symbol, _ in parse_formula(formula)]
+    except ValueError:
+        return None
+    reactants = [ELEMENTAL_FORMS.get(symbol, symbol) for symbol in symbols]
+    if formula in reactants:
+        return None
+    try:
+        coefficients = balance((reactants, [formula]))
+    except ValueError:
+        return None
+    return format_reaction(reactants, [formula], coefficients)
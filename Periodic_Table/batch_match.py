@@ -0,0 +1,114 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from periodic_core import find_compounds
+
+# Element symbols on a line may be separated by spaces, tabs or commas
+SEPARATORS = re.compile(r'[\s,]+')
+
+
+def parse_rows(lines, fmt):
+    # Turn raw input lines into lists of element symbols
+    if fmt == 'csv':
+        return [[cell.strip() for cell in row if cell.strip()] for row in csv.reader(lines)]
+    return [[symbol for symbol in SEPARATORS.split(line) if symbol] for line in lines]
+
+
+def match_chunk(args):
+    # Runs in a worker: match every row in the chunk against COMPOUNDS
+    lines, fmt = args
+    output = []
+    for elements in parse_rows(lines, fmt):
+        matches = find_compounds(elements)
+        # One output line per input row: the elements, a tab, then any matching formulas
+        output.append(f"{' '.join(elements)}\t{' '.join(matches)}\n")
+    return output
+
+
+def read_chunks(stream, chunk_size):
+    # Yield lists of up to chunk_size lines, without reading the whole stream
+    while True:
+        chunk = list(islice(stream, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(infile, outfile, fmt='lines', workers=None, chunk_size=10_000):
+    # Match every row of infile and write the results to outfile, in input order.
+    # Returns the number of rows processed.
+    rows = 0
+    chunks = ((chunk, fmt) for chunk in read_chunks(infile, chunk_size))
+    if workers == 1:
+        # No pool needed, match in this process
+        for chunk in chunks:
+            output = match_chunk(chunk)
+            outfile.writelines(output)
+            rows += len(output)
+        return rows
+
+    with Pool(workers) as pool:
+        # Keep only a few chunks in flight, so memory stays bounded
+        # however big the input is
+        max_pending = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(match_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                output = pending.popleft().get()
+                outfile.writelines(output)
+                rows += len(output)
+        # Write the remaining chunks, still in input order
+        while pending:
+            output = pending.popleft().get()
+            outfile.writelines(output)
+            rows += len(output)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Match element lists against COMPOUNDS, one row per line.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="input file, or - for stdin (default)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="output file, or - for stdout (default)")
+    parser.add_argument('--format', choices=('lines', 'csv'), default='lines',
+                        help="'lines': symbols separated by spaces or commas; "
+                             "'csv': one symbol per CSV field")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument('--chunk-size', type=int, default=10_000,
+                        help="rows sent to a worker at a time")
+    args = parser.parse_args(argv)
+    # Pool() fails on 0 or fewer workers, and a chunk of no rows would end the input early
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    infile = sys.stdin if args.input == '-' else open(args.input, newline='')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w')
+    start = time.perf_counter()
+    try:
+        rows = run(infile, outfile, args.format, args.workers, args.chunk_size)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    elapsed = time.perf_counter() - start
+    # Report throughput on stderr so it doesn't mix with the results
+    print(f"{rows} rows in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):,.0f} rows/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,803 @@
+# Headless benchmarks for the periodic table app.
+#
+#   python benchmarks.py --save baseline.json      record a baseline
+#   python benchmarks.py --compare baseline.json   exit with 1 if anything got slower,
+#                                                  or stopped being reported
+#
+# Every metric is a time, size or CPU share, so lower is always better.
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+# Use SDL's dummy drivers so the benchmarks run without a display or sound card
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import balance
+import elemental_coding as ec
+import periodic_core as core
+from catalog import load_catalog
+from decompose import decompose
+from element_table import ElementTable
+from event_log import synthesize_drags, write_log
+from export import export
+from formula import molar_mass, molar_masses, parse_formula
+from frame_profiler import NullProfiler
+from hinting import CompoundHints
+from lookup_client import run_load
+from search import SearchIndex
+
+
+def make_catalog(size, seed=0):
+    # Build a synthetic compound catalog with random compositions
+    rng = random.Random(seed)
+    symbols = sorted(core.ELEMENTS)
+    catalog = {}
+    for i in range(size):
+        # Each compound has between 2 and 12 atoms
+        atoms = [rng.choice(symbols) for _ in range(rng.randint(2, 12))]
+        catalog[f"X{i}"] = {'elements': atoms, 'name': f"Compound {i}"}
+    return catalog
+
+
+def make_full_catalog(size, seed=0):
+    # A synthetic catalog like COMPOUNDS: valid formulas (named after their
+    # composition) with names, uses and properties borrowed from real compounds
+    rng = random.Random(seed)
+    real = list(core.COMPOUNDS.values())
+    compounds = {}
+    for data in make_catalog(size, seed).values():
+        formula = ''.join(f"{symbol}{count}" for symbol, count
+                          in core.composition_key(data['elements']))
+        compounds[formula] = {'elements': data['elements'], 'name': rng.choice(real)['name'],
+                              'uses': rng.choice(real)['uses'],
+                              'properties': rng.choice(real)['properties']}
+    return compounds
+
+
+def linear_check_compound(elements, compounds):
+    # The original lookup: sort the input and scan every compound
+    elements = sorted(elements)
+    for compound, data in compounds.items():
+        if elements == sorted(data['elements']):
+            return compound, data['name']
+    return None, None
+
+
+def time_per_call(func, queries, repeat):
+    # Return the average time in microseconds of calling func on each query
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            func(query)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(queries)) * 1e6
+
+
+def bench_lookup(quick=False):
+    sizes = (100, 10_000) if quick else (100, 10_000, 1_000_000)
+    metrics = {}
+    print("check_compound lookup (us per call)")
+    print(f"{'compounds':>10} {'linear':>12} {'indexed':>10} {'build (s)':>10}")
+    for size in sizes:
+        catalog = make_catalog(size)
+        # Query a mix of compositions that exist and ones that don't
+        rng = random.Random(1)
+        queries = [list(data['elements']) for data in rng.sample(list(catalog.values()), 50)]
+        queries += [['H'] * 40 for _ in range(50)]
+        rng.shuffle(queries)
+
+        start = time.perf_counter()
+        index = core.build_compound_index(catalog)
+        build_time = time.perf_counter() - start
+
+        # The linear scan gets very slow on big catalogs, so run it less often
+        linear_queries = queries if size <= 10_000 else queries[:5]
+        linear = time_per_call(lambda q: linear_check_compound(q, catalog),
+                               linear_queries, 1)
+        indexed = time_per_call(lambda q: core.find_compounds(q, index), queries, 100)
+        print(f"{size:>10} {linear:>12.2f} {indexed:>10.2f} {build_time:>10.2f}")
+        metrics[f"lookup.indexed_us[{size}]"] = indexed
+        metrics[f"lookup.build_s[{size}]"] = build_time
+
+    # check_compound itself, on the real catalog
+    queries = [data['elements'] for data in core.COMPOUNDS.values()]
+    metrics["lookup.check_compound_us"] = time_per_call(core.check_compound, queries, 100)
+    print(f"{'check_compound on COMPOUNDS':>28} {metrics['lookup.check_compound_us']:>8.2f}")
+    return metrics
+
+
+def bench_get_element_at_pos(quick=False):
+    # Hit-testing random points over and around the table
+    rng = random.Random(5)
+    points = [(rng.randrange(ec.WIDTH), rng.randrange(ec.HEIGHT)) for _ in range(1000)]
+    per_call = time_per_call(ec.get_element_at_pos, points, 10 if quick else 100)
+    print(f"get_element_at_pos (us per call) {per_call:>8.3f}")
+    return {"lookup.get_element_at_pos_us": per_call}
+
+
+def ms_per_call(func, number):
+    # Average time of func() in milliseconds, after one untimed call to fill caches
+    func()
+    return timeit.timeit(func, number=number) / number * 1000
+
+
+def bench_rendering(quick=False):
+    number = 20 if quick else 200
+    metrics = {}
+    # A busy frame: a full merge area, compound info, hints, tooltip and a dragged element
+    merge_area = {'Na': 1, 'H': 1, 'C': 1, 'O': 3}
+    info_area = core.show_compound_info('NaHCO3')
+    hints = CompoundHints(core.COMPOUNDS)
+    for symbol, count in merge_area.items():
+        hints.add(symbol, count)
+    hints_text = ec.hint_lines(hints)
+    hover_pos = (ec.TABLE_OFFSET_X + 20, 20)
+    metrics["render.frame_ms"] = ms_per_call(
+        lambda: ec.draw_frame(merge_area, info_area, hints_text, 'H', hover_pos, 'O'), number)
+    metrics["render.frame_orbit_ms"] = ms_per_call(
+        lambda: ec.draw_frame(merge_area, info_area, hints_text, 'H', hover_pos, 'O', 30.0),
+        number)
+    metrics["render.periodic_table_ms"] = ms_per_call(ec.draw_periodic_table, number)
+
+    # Electron shells for every element, resting and orbiting
+    rect = ec.ELECTRON_SHELL_RECT
+
+    def all_shells(angle):
+        for symbol in core.ELEMENTS:
+            ec.draw_electron_shells(symbol, rect.x, rect.y, rect.width, rect.height, angle)
+    metrics["render.shells_all_ms"] = ms_per_call(lambda: all_shells(None), number // 10 + 1)
+    metrics["render.shells_all_orbit_ms"] = ms_per_call(lambda: all_shells(45.0), number // 10 + 1)
+
+    # Text heavy paths: every element's info panel and tooltip,
+    # straight from the font and through the text cache
+    def info_and_tooltips(render):
+        for symbol in core.ELEMENTS:
+            for line in core.show_element_info(symbol):
+                render(ec.font, line, True, ec.WHITE)
+            render(ec.font, core.ELEMENTS[symbol]['name'], True, (44, 44, 47), (229, 229, 229))
+    metrics["render.text_uncached_ms"] = ms_per_call(
+        lambda: info_and_tooltips(lambda font, *args: font.render(*args)), number // 10 + 1)
+    metrics["render.text_cached_ms"] = ms_per_call(
+        lambda: info_and_tooltips(ec.render_text), number // 10 + 1)
+
+    print("rendering (ms per call)")
+    for name, value in metrics.items():
+        print(f"{name:>30} {value:>8.3f}")
+    return metrics
+
+
+def bench_resize(quick=False):
+    # Resize the window through a range of kiosk sizes, timing the first busy
+    # frame at each (which builds the table, text and shells for a new size),
+    # then cycle through them again, when everything should come from the caches
+    sizes = ((800, 480), (1280, 720), (1920, 1080), (3840, 2160))
+    merge_area = {'Na': 1, 'H': 1, 'C': 1, 'O': 3}
+    info_area = core.show_compound_info('NaHCO3')
+
+    def resize_and_draw(size):
+        start = time.perf_counter()
+        ec.resize_display(*size)
+        ec.draw_frame(merge_area, info_area, [], 'H', (ec.TABLE_OFFSET_X + 20, 20), 'O')
+        return (time.perf_counter() - start) * 1000
+
+    metrics = {}
+    ec.invalidate_table_cache()
+    ec.shell_cache.clear()
+    try:
+        for width, height in sizes:
+            metrics[f"resize.first_frame_ms[{width}x{height}]"] = resize_and_draw((width, height))
+        cycles = 2 if quick else 20
+        metrics["resize.cached_frame_ms"] = sum(
+            resize_and_draw(size) for _ in range(cycles) for size in sizes) / (cycles * len(sizes))
+    finally:
+        ec.resize_display(ec.BASE_WIDTH, ec.BASE_HEIGHT)
+    print("resizing (ms for the first frame at the new size)")
+    for name, value in metrics.items():
+        print(f"{name:>32} {value:>8.2f}")
+    return metrics
+
+
+def bench_export(quick=False):
+    # Export every element and compound card with a pool of workers, then
+    # again with nothing changed; and the poster on its own
+    metrics = {}
+    with tempfile.TemporaryDirectory() as folder:
+        full = export(folder, ('elements', 'compounds'))
+        cards = sum(full['exported'].values())
+        again = export(folder, ('elements', 'compounds'))
+        poster = export(folder, ('poster',), poster_scale=3 if quick else 6)
+    metrics["export.card_ms"] = full['seconds'] / cards * 1000
+    metrics["export.unchanged_s"] = again['seconds']
+    metrics["export.poster_s"] = poster['seconds']
+    print(f"export of {cards} cards with {full['workers']} workers: {full['seconds']:.2f} s, "
+          f"{full['files_per_second']:.1f} cards/s, {full['bytes'] / 1e6:.1f} MB")
+    for name, value in metrics.items():
+        print(f"{name:>32} {value:>8.3f}")
+    return metrics
+
+
+def bench_lookup_server(quick=False):
+    # Start the lookup server on a Unix socket in its own process and load it
+    # from this one, both sharing the machine as they would in use
+    requests = 50_000 if quick else 200_000
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'lookup.sock')
+        server = subprocess.Popen([sys.executable, 'lookup_server.py', '--unix', path],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            # It prints a line once it's listening
+            server.stdout.readline()
+            report = asyncio.run(run_load(requests, path=path))
+        finally:
+            server.terminate()
+            server.wait()
+    metrics = {
+        "server.us_per_request": 1e6 / report['requests_per_second'],
+        "server.p50_ms": report['p50_ms'],
+        "server.p99_ms": report['p99_ms'],
+    }
+    print(f"lookup server: {requests} requests over 8 connections, "
+          f"{report['requests_per_second']:.0f} requests/s")
+    for name, value in metrics.items():
+        print(f"{name:>32} {value:>8.3f}")
+    return metrics
+
+
+def measure_memory(build):
+    # Return what build() returns and the bytes it left allocated
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_catalog(quick=False):
+    # Build a compound file, then time compiling it into the cache, opening
+    # the cache again (as every later start does) and looking compounds up
+    size = 100_000 if quick else 1_000_000
+    metrics = {}
+    with tempfile.TemporaryDirectory() as folder:
+        compounds_path = os.path.join(folder, 'compounds.json')
+        compounds = make_full_catalog(size)
+        with open(compounds_path, 'w') as f:
+            json.dump(compounds, f)
+
+        start = time.perf_counter()
+        load_catalog(core.ELEMENTS_FILE, compounds_path)
+        metrics[f"catalog.compile_s[{size}]"] = time.perf_counter() - start
+        start = time.perf_counter()
+        _, table = load_catalog(core.ELEMENTS_FILE, compounds_path)
+        metrics[f"catalog.open_ms[{size}]"] = (time.perf_counter() - start) * 1000
+
+        rng = random.Random(2)
+        formulas = rng.sample(list(compounds), 1000)
+        queries = [compounds[formula]['elements'] for formula in formulas]
+        metrics[f"catalog.find_compounds_us[{size}]"] = time_per_call(
+            lambda q: core.find_compounds(q, table.index), queries, 10)
+        metrics[f"catalog.getitem_us[{size}]"] = time_per_call(table.__getitem__, formulas, 10)
+
+    print(f"compound catalog cache for {len(compounds)} compounds")
+    for name, value in metrics.items():
+        print(f"{name:>40} {value:>8.2f}")
+    return metrics
+
+
+def bench_search(quick=False):
+    # Build the search index for a large catalog, then time single word,
+    # prefix, misspelled and multi word queries
+    size = 100_000 if quick else 1_000_000
+    compounds = make_full_catalog(size)
+    start = time.perf_counter()
+    index = SearchIndex().build(core.ELEMENTS, compounds)
+    metrics = {f"search.build_s[{size}]": time.perf_counter() - start}
+    print(f"search over {len(index.entries)} entries (built in "
+          f"{metrics[f'search.build_s[{size}]']:.1f} s), us per query")
+    for query in ("solvent", "Sod", "fertil*", "s", "sodiun", "white solid", "H2O"):
+        elapsed = time_per_call(index.search, [query], 200)
+        metrics[f"search.query_us[{query}]"] = elapsed
+        print(f"{query:>14} {elapsed:>10.1f}")
+    return metrics
+
+
+def bench_element_table(quick=False):
+    # The original layout: one dictionary per element
+    rows = {symbol: core.ELEMENTS[symbol].to_dict() for symbol in core.ELEMENTS}
+    dicts, dict_size = measure_memory(
+        lambda: {symbol: {**data, 'shells': list(data['shells'])} for symbol, data in rows.items()})
+    table, table_size = measure_memory(lambda: ElementTable(rows))
+    print("element storage (bytes)")
+    print(f"{'dicts':>10} {dict_size:>10}")
+    print(f"{'table':>10} {table_size:>10}")
+
+    metrics = {"elements.table_bytes": table_size}
+    symbols = list(dicts)
+    number = 20 if quick else 200
+    print("element lookups (us per pass over every element)")
+    for name, func in (
+            ("dict['mass']", lambda: [dicts[s]['mass'] for s in symbols]),
+            ("view['mass']", lambda: [table[s]['mass'] for s in symbols]),
+            ("view.mass", lambda: [table[s].mass for s in symbols]),
+            ("dict['name']", lambda: [dicts[s]['name'] for s in symbols]),
+            ("table.name_of", lambda: [table.name_of[s] for s in symbols]),
+            ("dict mass range", lambda: [d for d in dicts.values() if 20 <= d['mass'] <= 80]),
+            ("table mass_range", lambda: table.mass_range(20, 80)),
+            ("dict halogens", lambda: [d for d in dicts.values() if d['color'] == core.HALOGENS]),
+            ("table in_group", lambda: table.in_group(core.HALOGENS))):
+        elapsed = timeit.timeit(func, number=number) / number * 1e6
+        print(f"{name:>18} {elapsed:>8.2f}")
+        if not name.startswith('dict'):
+            metrics[f"elements.{name}_us"] = elapsed
+    return metrics
+
+
+def bench_molar_masses(quick=False):
+    # A large batch drawn from the formulas in COMPOUNDS
+    size = 100_000 if quick else 1_000_000
+    rng = random.Random(3)
+    known = [compound for compound in core.COMPOUNDS
+             if all(symbol in core.ELEMENTS for symbol in core.COMPOUNDS[compound]['elements'])]
+    formulas = rng.choices(known, k=size)
+    print(f"molar masses for {size} formulas (s)")
+    start = time.perf_counter()
+    [molar_mass(formula) for formula in formulas]
+    single = time.perf_counter() - start
+    print(f"{'per formula':>12} {single:>8.2f}")
+    start = time.perf_counter()
+    molar_masses(formulas)
+    batch = time.perf_counter() - start
+    print(f"{'batch':>12} {batch:>8.2f}")
+    return {f"formula.molar_mass_s[{size}]": single, f"formula.molar_masses_s[{size}]": batch}
+
+
+def formation_reactions(formulas):
+    # The reaction making each formula from its elements as they occur on their own
+    return [([balance.ELEMENTAL_FORMS.get(symbol, symbol) for symbol, _ in parse_formula(formula)],
+             [formula]) for formula in formulas]
+
+
+def bench_balance(quick=False):
+    # Balance the formation reactions of a synthetic catalog one at a time,
+    # then as one batch, then the batch again with every answer memoized
+    size = 2_000 if quick else 20_000
+    reactions = formation_reactions(make_full_catalog(size, seed=5))
+    metrics = {}
+    balance.balanced.clear()
+    balance.canonical_reaction.cache_clear()
+    singles = []
+    start = time.perf_counter()
+    for reaction in reactions:
+        try:
+            singles.append(balance.balance(reaction))
+        except ValueError:
+            singles.append(None)
+    metrics["balance.single_us"] = (time.perf_counter() - start) / size * 1e6
+    balance.balanced.clear()
+    balance.canonical_reaction.cache_clear()
+    start = time.perf_counter()
+    batch = balance.balance_many(reactions)
+    metrics["balance.batch_us"] = (time.perf_counter() - start) / size * 1e6
+    # The batch (solved by NumPy where it can) must agree with one at a time
+    mismatches = sum(single != answer for single, answer in zip(singles, batch))
+    if mismatches:
+        failures.append(f"balance_many disagrees with balance on {mismatches} "
+                        f"of {size} reactions")
+    start = time.perf_counter()
+    balance.balance_many(reactions)
+    metrics["balance.memoized_us"] = (time.perf_counter() - start) / size * 1e6
+    print(f"balancing {size} formation reactions (us per reaction)")
+    for name, value in metrics.items():
+        print(f"{name:>32} {value:>8.2f}")
+    return metrics
+
+
+def bench_hints(quick=False, drops=200):
+    # Drop the atoms of random catalog compounds one by one, timing each
+    # update plus the hint text the merge area shows
+    size = 10_000 if quick else 1_000_000
+    catalog = make_catalog(size)
+    start = time.perf_counter()
+    hints = CompoundHints(catalog).build()
+    build_time = time.perf_counter() - start
+    rng = random.Random(4)
+    compositions = [data['elements'] for data in catalog.values()]
+    # Warm up once, so the first timing doesn't include one-off costs
+    hints.add(compositions[0][0])
+    ec.hint_lines(hints)
+    timings = []
+    while len(timings) < drops:
+        hints.reset()
+        for symbol in rng.choice(compositions):
+            start = time.perf_counter()
+            hints.add(symbol)
+            ec.hint_lines(hints)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"merge area hints for {size} compounds (built in {build_time:.1f} s)")
+    print(f"{'mean (ms)':>10} {sum(timings) / len(timings) * 1000:>8.3f}")
+    print(f"{'p99 (ms)':>10} {timings[len(timings) * 99 // 100] * 1000:>8.3f}")
+    print(f"{'worst (ms)':>10} {timings[-1] * 1000:>8.3f}")
+    return {f"hints.mean_ms[{size}]": sum(timings) / len(timings) * 1000,
+            f"hints.p99_ms[{size}]": timings[len(timings) * 99 // 100] * 1000}
+
+
+def bench_decompose(quick=False):
+    # Split big merge area pools into compounds, over the real catalog and a
+    # large synthetic one, counting the time to find the compounds that fit
+    pools = {
+        'small': {'H': 40, 'O': 20, 'C': 10, 'Na': 5},
+        'large': {'H': 120, 'O': 80, 'C': 40, 'N': 20, 'Na': 15, 'Cl': 15, 'S': 10,
+                  'Ca': 10, 'K': 5, 'Fe': 5},
+    }
+    size = 10_000 if quick else 100_000
+    big = dict(core.COMPOUNDS.items())
+    big.update(make_full_catalog(size))
+    metrics = {}
+    print("merge area splits (ms; left = atoms left over)")
+    print(f"{'catalog':>10} {'pool':>6} {'objective':>10} {'ms':>8} {'left':>5} {'optimal':>8}")
+    for catalog_name, catalog in (('COMPOUNDS', core.COMPOUNDS), (f'{size}', big)):
+        # Built up front, so the first split isn't charged for the hint lists
+        hints = CompoundHints(catalog).build()
+        for pool_name, pool in pools.items():
+            for objective in ('leftovers', 'compounds'):
+                start = time.perf_counter()
+                split = decompose(pool, catalog, hints.fitting(pool), objective)
+                elapsed = (time.perf_counter() - start) * 1000
+                left = sum(split['leftovers'].values())
+                print(f"{catalog_name:>10} {pool_name:>6} {objective:>10} {elapsed:>8.1f} "
+                      f"{left:>5} {str(split['optimal']):>8}")
+                metrics[f"split.ms[{catalog_name},{pool_name},{objective}]"] = elapsed
+                # A search that ran out of time leaves however many atoms it got
+                # to, which depends on the machine's load; only a proven best is stable
+                if split['optimal']:
+                    metrics[f"split.leftover_atoms[{catalog_name},{pool_name},{objective}]"] = left
+    return metrics
+
+
+def mouse_burst_script(bursts, burst_size, gap, idle_time):
+    # Bursts of mouse motion over the table, then quiet, then quit
+    rng = random.Random(2)
+    table_width = len(ec.PERIODIC_TABLE_LAYOUT[0]) * (ec.CELL_SIZE + ec.GRID_PADDING)
+    table_height = len(ec.PERIODIC_TABLE_LAYOUT) * (ec.CELL_SIZE + ec.GRID_PADDING)
+    script = []
+    for burst in range(bursts):
+        for _ in range(burst_size):
+            pos = (ec.TABLE_OFFSET_X + rng.randrange(table_width), rng.randrange(table_height))
+            script.append((burst * gap, pygame.event.Event(
+                pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))))
+    script.append((bursts * gap + idle_time, pygame.event.Event(pygame.QUIT)))
+    return script
+
+
+class ScriptedEvents:
+    # Stands in for pygame.event.get/wait/peek, handing out each scripted
+    # (seconds, event) pair once its time has come
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.start = time.perf_counter()
+        # Due times of events handed out but not yet shown on screen
+        self.handed_out = []
+
+    def due(self):
+        # Take every (seconds, event) pair whose time has come
+        now = time.perf_counter() - self.start
+        count = 0
+        while count < len(self.script) and self.script[count][0] <= now:
+            count += 1
+        pairs = self.script[:count]
+        del self.script[:count]
+        return pairs
+
+    def hand_out(self, pairs):
+        self.handed_out += [self.start + t for t, _ in pairs]
+        return [event for _, event in pairs]
+
+    def get(self, *args, **kwargs):
+        return self.hand_out(self.due())
+
+    def peek(self, *args, **kwargs):
+        return bool(self.script) and \
+            self.script[0][0] <= time.perf_counter() - self.start
+
+    def wait(self, timeout=0):
+        # Sleep until the next event is due, or the timeout runs out
+        if self.script:
+            delay = self.script[0][0] - (time.perf_counter() - self.start)
+            if timeout:
+                delay = min(delay, timeout / 1000)
+            if delay > 0:
+                time.sleep(delay)
+        pairs = self.due()
+        if not pairs:
+            return pygame.event.Event(pygame.NOEVENT)
+        # Put the rest back at the front of the queue
+        self.script[:0] = pairs[1:]
+        return self.hand_out(pairs[:1])[0]
+
+
+def legacy_loop():
+    # The original main() structure: redraw, flip and tick once per event
+    clock = pygame.time.Clock()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+            if event.type != pygame.MOUSEMOTION:
+                continue
+            pos = event.pos
+            hover = ec.get_element_at_pos(pos)
+            ec.draw_frame({}, [], [], hover if hover in ec.ELEMENTS else None, pos, None)
+            pygame.display.flip()
+            clock.tick(60)
+
+
+def run_scheduled_loop(**options):
+    # The real main(), which exits through sys.exit() on QUIT
+    try:
+        ec.main(**options)
+    except SystemExit:
+        pass
+
+
+def measure_loop(loop, script, events_per_frame=None):
+    # Count frames, and the time from each event being due to it being on screen
+    events = ScriptedEvents(script)
+    frames = [0]
+    latencies = []
+    originals = (pygame.event.get, pygame.event.wait, pygame.event.peek,
+                 pygame.display.flip, pygame.display.update, pygame.quit)
+
+    def counted(original):
+        def wrapper(*args):
+            frames[0] += 1
+            # A frame shows either every event handed out so far, or only
+            # the next one for a loop that draws once per event
+            shown = len(events.handed_out) if events_per_frame is None \
+                else min(events_per_frame, len(events.handed_out))
+            now = time.perf_counter()
+            latencies.extend(now - due for due in events.handed_out[:shown])
+            del events.handed_out[:shown]
+            return original(*args)
+        return wrapper
+
+    pygame.event.get, pygame.event.wait, pygame.event.peek = \
+        events.get, events.wait, events.peek
+    pygame.display.flip = counted(originals[3])
+    pygame.display.update = counted(originals[4])
+    # Keep pygame running when main() handles the scripted QUIT
+    pygame.quit = lambda: None
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        loop()
+    finally:
+        (pygame.event.get, pygame.event.wait, pygame.event.peek,
+         pygame.display.flip, pygame.display.update, pygame.quit) = originals
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    mean = sum(latencies) / len(latencies) * 1000 if latencies else float('nan')
+    worst = latencies[-1] * 1000 if latencies else float('nan')
+    return frames[0], mean, worst, cpu / wall * 100
+
+
+def bench_frame_loop(quick=False):
+    metrics = {}
+    print("main loop: 10 bursts of 20 mouse events, then 2 s idle")
+    print(f"{'loop':>10} {'frames':>8} {'input latency (ms)':>20} {'CPU %':>7}")
+    for name, loop, per_frame in (('legacy', legacy_loop, 1),
+                                  ('scheduled', run_scheduled_loop, None)):
+        script = mouse_burst_script(bursts=10, burst_size=20, gap=0.2, idle_time=2.0)
+        frames, latency, _, cpu = measure_loop(loop, script, per_frame)
+        print(f"{name:>10} {frames:>8} {latency:>20.1f} {cpu:>7.1f}")
+    # Only the real loop is tracked for regressions
+    metrics["loop.latency_ms"] = latency
+    metrics["loop.cpu_percent"] = cpu
+    return metrics
+
+
+def bench_popup_latency(quick=False):
+    # Steady mouse motion, with and without a Merge click popping up a message
+    print("input latency while a popup is shown (ms)")
+    print(f"{'popup':>10} {'mean':>8} {'worst':>8}")
+    means = {}
+    for with_popup in (False, True):
+        # Sweep along the fourth row, which has an element in every cell,
+        # so every event moves the tooltip and needs a new frame
+        y = 3 * (ec.CELL_SIZE + ec.GRID_PADDING) + ec.CELL_SIZE // 2
+        script = []
+        for i in range(75):
+            x = ec.TABLE_OFFSET_X + 10 + i * 13
+            script.append((i * 0.02, pygame.event.Event(
+                pygame.MOUSEMOTION, pos=(x, y), rel=(13, 0), buttons=(0, 0, 0))))
+        script.append((1.6, pygame.event.Event(pygame.QUIT)))
+        if with_popup:
+            click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1,
+                                       pos=ec.MERGE_BUTTON.center)
+            script.insert(0, (0.05, click))
+            script.sort(key=lambda pair: pair[0])
+        _, mean, worst, _ = measure_loop(run_scheduled_loop, script)
+        means[with_popup] = mean
+        print(f"{str(with_popup):>10} {mean:>8.1f} {worst:>8.1f}")
+    # A popup must not hold up input: it may cost at most one frame at the target rate
+    frame_ms = 1000 / ec.FPS
+    if means[True] > means[False] + frame_ms:
+        failures.append(f"popup latency {means[True]:.1f} ms is more than a frame "
+                        f"({frame_ms:.1f} ms) over {means[False]:.1f} ms without one")
+    return {"loop.popup_latency_ms": means[True]}
+
+
+def bench_search_typing(quick=False):
+    # Type a query into the search box, a key every 60 ms, and measure how
+    # long each keystroke takes to show up (with its results) on screen
+    script = [(0.3, pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1,
+                                       pos=ec.SEARCH_RECT.center))]
+    for i, char in enumerate("sodium hydrox"):
+        script.append((0.4 + i * 0.06, pygame.event.Event(pygame.TEXTINPUT, text=char)))
+    for i in range(4):
+        script.append((1.3 + i * 0.06, pygame.event.Event(
+            pygame.KEYDOWN, key=pygame.K_BACKSPACE, mod=0, unicode='\b', scancode=0)))
+    script.append((1.8, pygame.event.Event(pygame.QUIT)))
+    frames, mean, worst, cpu = measure_loop(run_scheduled_loop, script)
+    print("search box typing latency (ms)")
+    print(f"{'frames':>8} {'mean':>8} {'worst':>8}")
+    print(f"{frames:>8} {mean:>8.1f} {worst:>8.1f}")
+    return {"loop.search_typing_latency_ms": mean}
+
+
+def replay_report(batches):
+    # Replay batches as fast as possible and return main()'s report
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'drags.log')
+        write_log(path, batches)
+        report = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(report):
+                run_scheduled_loop(replay=path)
+        finally:
+            ec.profiler = NullProfiler()
+    return json.loads(report.getvalue())
+
+
+def bench_replay(quick=False):
+    # Replay a synthetic session of drags and merges as fast as possible,
+    # then one that never merges, so the merge area fills up with every atom
+    drags = 300 if quick else 3000
+    report = replay_report(synthesize_drags(drags))
+    metrics = {f"replay.frame_ms[{drags}]": report['seconds'] / report['frames'] * 1000,
+               f"replay.frame_work_p95_ms[{drags}]": report['frame_work_ms']['p95']}
+    print(f"replay of {drags} drags: {report['frames']} frames in {report['seconds']:.1f} s")
+    report = replay_report(synthesize_drags(drags, merge_every=drags + 1))
+    metrics[f"replay.pool_frame_ms[{drags}]"] = report['seconds'] / report['frames'] * 1000
+    metrics[f"replay.pool_frame_work_p95_ms[{drags}]"] = report['frame_work_ms']['p95']
+    print(f"replay of {drags} drags without merging: {report['frames']} frames in "
+          f"{report['seconds']:.1f} s, {sum(report['merge_area'].values())} atoms "
+          f"of {len(report['merge_area'])} elements left")
+    for name, value in metrics.items():
+        print(f"{name:>32} {value:>8.3f}")
+    return metrics
+
+
+# Key of a saved baseline that lists each benchmark's metrics
+BENCHMARK_NAMES = '_benchmarks'
+
+# Every benchmark, by the name used with --only
+BENCHMARKS = {
+    'lookup': bench_lookup,
+    'hit_test': bench_get_element_at_pos,
+    'rendering': bench_rendering,
+    'resize': bench_resize,
+    'export': bench_export,
+    'server': bench_lookup_server,
+    'catalog': bench_catalog,
+    'search': bench_search,
+    'elements': bench_element_table,
+    'formula': bench_molar_masses,
+    'balance': bench_balance,
+    'hints': bench_hints,
+    'split': bench_decompose,
+    'loop': bench_frame_loop,
+    'popup': bench_popup_latency,
+    'typing': bench_search_typing,
+    'replay': bench_replay,
+}
+
+
+def compare(results, baseline, threshold, ran=BENCHMARKS):
+    # Print each metric against the baseline, and return the names of those
+    # that got worse by more than threshold (every metric is lower-is-better).
+    # A baseline metric that a benchmark in ran didn't report this time (e.g.
+    # a split that's no longer proven optimal) counts as a regression too.
+    regressions = []
+    metrics = {name: value for name, value in baseline.items() if name != BENCHMARK_NAMES}
+    if BENCHMARK_NAMES in baseline:
+        expected = [name for benchmark in ran
+                    for name in baseline[BENCHMARK_NAMES].get(benchmark, ())]
+    else:
+        # A baseline saved before it noted which benchmark made each metric:
+        # only a run of every benchmark can tell what's missing
+        expected = list(metrics) if set(ran) >= set(BENCHMARKS) else []
+    print(f"{'metric':>40} {'baseline':>10} {'now':>10} {'change':>8}")
+    for name, value in results.items():
+        if name not in metrics:
+            print(f"{name:>40} {'-':>10} {value:>10.4g} {'new':>8}")
+            continue
+        old = metrics[name]
+        if old:
+            change = (value - old) / old
+        else:
+            # Any increase from nothing (e.g. 0 atoms left over becoming 3) is a regression
+            change = float('inf') if value > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSED'
+        print(f"{name:>40} {old:>10.4g} {value:>10.4g} {change:>+8.1%}{flag}")
+    for name in expected:
+        if name in metrics and name not in results:
+            regressions.append(name)
+            print(f"{name:>40} {metrics[name]:>10.4g} {'-':>10} {'missing':>8}  REGRESSED")
+    return regressions
+
+
+# Checks that failed while benchmarking; any of them makes main() fail
+failures = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the periodic table app.")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), metavar='NAME',
+                        help="run only these benchmarks: " + ", ".join(BENCHMARKS))
+    parser.add_argument('--quick', action='store_true',
+                        help="use smaller catalogs and fewer repeats")
+    parser.add_argument('--save', metavar='FILE', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="compare with a JSON baseline and fail on regressions")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown before a metric counts as a regression "
+                             "(default 0.25, i.e. 25%%)")
+    args = parser.parse_args(argv)
+
+    # Open the (dummy) window and load fonts for the drawing benchmarks
+    ec.init_display()
+    results = {}
+    ran = {}
+    for name in args.only or BENCHMARKS:
+        metrics = BENCHMARKS[name](args.quick)
+        results.update(metrics)
+        ran[name] = sorted(metrics)
+        print()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({**results, BENCHMARK_NAMES: ran}, f, indent=2, sort_keys=True)
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, ran)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+            status = 1
+    for failure in failures:
+        print(f"FAILED: {failure}")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+import gc
+import marshal
+import mmap
+import os
+import struct
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from itertools import accumulate
+from zlib import crc32
+
+# Bump VERSION whenever the cache layout changes, so old caches get rebuilt
+MAGIC = b'PTCATLG\0'
+VERSION = 2
+# Fields stored for each compound, in the order they sit in the string blob
+COMPOUND_FIELDS = ('formula', 'elements', 'name', 'uses', 'properties')
+
+# Header: magic, version, then for each of the two source files its size,
+# modification time and SHA-256, then the offset and length of each section
+SOURCE = struct.Struct('<Qq32s')
+SECTIONS = ('meta', 'strings', 'string_offsets', 'formula_slots',
+            'keys', 'key_offsets', 'key_starts', 'key_rows', 'key_slots')
+HEADER = struct.Struct('<8sI' + SOURCE.format[1:] * 2 + 'QQ' * len(SECTIONS))
+SOURCES_AT = struct.calcsize('<8sI')
+# Typecode of each array section (the others are raw bytes)
+ARRAY_TYPES = {'string_offsets': 'Q', 'formula_slots': 'I', 'key_offsets': 'Q',
+               'key_starts': 'I', 'key_rows': 'I', 'key_slots': 'I'}
+
+
+def read_elements(path):
+    # Element data from a .json or .csv file, as {symbol: {field: value}}
+    # with the group name (e.g. 'NONMETALS') in place of a color
+    # json, csv (and hashlib below) are only needed when the cache is
+    # rebuilt, so they're imported there to keep startup fast
+    if not path.endswith('.csv'):
+        import json
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    import csv
+    elements = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            elements[row['symbol']] = {
+                'name': row['name'],
+                'group': row['group'],
+                'atomic_number': int(row['atomic_number']),
+                'mass': float(row['mass']),
+                'electron_config': row['electron_config'],
+                # Electrons per shell are separated by spaces, e.g. "2 8 1"
+                'shells': [int(count) for count in row['shells'].split()],
+            }
+    return elements
+
+
+def read_compounds(path):
+    # Yield (formula, data) pairs from a .json or .csv file
+    if not path.endswith('.csv'):
+        import json
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f).items()
+        return
+    import csv
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            # Element symbols are separated by spaces, e.g. "H H O"
+            yield row['formula'], {'elements': row['elements'].split(), 'name': row['name'],
+                                   'uses': row['uses'], 'properties': row['properties']}
+
+
+def encode_key(key):
+    # Turn a composition key like (('H', 2), ('O', 1)) into b'H2 O1'
+    return ' '.join(f"{symbol}{count}" for symbol, count in key).encode()
+
+
+def is_plain_key(key):
+    # Whether encode_key can write key without it reading as another key:
+    # symbols like 'Na' (letters, capitalised) and positive whole counts.
+    # e.g. (('H2 O', 1),) would otherwise encode the same as Water's key.
+    return all(isinstance(symbol, str) and symbol.isalpha() and symbol.isascii()
+               and symbol == symbol.capitalize() and isinstance(count, int) and count > 0
+               for symbol, count in key)
+
+
+def decode_key(key):
+    # Turn b'H2 O1' back into (('H', 2), ('O', 1))
+    pairs = []
+    for part in str(key, 'utf-8').split():
+        split = len(part.rstrip('0123456789'))
+        pairs.append((part[:split], int(part[split:])))
+    return tuple(pairs)
+
+
+def hash_slots(items):
+    # Build an open addressing hash table for a list of byte strings: a
+    # power-of-two array of slots holding (position in items + 1), or 0 if empty.
+    # It is saved in the cache, so lookups need nothing built at startup.
+    size = 8
+    while size < 2 * len(items):
+        size *= 2
+    slots = array('I', bytes(4 * size))
+    for i, item in enumerate(items):
+        slot = crc32(item) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = i + 1
+    return slots
+
+
+def probe(slots, target, item_at):
+    # Find target in a table from hash_slots; item_at(i) gives the i-th item.
+    # Returns target's position, or None if it isn't there.
+    mask = len(slots) - 1
+    slot = crc32(target) & mask
+    while slots[slot]:
+        if item_at(slots[slot] - 1) == target:
+            return slots[slot] - 1
+        slot = (slot + 1) & mask
+    return None
+
+
+def file_stamp(path):
+    # Size, modification time and SHA-256 of a source file
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    info = os.stat(path)
+    return info.st_size, info.st_mtime_ns, digest.digest()
+
+
+def compile_catalog(elements_path, compounds_path):
+    # Build the binary cache for the two source files and return it as bytes.
+    # Millions of small objects are made along the way and none of them form
+    # cycles, so the cycle collector is paused rather than let it rescan them.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return build_cache(elements_path, compounds_path)
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def build_cache(elements_path, compounds_path):
+    from formula import parse_formula
+    elements = read_elements(elements_path)
+    # Later entries replace earlier ones with the same formula, like in a dict literal
+    compounds = dict(read_compounds(compounds_path))
+
+    # Every compound's fields go into one UTF-8 blob, with an offset where
+    # each field starts (and one more for the end of the last field)
+    values = []
+    keys = {}
+    mismatches = {}
+    for row, (formula, data) in enumerate(compounds.items()):
+        values += (formula, ' '.join(data['elements']), data['name'], data['uses'],
+                   data['properties'])
+        # Group rows by composition, in catalog order
+        composition = tuple(sorted(Counter(data['elements']).items()))
+        keys.setdefault(encode_key(composition), []).append(row)
+        # Note any compound whose element list disagrees with its formula,
+        # here where each compound is counted anyway (the unmemoized parser
+        # keeps a big catalog out of parse_formula's cache).
+        # A formula that doesn't parse is noted with None, rather than stopping
+        # the whole catalog from loading.
+        try:
+            parsed = parse_formula.__wrapped__(formula)
+        except ValueError:
+            parsed = None
+        if composition != parsed:
+            mismatches[formula] = (composition, parsed)
+    encoded = [value.encode() for value in values]
+    strings = b''.join(encoded)
+    string_offsets = array('Q', accumulate(map(len, encoded), initial=0))
+    formula_slots = hash_slots(encoded[::len(COMPOUND_FIELDS)])
+
+    # Every composition key, each with its run of rows
+    key_blob = bytearray()
+    key_offsets = array('Q', [0])
+    key_starts = array('I', [0])
+    key_rows = array('I')
+    for key in keys:
+        key_blob += key
+        key_offsets.append(len(key_blob))
+        key_rows.extend(keys[key])
+        key_starts.append(len(key_rows))
+    key_slots = hash_slots(list(keys))
+
+    # Small things kept as they are: the elements, and the mismatches.
+    # marshal reads them back without importing json (about 10 ms of startup,
+    # most of it compiling json's regular expressions), and keeps the tuples.
+    meta = marshal.dumps({'elements': elements, 'mismatches': mismatches})
+
+    sections = {'meta': meta, 'strings': strings, 'string_offsets': string_offsets,
+                'formula_slots': formula_slots, 'keys': key_blob, 'key_offsets': key_offsets,
+                'key_starts': key_starts, 'key_rows': key_rows, 'key_slots': key_slots}
+    body = bytearray()
+    layout = []
+    for name in SECTIONS:
+        # Keep every section 8-byte aligned so it can be cast to an array in place
+        body += bytes(-(HEADER.size + len(body)) % 8)
+        data = bytes(sections[name])
+        layout += [HEADER.size + len(body), len(data)]
+        body += data
+    stamps = file_stamp(elements_path) + file_stamp(compounds_path)
+    return HEADER.pack(MAGIC, VERSION, *stamps, *layout) + body
+
+
+def cache_is_fresh(cache_path, sources):
+    # The cache is fresh if it has the current version and was built from
+    # files with the same contents. Size and modification time are checked
+    # first; only if those changed are the files hashed.
+    try:
+        with open(cache_path, 'rb') as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, version, *fields = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            return False
+        # A cache cut short (e.g. by a full disk) ends before its last section
+        last_at, last_length = fields[-2:]
+        if os.path.getsize(cache_path) != last_at + last_length:
+            return False
+        for i, path in enumerate(sources):
+            size, mtime, digest = fields[3 * i:3 * i + 3]
+            info = os.stat(path)
+            if (info.st_size, info.st_mtime_ns) == (size, mtime):
+                continue
+            stamp = file_stamp(path)
+            if stamp[2] != digest:
+                return False
+            # Same contents, just touched (e.g. by a checkout): record the new
+            # time so the file isn't hashed again next time, if we're allowed to
+            try:
+                with open(cache_path, 'r+b') as f:
+                    f.seek(SOURCES_AT + i * SOURCE.size)
+                    f.write(SOURCE.pack(*stamp))
+            except OSError:
+                pass
+    except OSError:
+        return False
+    return True
+
+
+def load_catalog(elements_path, compounds_path, cache_path=None):
+    # Load the element and compound data, through the binary cache at
+    # cache_path (default: next to the compound file). The cache is rebuilt
+    # when it is missing, out of date or from an older version.
+    # Returns (elements as {symbol: data}, CompoundTable).
+    if cache_path is None:
+        cache_path = os.path.splitext(compounds_path)[0] + '.cache'
+    if not cache_is_fresh(cache_path, (elements_path, compounds_path)):
+        data = compile_catalog(elements_path, compounds_path)
+        try:
+            # Write to a temporary file and rename it, so other processes
+            # never see a half written cache
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, cache_path)
+        except OSError:
+            # Can't write next to the data (e.g. a read-only install),
+            # so use the compiled catalog straight from memory
+            table = CompoundTable(data)
+            return table.meta['elements'], table
+    with open(cache_path, 'rb') as f:
+        # Map the file read-only: pages are loaded on demand and shared by
+        # every process that opens the same cache
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    table = CompoundTable(buffer)
+    return table.meta['elements'], table
+
+
+class CompoundTable(Mapping):
+    # Read-only {formula: data} mapping over a compiled catalog, kept in a
+    # (usually memory mapped) buffer. Nothing is decoded until it is looked up.
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        fields = HEADER.unpack_from(buffer)
+        view = memoryview(buffer)
+        layout = fields[2 + 3 * 2:]
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = layout[2 * i:2 * i + 2]
+            # Arrays are read in place; for the text sections keep where they
+            # start, since slicing the buffer itself is the quickest way to get bytes
+            sections[name] = (view[offset:offset + length].cast(ARRAY_TYPES[name])
+                              if name in ARRAY_TYPES else offset)
+        self.strings_at = sections['strings']
+        self.string_offsets = sections['string_offsets']
+        self.formula_slots = sections['formula_slots']
+        self.keys_at = sections['keys']
+        self.key_offsets = sections['key_offsets']
+        self.key_starts = sections['key_starts']
+        self.key_rows = sections['key_rows']
+        self.key_slots = sections['key_slots']
+        meta_at, meta_length = layout[0:2]
+        self.meta = marshal.loads(buffer[meta_at:meta_at + meta_length])
+        self.mismatches = self.meta['mismatches']
+        self.index = CompositionIndex(self)
+
+    def formula_bytes(self, row):
+        # The formula is the first field of each row
+        i = row * len(COMPOUND_FIELDS)
+        return self.buffer[self.strings_at + self.string_offsets[i]:
+                           self.strings_at + self.string_offsets[i + 1]]
+
+    def formula(self, row):
+        return self.formula_bytes(row).decode()
+
+    def find_row(self, formula):
+        # Row of formula, or None
+        return probe(self.formula_slots, formula.encode(), self.formula_bytes)
+
+    def row_data(self, row):
+        # Build the same dictionary the old COMPOUNDS literal held
+        start = row * len(COMPOUND_FIELDS)
+        offsets = self.string_offsets[start:start + len(COMPOUND_FIELDS) + 1]
+        text = self.buffer[self.strings_at + offsets[0]:self.strings_at + offsets[-1]].decode()
+        # Offsets count bytes, so split the fields out before decoding
+        # when there's any non-ASCII text
+        if len(text) == offsets[-1] - offsets[0]:
+            values = [text[offsets[i] - offsets[0]:offsets[i + 1] - offsets[0]]
+                      for i in range(len(COMPOUND_FIELDS))]
+        else:
+            values = [self.buffer[self.strings_at + offsets[i]:
+                                  self.strings_at + offsets[i + 1]].decode()
+                      for i in range(len(COMPOUND_FIELDS))]
+        _, elements, name, uses, properties = values
+        return {'elements': elements.split(), 'name': name, 'uses': uses,
+                'properties': properties}
+
+    # Mapping interface, so COMPOUNDS keeps working like the old dictionary
+    def __getitem__(self, formula):
+        row = self.find_row(formula) if isinstance(formula, str) else None
+        if row is None:
+            raise KeyError(formula)
+        return self.row_data(row)
+
+    def get(self, formula, default=None):
+        row = self.find_row(formula) if isinstance(formula, str) else None
+        return default if row is None else self.row_data(row)
+
+    def __contains__(self, formula):
+        return isinstance(formula, str) and self.find_row(formula) is not None
+
+    def __iter__(self):
+        # Formulas in catalog order
+        return (self.formula(row) for row in range(len(self)))
+
+    def __len__(self):
+        return (len(self.string_offsets) - 1) // len(COMPOUND_FIELDS)
+
+    def items(self):
+        # Faster than the Mapping default, which would search for every formula
+        return ((self.formula(row), self.row_data(row)) for row in range(len(self)))
+
+    def values(self):
+        return (self.row_data(row) for row in range(len(self)))
+
+
+class CompositionIndex(Mapping):
+    # Read-only {composition key: formulas} mapping over a CompoundTable,
+    # the same shape build_compound_index returns
+
+    def __init__(self, table):
+        self.table = table
+
+    def key(self, i):
+        table = self.table
+        return table.buffer[table.keys_at + table.key_offsets[i]:
+                            table.keys_at + table.key_offsets[i + 1]]
+
+    def find(self, key):
+        # Position of a composition key, or None (also for keys no catalog
+        # compound could have, which might encode the same as one that does)
+        if not is_plain_key(key):
+            return None
+        return probe(self.table.key_slots, encode_key(key), self.key)
+
+    def formulas(self, i):
+        # Formulas of every compound with the i-th key, in catalog order
+        rows = self.table.key_rows[self.table.key_starts[i]:self.table.key_starts[i + 1]]
+        return tuple([self.table.formula(row) for row in rows])
+
+    def __getitem__(self, key):
+        i = self.find(key)
+        if i is None:
+            raise KeyError(key)
+        return self.formulas(i)
+
+    def get(self, key, default=None):
+        # find_compounds calls this for every lookup, so skip the KeyError
+        # round trip the Mapping default would take on a miss
+        i = self.find(key)
+        return default if i is None else self.formulas(i)
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def __iter__(self):
+        # Decode each stored key back into composition_key form
+        return (decode_key(self.key(i)) for i in range(len(self)))
+
+    def __len__(self):
+        return len(self.table.key_offsets) - 1
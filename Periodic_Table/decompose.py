@@ -0,0 +1,211 @@
+import sys
+import time
+from collections import Counter
+
+# Built-in ways to score a split, as (points per atom used, points per compound made).
+# The bigger weight decides and the smaller one only breaks ties, which holds
+# while fewer than 1000 atoms and compounds are involved.
+OBJECTIVES = {
+    'leftovers': (1000, 1),     # fewest atoms left over, then the most compounds
+    'compounds': (1, 1000),     # the most compounds, then the fewest atoms left over
+}
+# How long a split may search before settling for the best found so far (seconds)
+TIME_LIMIT = 0.1
+# Check the clock after this many search steps
+CHECK_EVERY = 16
+
+
+def objective_weights(objective):
+    # The (atom, compound) weights for an objective's name, or weights given directly
+    if isinstance(objective, str):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}; "
+                             f"use one of {', '.join(OBJECTIVES)} or (atom, compound) weights")
+        return OBJECTIVES[objective]
+    atom_weight, compound_weight = objective
+    return atom_weight, compound_weight
+
+
+def decompose(pool, compounds, formulas=None, objective='leftovers', time_limit=TIME_LIMIT):
+    # Split a pool of atoms ({symbol: count}, or a list of symbols) into
+    # compounds from compounds, scoring each split by objective.
+    # formulas limits the compounds tried (e.g. CompoundHints.fitting's);
+    # by default every compound that fits the pool is.
+    #
+    # Returns a dict with the compounds made as (formula, times) pairs, the
+    # leftover atoms, the score, and whether the split is known to be the best:
+    # the search stops after time_limit seconds with the best split found by then.
+    #
+    # The search is memoized branch and bound over the count vector of atoms
+    # left, remembering the most points each vector can still make (or, where
+    # that didn't matter, a bound on it), so each is searched about once
+    # whatever order its compounds were made in. Each step takes the element
+    # with the fewest compounds left that could use it, and tries making each
+    # of those compounds (most points per atom first), then leaving that
+    # element's atoms over. Only the compounds that fit the step before are
+    # checked again. A branch is dropped when even giving each atom a
+    # compound could still use the most points per atom any compound using
+    # its element gets couldn't beat the best split so far.
+    if not isinstance(pool, dict):
+        pool = Counter(pool)
+    atom_weight, compound_weight = objective_weights(objective)
+    symbols = sorted(symbol for symbol in pool if pool[symbol] > 0)
+    start = tuple(pool[symbol] for symbol in symbols)
+    if formulas is None:
+        formulas = compounds
+
+    # The count vector of each compound that fits the pool; of compounds
+    # with the same composition, the first in catalog order stands for them all
+    vectors = {}
+    for formula in formulas:
+        counts = Counter(compounds[formula]['elements'])
+        if any(symbol not in pool for symbol in counts):
+            continue
+        vector = tuple(counts.get(symbol, 0) for symbol in symbols)
+        if all(n <= have for n, have in zip(vector, start)) and vector not in vectors:
+            vectors[vector] = formula
+
+    # Count vectors are packed into one int, each count in its own field of
+    # bits with a guard bit on top: subtracting a compound's vector then
+    # borrows from a guard bit exactly when the compound doesn't fit
+    width = max(start, default=0).bit_length() + 1
+    fields = [((1 << (width - 1)) - 1) << (j * width) for j in range(len(symbols))]
+    guards = sum(1 << (j * width + width - 1) for j in range(len(symbols)))
+
+    def pack(vector):
+        return sum(n << (j * width) for j, n in enumerate(vector))
+
+    # (points per atom, points, packed vector, formula, elements it uses,
+    # their fields), best points per atom first
+    candidates = []
+    for vector, formula in vectors.items():
+        points = atom_weight * sum(vector) + compound_weight
+        uses = tuple(j for j, n in enumerate(vector) if n)
+        candidates.append((points / sum(vector), points, pack(vector), formula, uses,
+                           sum(fields[j] for j in uses)))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    # The most points the atoms left in each packed count vector can still
+    # make: exact, or (stored with False) only an upper bound too low to matter
+    values = {}
+    # The best split found on the way, kept in case time runs out
+    best_score, best_made = 0, Counter()
+    made = Counter()
+    deadline = time.perf_counter() + time_limit
+    steps = 0
+    stopped = False
+    proving = True
+
+    def best_from(left, fits, score, need):
+        # The most points left can make with the compounds in fits, if that's
+        # more than need; otherwise an upper bound no more than need. score is
+        # what the compounds made on the way here are worth.
+        nonlocal steps, stopped, best_score, best_made
+        if proving:
+            if score > best_score:
+                best_score, best_made = score, Counter(made)
+            # Only a split better than the best so far matters
+            if best_score - score > need:
+                need = best_score - score
+        known = values.get(left)
+        if known is not None and (known[1] or known[0] <= need):
+            return known[0]
+        # (making the best split again afterwards always runs to the end)
+        steps += 1
+        if proving and steps % CHECK_EVERY == 0 and time.perf_counter() > deadline:
+            stopped = True
+        if stopped:
+            return 0
+        # Only what fit the state before can fit now
+        borrowed = left | guards
+        fits = [candidate for candidate in fits
+                if (borrowed - candidate[2]) & guards == guards]
+        if not fits:
+            values[left] = (0, True)
+            return 0
+        # Who can still use each element, and the most points per atom any of
+        # them gets (fits is in order of points per atom, so the first user's)
+        users = [0] * len(symbols)
+        top = [0] * len(symbols)
+        usable = 0
+        for candidate in fits:
+            usable |= candidate[5]
+            for j in candidate[4]:
+                if not users[j]:
+                    top[j] = candidate[0]
+                users[j] += 1
+        # Atoms nothing can use are left over whatever happens, so states
+        # that differ only in those share a value (kept under both)
+        given, left = left, left & usable
+        if left != given:
+            known = values.get(left)
+            if known is not None and (known[1] or known[0] <= need):
+                values[given] = known
+                return known[0]
+        bound = sum(((left >> (j * width)) & fields[0]) * top[j]
+                    for j in range(len(symbols)) if users[j])
+        if bound <= need:
+            values[given] = values[left] = (bound, False)
+            return bound
+        scarcest = min((j for j in range(len(symbols)) if users[j]), key=users.__getitem__)
+        value = need
+        exact = False
+        for _, points, vector, formula, uses, _ in fits:
+            if scarcest in uses:
+                made[formula] += 1
+                found = points + best_from(left - vector, fits, score + points, value - points)
+                made[formula] -= 1
+                if found > value:
+                    value, exact = found, True
+        # Or leave the rest of the scarcest element over
+        found = best_from(left & ~fields[scarcest], fits, score, value)
+        if found > value:
+            value, exact = found, True
+        if not stopped:
+            values[given] = values[left] = (value, exact)
+        return value
+
+    def follow(left, target):
+        # Make the compounds that get target points from left, by following
+        # the choices whose memoized values add up to it
+        while target > 0:
+            fits = [candidate for candidate in candidates
+                    if ((left | guards) - candidate[2]) & guards == guards]
+            users = [0] * len(symbols)
+            for candidate in fits:
+                for j in candidate[4]:
+                    users[j] += 1
+            scarcest = min((j for j in range(len(symbols)) if users[j]), key=users.__getitem__)
+            for _, points, vector, formula, uses, _ in fits:
+                if scarcest in uses and \
+                        points + best_from(left - vector, fits, 0, target - points - 1) == target:
+                    made[formula] += 1
+                    left, target = left - vector, target - points
+                    break
+            else:
+                left &= ~fields[scarcest]
+
+    # Each compound made is one level of recursion, so make room for a big
+    # pool while searching, and put the limit back afterwards
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, sum(start) + 100))
+    try:
+        score = best_from(pack(start), candidates, 0, -1)
+        # More than the best split seen means it was only reached through
+        # the memo, so make it again from the values
+        if not stopped and score > best_score:
+            proving = False
+            made.clear()
+            follow(pack(start), score)
+            best_score, best_made = score, made
+    finally:
+        sys.setrecursionlimit(limit)
+
+    leftovers = dict(zip(symbols, start))
+    for formula, times in best_made.items():
+        for symbol in compounds[formula]['elements']:
+            leftovers[symbol] -= times
+    return {'compounds': [(formula, times) for formula, times in best_made.items() if times],
+            'leftovers': {symbol: n for symbol, n in leftovers.items() if n},
+            'score': best_score,
+            'optimal': not stopped}
@@ -0,0 +1,158 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+# Fields every element has, in the order they appear in the element data
+FIELDS = ('name', 'color', 'atomic_number', 'mass', 'electron_config', 'shells')
+
+
+class Element:
+    # A lightweight view of one row of an ElementTable
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def symbol(self):
+        return self.table.symbols[self.row]
+
+    @property
+    def name(self):
+        return self.table.names[self.row]
+
+    @property
+    def color(self):
+        return self.table.colors[self.table.color_ids[self.row]]
+
+    @property
+    def atomic_number(self):
+        return self.table.atomic_numbers[self.row]
+
+    @property
+    def mass(self):
+        return self.table.masses[self.row]
+
+    @property
+    def electron_config(self):
+        return self.table.electron_configs[self.row]
+
+    @property
+    def shells(self):
+        # Slice this element's electrons-per-shell out of the flat shell column,
+        # as a list like the original data (so e.g. shells == [1] still holds)
+        start, end = self.table.shell_offsets[self.row:self.row + 2]
+        return self.table.shell_counts[start:end].tolist()
+
+    # Support the old dictionary style access, e.g. ELEMENTS['H']['name'].
+    # Calling the field's getter directly skips the attribute lookup.
+    def __getitem__(self, key):
+        return FIELD_GETTERS[key](self)
+
+    def get(self, key, default=None):
+        getter = FIELD_GETTERS.get(key)
+        return getter(self) if getter else default
+
+    def keys(self):
+        return FIELDS
+
+    def to_dict(self):
+        # Build the original dictionary for this element
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __repr__(self):
+        return f"Element({self.symbol!r})"
+
+
+# The property getter for each field, for Element.__getitem__
+FIELD_GETTERS = {field: getattr(Element, field).fget for field in FIELDS}
+
+
+class ElementTable(Mapping):
+    # Column-oriented store of element data, looked up by symbol or atomic number
+
+    def __init__(self, elements):
+        # Plain lists for the text columns
+        self.symbols = list(elements)
+        self.names = [data['name'] for data in elements.values()]
+        self.electron_configs = [data['electron_config'] for data in elements.values()]
+        # Compact typed arrays for the numeric columns
+        self.atomic_numbers = array('H', (data['atomic_number'] for data in elements.values()))
+        self.masses = array('d', (data['mass'] for data in elements.values()))
+
+        # Store each distinct color once, and a small id per element
+        self.colors = []
+        self.color_ids = array('B')
+        for data in elements.values():
+            if data['color'] not in self.colors:
+                self.colors.append(data['color'])
+            self.color_ids.append(self.colors.index(data['color']))
+
+        # All shells in one flat column, with offsets marking where each element starts
+        self.shell_counts = array('B')
+        self.shell_offsets = array('H', [0])
+        for data in elements.values():
+            self.shell_counts.extend(data['shells'])
+            self.shell_offsets.append(len(self.shell_counts))
+
+        # Indexes from symbol and atomic number to row (-1 where there is no element)
+        self.rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.number_rows = array('h', [-1] * (max(self.atomic_numbers, default=0) + 1))
+        for row, number in enumerate(self.atomic_numbers):
+            self.number_rows[number] = row
+
+        # Rows sorted by mass, with the sorted masses alongside for binary search
+        order = sorted(range(len(self.symbols)), key=self.masses.__getitem__)
+        self.mass_order = array('H', order)
+        self.sorted_masses = array('d', (self.masses[row] for row in order))
+
+        # The two fields drawn every frame (tile colors, tooltips and
+        # badges), by symbol, so the hot paths need just one dict lookup
+        self.color_of = {symbol: self.colors[color_id]
+                         for symbol, color_id in zip(self.symbols, self.color_ids)}
+        self.name_of = dict(zip(self.symbols, self.names))
+
+        # Rows belonging to each color group
+        self.color_rows = [array('H') for _ in self.colors]
+        for row, color_id in enumerate(self.color_ids):
+            self.color_rows[color_id].append(row)
+
+        # One reusable view per row, and by symbol, so a lookup is one dict access
+        self.views = [Element(self, row) for row in range(len(self.symbols))]
+        self.symbol_views = dict(zip(self.symbols, self.views))
+
+    # Mapping interface, so ELEMENTS keeps working like the old dictionary
+    def __getitem__(self, symbol):
+        return self.symbol_views[symbol]
+
+    def __contains__(self, symbol):
+        return symbol in self.rows
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def by_atomic_number(self, number):
+        # Return the element with this atomic number, or None
+        if 0 <= number < len(self.number_rows) and self.number_rows[number] >= 0:
+            return self.views[self.number_rows[number]]
+        return None
+
+    def mass_range(self, low, high):
+        # Return every element with low <= mass <= high, lightest first
+        start = bisect_left(self.sorted_masses, low)
+        end = bisect_right(self.sorted_masses, high)
+        return [self.views[row] for row in self.mass_order[start:end]]
+
+    def in_group(self, color):
+        # Return every element drawn in the given group color, e.g. HALOGENS
+        if color not in self.colors:
+            return []
+        return [self.views[row] for row in self.color_rows[self.colors.index(color)]]
+
+    def sorted_by_mass(self):
+        # Return every element, lightest first
+        return [self.views[row] for row in self.mass_order]
@@ -1,18 +1,29 @@
+import argparse
+import json
 import pygame
 import sys
 import math
 import os
+import time
+from collections import OrderedDict
+from itertools import chain
 
-# Supress ALSA warnings by redirecting stderr to null
-sys.stderr = open(os.devnull, 'w')
+from periodic_core import (ELEMENTS, COMPOUNDS, PERIODIC_TABLE_LAYOUT,
+                           show_element_info, show_compound_info, check_compound)
+from hinting import CompoundHints
+from decompose import decompose, objective_weights
+from balance import formation_reaction
+from search import SearchIndex
+from frame_profiler import FrameProfiler, NullProfiler
+from event_log import EventRecorder, ReplayEvents, read_log
 
-# Initialize Pygame
-pygame.init()
-
-# Set up display
-WIDTH, HEIGHT = 1280, 720
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Periodic Combinator - Periodic Table")
+# The layout is designed for a 1280x720 window, and scaled to fit the real one
+BASE_WIDTH, BASE_HEIGHT = 1280, 720
+# Window size; apply_layout changes it when the window is resized
+WIDTH, HEIGHT = BASE_WIDTH, BASE_HEIGHT
+# Sizes are scaled in steps of 1/SCALE_STEPS, so resizing the window only
+# rebuilds the cached table, text and shell drawings when it crosses a step
+SCALE_STEPS = 8
 
 # Define colors
 BACKGROUND = (44, 44, 47)
@@ -20,262 +31,175 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 100, 100)
 ELEMENT_FONT_COLOR = (82, 87, 93)
+GREY = (150, 150, 150)
+
+# The window is created by init_display when the GUI starts,
+# and the fonts by apply_layout once pygame is running
+screen = None
+font = None
+large_font = None
+bold_font = None
+element_font = None
+popup_font = None
+hint_font = None
+badge_font = None
+
+
+def init_display(size=None):
+    global screen
+    # Supress ALSA warnings by pointing stderr at null while pygame starts up,
+    # then put it back so tracebacks are still shown
+    saved_stderr = os.dup(2)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 2)
+    try:
+        # Initialize Pygame
+        pygame.init()
+    finally:
+        os.dup2(saved_stderr, 2)
+        os.close(devnull)
+        os.close(saved_stderr)
+
+    # Set up a window that can be resized, at the last size used unless told otherwise
+    screen = pygame.display.set_mode(size or (WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Periodic Combinator - Periodic Table")
+    # Fonts don't outlive pygame.quit(), so don't reuse any (or their text) from an earlier run
+    font_cache.clear()
+    text_cache.clear()
+    # Lay everything out (and load the fonts) for the size the window ended up
+    apply_layout(*screen.get_size())
+
+
+def resize_display(width, height):
+    # Follow the window to its new size. SDL resizes the window surface
+    # itself; set_mode is only needed when nothing has (e.g. replays)
+    global screen
+    screen = pygame.display.get_surface()
+    if screen.get_size() != (width, height):
+        screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
+    apply_layout(*screen.get_size())
+
+
+def layout_scale(width, height):
+    # How much to scale the design by to fit the window, rounded down to a
+    # step so that it always fits and small changes in size don't change it
+    scale = min(width / BASE_WIDTH, height / BASE_HEIGHT)
+    return max(1, int(scale * SCALE_STEPS)) / SCALE_STEPS
+
+
+def scaled(size):
+    # A size in pixels from the 1280x720 design, at the current scale
+    return max(1, round(size * SCALE))
+
+
+# Fonts by size, so going back to a size reuses its fonts, and with them
+# the text already rendered in them
+font_cache = {}
+
+
+def load_font(size, bold=False):
+    key = (size, bold)
+    if key not in font_cache:
+        font_cache[key] = pygame.font.Font(None, size)
+        font_cache[key].set_bold(bold)
+    return font_cache[key]
+
 
-# Pastel colors for element groups
-ALKALI_METALS = (255, 204, 204)
-ALKALINE_EARTH_METALS = (255, 229, 204)
-TRANSITION_METALS = (255, 255, 204)
-POST_TRANSITION_METALS = (229, 255, 204)
-METALLOIDS = (204, 255, 204)
-NONMETALS = (204, 255, 229)
-HALOGENS = (204, 229, 255)
-NOBLE_GASES = (229, 204, 255)
-LANTHANIDES = (255, 204, 229)
-ACTINIDES = (255, 229, 204)
-
-# Set up fonts
-# Default font for general text, size 29
-font = pygame.font.Font(None, 29)
-# Larger font for headings or emphasized text
-large_font = pygame.font.Font(None, 36)
-# Bold font for emphasis, size 33
-bold_font = pygame.font.Font(None, 33)
-bold_font.set_bold(True) # Set this font to bold
-
-element_font = pygame.font.Font(None, 28)
-# Font for popups, size 46
-popup_font = pygame.font.Font(None, 46)
-
-# Element cell size
-CELL_SIZE = 53          # Size of each element cell in pixels
-GRID_PADDING = 4        # Padding between cells in pixels
-TABLE_OFFSET_X = 80     # Horizontal offset for the entire periodic table
-
-# Define elements
-ELEMENTS = {
-    # Hydrogen and Helium
-    'H': {'name': 'Hydrogen', 'color': NONMETALS, 'atomic_number': 1, 'mass': 1.008, 'electron_config': '1s1', 'shells': [1]},
-    'He': {'name': 'Helium', 'color': NOBLE_GASES, 'atomic_number': 2, 'mass': 4.0026, 'electron_config': '1s2', 'shells': [2]},
-
-    # Alkali Metals
-    'Li': {'name': 'Lithium', 'color': ALKALI_METALS, 'atomic_number': 3, 'mass': 6.94, 'electron_config': '1s2 2s1', 'shells': [2, 1]},
-    'Na': {'name': 'Sodium', 'color': ALKALI_METALS, 'atomic_number': 11, 'mass': 22.990, 'electron_config': '[Ne] 3s1', 'shells': [2, 8, 1]},
-    'K': {'name': 'Potassium', 'color': ALKALI_METALS, 'atomic_number': 19, 'mass': 39.098, 'electron_config': '[Ar] 4s1', 'shells': [2, 8, 8, 1]},
-    'Rb': {'name': 'Rubidium', 'color': ALKALI_METALS, 'atomic_number': 37, 'mass': 85.468, 'electron_config': '[Kr] 5s1', 'shells': [2, 8, 18, 8, 1]},
-    'Cs': {'name': 'Cesium', 'color': ALKALI_METALS, 'atomic_number': 55, 'mass': 132.905, 'electron_config': '[Xe] 6s1', 'shells': [2, 8, 18, 18, 8, 1]},
-    'Fr': {'name': 'Francium', 'color': ALKALI_METALS, 'atomic_number': 87, 'mass': 223, 'electron_config': '[Rn] 7s1', 'shells': [2, 8, 18, 32, 18, 8, 1]},
-
-    # Alkaline Earth Metals
-    'Be': {'name': 'Beryllium', 'color': ALKALINE_EARTH_METALS, 'atomic_number': 4, 'mass': 9.0122, 'electron_config': '1s2 2s2', 'shells': [2, 2]},
-    'Mg': {'name': 'Magnesium', 'color': ALKALINE_EARTH_METALS, 'atomic_number': 12, 'mass': 24.305, 'electron_config': '[Ne] 3s2', 'shells': [2, 8, 2]},
-    'Ca': {'name': 'Calcium', 'color': ALKALINE_EARTH_METALS, 'atomic_number': 20, 'mass': 40.078, 'electron_config': '[Ar] 4s2', 'shells': [2, 8, 8, 2]},
-    'Sr': {'name': 'Strontium', 'color': ALKALINE_EARTH_METALS, 'atomic_number': 38, 'mass': 87.62, 'electron_config': '[Kr] 5s2', 'shells': [2, 8, 18, 8, 2]},
-    'Ba': {'name': 'Barium', 'color': ALKALINE_EARTH_METALS, 'atomic_number': 56, 'mass': 137.327, 'electron_config': '[Xe] 6s2', 'shells': [2, 8, 18, 18, 8, 2]},
-    'Ra': {'name': 'Radium', 'color': ALKALINE_EARTH_METALS, 'atomic_number': 88, 'mass': 226, 'electron_config': '[Rn] 7s2', 'shells': [2, 8, 18, 32, 18, 8, 2]},
-
-    # Transition Metals
-    'Sc': {'name': 'Scandium', 'color': TRANSITION_METALS, 'atomic_number': 21, 'mass': 44.955, 'electron_config': '[Ar] 3d1 4s2', 'shells': [2, 8, 9, 2]},
-    'Ti': {'name': 'Titanium', 'color': TRANSITION_METALS, 'atomic_number': 22, 'mass': 47.867, 'electron_config': '[Ar] 3d2 4s2', 'shells': [2, 8, 10, 2]},
-    'V': {'name': 'Vanadium', 'color': TRANSITION_METALS, 'atomic_number': 23, 'mass': 50.942, 'electron_config': '[Ar] 3d3 4s2', 'shells': [2, 8, 11, 2]},
-    'Cr': {'name': 'Chromium', 'color': TRANSITION_METALS, 'atomic_number': 24, 'mass': 51.996, 'electron_config': '[Ar] 3d5 4s1', 'shells': [2, 8, 13, 1]},
-    'Mn': {'name': 'Manganese', 'color': TRANSITION_METALS, 'atomic_number': 25, 'mass': 54.938, 'electron_config': '[Ar] 3d5 4s2', 'shells': [2, 8, 13, 2]},
-    'Fe': {'name': 'Iron', 'color': TRANSITION_METALS, 'atomic_number': 26, 'mass': 55.845, 'electron_config': '[Ar] 3d6 4s2', 'shells': [2, 8, 14, 2]},
-    'Co': {'name': 'Cobalt', 'color': TRANSITION_METALS, 'atomic_number': 27, 'mass': 58.933, 'electron_config': '[Ar] 3d7 4s2', 'shells': [2, 8, 15, 2]},
-    'Ni': {'name': 'Nickel', 'color': TRANSITION_METALS, 'atomic_number': 28, 'mass': 58.693, 'electron_config': '[Ar] 3d8 4s2', 'shells': [2, 8, 16, 2]},
-    'Cu': {'name': 'Copper', 'color': TRANSITION_METALS, 'atomic_number': 29, 'mass': 63.546, 'electron_config': '[Ar] 3d10 4s1', 'shells': [2, 8, 18, 1]},
-    'Zn': {'name': 'Zinc', 'color': TRANSITION_METALS, 'atomic_number': 30, 'mass': 65.38, 'electron_config': '[Ar] 3d10 4s2', 'shells': [2, 8, 18, 2]},
-    # More transition metals...
-    'Ag': {'name': 'Silver', 'color': TRANSITION_METALS, 'atomic_number': 47, 'mass': 107.868, 'electron_config': '[Kr] 4d10 5s1', 'shells': [2, 8, 18, 18, 1]},
-    'Au': {'name': 'Gold', 'color': TRANSITION_METALS, 'atomic_number': 79, 'mass': 196.967, 'electron_config': '[Xe] 4f14 5d10 6s1', 'shells': [2, 8, 18, 32, 18, 1]},
-
-    # Post-Transition Metals
-    'Al': {'name': 'Aluminum', 'color': POST_TRANSITION_METALS, 'atomic_number': 13, 'mass': 26.982, 'electron_config': '[Ne] 3s2 3p1', 'shells': [2, 8, 3]},
-    'Ga': {'name': 'Gallium', 'color': POST_TRANSITION_METALS, 'atomic_number': 31, 'mass': 69.723, 'electron_config': '[Ar] 3d10 4s2 4p1', 'shells': [2, 8, 18, 3]},
-    'In': {'name': 'Indium', 'color': POST_TRANSITION_METALS, 'atomic_number': 49, 'mass': 114.818, 'electron_config': '[Kr] 4d10 5s2 5p1', 'shells': [2, 8, 18, 18, 3]},
-    'Sn': {'name': 'Tin', 'color': POST_TRANSITION_METALS, 'atomic_number': 50, 'mass': 118.710, 'electron_config': '[Kr] 4d10 5s2 5p2', 'shells': [2, 8, 18, 18, 4]},
-    'Pb': {'name': 'Lead', 'color': POST_TRANSITION_METALS, 'atomic_number': 82, 'mass': 207.2, 'electron_config': '[Xe] 4f14 5d10 6s2 6p2', 'shells': [2, 8, 18, 32, 18, 4]},
-
-    # Metalloids
-    'B': {'name': 'Boron', 'color': METALLOIDS, 'atomic_number': 5, 'mass': 10.81, 'electron_config': '1s2 2s2 2p1', 'shells': [2, 3]},
-    'Si': {'name': 'Silicon', 'color': METALLOIDS, 'atomic_number': 14, 'mass': 28.085, 'electron_config': '[Ne] 3s2 3p2', 'shells': [2, 8, 4]},
-    'Ge': {'name': 'Germanium', 'color': METALLOIDS, 'atomic_number': 32, 'mass': 72.63, 'electron_config': '[Ar] 3d10 4s2 4p2', 'shells': [2, 8, 18, 4]},
-    'As': {'name': 'Arsenic', 'color': METALLOIDS, 'atomic_number': 33, 'mass': 74.922, 'electron_config': '[Ar] 3d10 4s2 4p3', 'shells': [2, 8, 18, 5]},
-    'Sb': {'name': 'Antimony', 'color': METALLOIDS, 'atomic_number': 51, 'mass': 121.760, 'electron_config': '[Kr] 4d10 5s2 5p3', 'shells': [2, 8, 18, 18, 5]},
-    'Te': {'name': 'Tellurium', 'color': METALLOIDS, 'atomic_number': 52, 'mass': 127.60, 'electron_config': '[Kr] 4d10 5s2 5p4', 'shells': [2, 8, 18, 18, 6]},
-
-    # Nonmetals
-    'C': {'name': 'Carbon', 'color': NONMETALS, 'atomic_number': 6, 'mass': 12.011, 'electron_config': '1s2 2s2 2p2', 'shells': [2, 4]},
-    'N': {'name': 'Nitrogen', 'color': NONMETALS, 'atomic_number': 7, 'mass': 14.007, 'electron_config': '1s2 2s2 2p3', 'shells': [2, 5]},
-    'O': {'name': 'Oxygen', 'color': NONMETALS, 'atomic_number': 8, 'mass': 15.999, 'electron_config': '1s2 2s2 2p4', 'shells': [2, 6]},
-    'P': {'name': 'Phosphorus', 'color': NONMETALS, 'atomic_number': 15, 'mass': 30.974, 'electron_config': '[Ne] 3s2 3p3', 'shells': [2, 8, 5]},
-    'S': {'name': 'Sulfur', 'color': NONMETALS, 'atomic_number': 16, 'mass': 32.06, 'electron_config': '[Ne] 3s2 3p4', 'shells': [2, 8, 6]},
-    'Se': {'name': 'Selenium', 'color': NONMETALS, 'atomic_number': 34, 'mass': 78.96, 'electron_config': '[Ar] 3d10 4s2 4p4', 'shells': [2, 8, 18, 6]},
-
-    # Halogens
-    'F': {'name': 'Fluorine', 'color': HALOGENS, 'atomic_number': 9, 'mass': 18.998, 'electron_config': '1s2 2s2 2p5', 'shells': [2, 7]},
-    'Cl': {'name': 'Chlorine', 'color': HALOGENS, 'atomic_number': 17, 'mass': 35.45, 'electron_config': '[Ne] 3s2 3p5', 'shells': [2, 8, 7]},
-    'Br': {'name': 'Bromine', 'color': HALOGENS, 'atomic_number': 35, 'mass': 79.904, 'electron_config': '[Ar] 3d10 4s2 4p5', 'shells': [2, 8, 18, 7]},
-    'I': {'name': 'Iodine', 'color': HALOGENS, 'atomic_number': 53, 'mass': 126.90, 'electron_config': '[Kr] 4d10 5s2 5p5', 'shells': [2, 8, 18, 18, 7]},
-    'At': {'name': 'Astatine', 'color': HALOGENS, 'atomic_number': 85, 'mass': 210, 'electron_config': '[Xe] 4f14 5d10 6s2 6p5', 'shells': [2, 8, 18, 32, 18, 7]},
-
-    # Noble Gases
-    'Ne': {'name': 'Neon', 'color': NOBLE_GASES, 'atomic_number': 10, 'mass': 20.180, 'electron_config': '1s2 2s2 2p6', 'shells': [2, 8]},
-    'Ar': {'name': 'Argon', 'color': NOBLE_GASES, 'atomic_number': 18, 'mass': 39.948, 'electron_config': '[Ne] 3s2 3p6', 'shells': [2, 8, 8]},
-    'Kr': {'name': 'Krypton', 'color': NOBLE_GASES, 'atomic_number': 36, 'mass': 83.798, 'electron_config': '[Ar] 3d10 4s2 4p6', 'shells': [2, 8, 18, 8]},
-    'Xe': {'name': 'Xenon', 'color': NOBLE_GASES, 'atomic_number': 54, 'mass': 131.293, 'electron_config': '[Kr] 4d10 5s2 5p6', 'shells': [2, 8, 18, 18, 8]},
-    'Rn': {'name': 'Radon', 'color': NOBLE_GASES, 'atomic_number': 86, 'mass': 222, 'electron_config': '[Xe] 4f14 5d10 6s2 6p6', 'shells': [2, 8, 18, 32, 18, 8]},
-
-    # Lanthanides
-    'La': {'name': 'Lanthanum', 'color': LANTHANIDES, 'atomic_number': 57, 'mass': 138.905, 'electron_config': '[Xe] 5d1 6s2', 'shells': [2, 8, 18, 18, 9, 2]},
-    'Ce': {'name': 'Cerium', 'color': LANTHANIDES, 'atomic_number': 58, 'mass': 140.116, 'electron_config': '[Xe] 4f1 5d1 6s2', 'shells': [2, 8, 18, 19, 9, 2]},
-    'Pr': {'name': 'Praseodymium', 'color': LANTHANIDES, 'atomic_number': 59, 'mass': 140.907, 'electron_config': '[Xe] 4f3 6s2', 'shells': [2, 8, 18, 21, 8, 2]},
-    'Nd': {'name': 'Neodymium', 'color': LANTHANIDES, 'atomic_number': 60, 'mass': 144.242, 'electron_config': '[Xe] 4f4 6s2', 'shells': [2, 8, 18, 22, 8, 2]},
-    'Pm': {'name': 'Promethium', 'color': LANTHANIDES, 'atomic_number': 61, 'mass': 145, 'electron_config': '[Xe] 4f5 6s2', 'shells': [2, 8, 18, 23, 8, 2]},
-    'Sm': {'name': 'Samarium', 'color': LANTHANIDES, 'atomic_number': 62, 'mass': 150.36, 'electron_config': '[Xe] 4f6 6s2', 'shells': [2, 8, 18, 24, 8, 2]},
-    'Eu': {'name': 'Europium', 'color': LANTHANIDES, 'atomic_number': 63, 'mass': 151.964, 'electron_config': '[Xe] 4f7 6s2', 'shells': [2, 8, 18, 25, 8, 2]},
-    'Gd': {'name': 'Gadolinium', 'color': LANTHANIDES, 'atomic_number': 64, 'mass': 157.25, 'electron_config': '[Xe] 4f7 5d1 6s2', 'shells': [2, 8, 18, 25, 9, 2]},
-    'Tb': {'name': 'Terbium', 'color': LANTHANIDES, 'atomic_number': 65, 'mass': 158.925, 'electron_config': '[Xe] 4f9 6s2', 'shells': [2, 8, 18, 27, 8, 2]},
-    'Dy': {'name': 'Dysprosium', 'color': LANTHANIDES, 'atomic_number': 66, 'mass': 162.500, 'electron_config': '[Xe] 4f10 6s2', 'shells': [2, 8, 18, 28, 8, 2]},
-    'Ho': {'name': 'Holmium', 'color': LANTHANIDES, 'atomic_number': 67, 'mass': 164.930, 'electron_config': '[Xe] 4f11 6s2', 'shells': [2, 8, 18, 29, 8, 2]},
-    'Er': {'name': 'Erbium', 'color': LANTHANIDES, 'atomic_number': 68, 'mass': 167.259, 'electron_config': '[Xe] 4f12 6s2', 'shells': [2, 8, 18, 30, 8, 2]},
-    'Tm': {'name': 'Thulium', 'color': LANTHANIDES, 'atomic_number': 69, 'mass': 168.934, 'electron_config': '[Xe] 4f13 6s2', 'shells': [2, 8, 18, 31, 8, 2]},
-    'Yb': {'name': 'Ytterbium', 'color': LANTHANIDES, 'atomic_number': 70, 'mass': 173.04, 'electron_config': '[Xe] 4f14 6s2', 'shells': [2, 8, 18, 32, 8, 2]},
-    'Lu': {'name': 'Lutetium', 'color': LANTHANIDES, 'atomic_number': 71, 'mass': 174.966, 'electron_config': '[Xe] 4f14 5d1 6s2', 'shells': [2, 8, 18, 32, 9, 2]},
-
-    # Actinides
-    'Th': {'name': 'Thorium', 'color': ACTINIDES, 'atomic_number': 90, 'mass': 232.038, 'electron_config': '[Rn] 6d2 7s2', 'shells': [2, 8, 18, 32, 18, 10, 2]},
-    'Pa': {'name': 'Protactinium', 'color': ACTINIDES, 'atomic_number': 91, 'mass': 231.035, 'electron_config': '[Rn] 5f2 6d1 7s2', 'shells': [2, 8, 18, 32, 20, 9, 2]},
-    'U': {'name': 'Uranium', 'color': ACTINIDES, 'atomic_number': 92, 'mass': 238.029, 'electron_config': '[Rn] 5f3 6d1 7s2', 'shells': [2, 8, 18, 32, 21, 9, 2]},
-    'Np': {'name': 'Neptunium', 'color': ACTINIDES, 'atomic_number': 93, 'mass': 237, 'electron_config': '[Rn] 5f4 6d1 7s2', 'shells': [2, 8, 18, 32, 22, 9, 2]},
-    'Pu': {'name': 'Plutonium', 'color': ACTINIDES, 'atomic_number': 94, 'mass': 244, 'electron_config': '[Rn] 5f6 7s2', 'shells': [2, 8, 18, 32, 24, 8, 2]},
-    'Am': {'name': 'Americium', 'color': ACTINIDES, 'atomic_number': 95, 'mass': 243, 'electron_config': '[Rn] 5f7 7s2', 'shells': [2, 8, 18, 32, 25, 8, 2]},
-    'Cm': {'name': 'Curium', 'color': ACTINIDES, 'atomic_number': 96, 'mass': 247, 'electron_config': '[Rn] 5f7 6d1 7s2', 'shells': [2, 8, 18, 32, 25, 9, 2]},
-    'Bk': {'name': 'Berkelium', 'color': ACTINIDES, 'atomic_number': 97, 'mass': 247, 'electron_config': '[Rn] 5f9 7s2', 'shells': [2, 8, 18, 32, 27, 8, 2]},
-    'Cf': {'name': 'Californium', 'color': ACTINIDES, 'atomic_number': 98, 'mass': 251, 'electron_config': '[Rn] 5f10 7s2', 'shells': [2, 8, 18, 32, 28, 8, 2]},
-    'Es': {'name': 'Einsteinium', 'color': ACTINIDES, 'atomic_number': 99, 'mass': 252, 'electron_config': '[Rn] 5f11 7s2', 'shells': [2, 8, 18, 32, 29, 8, 2]},
-    'Fm': {'name': 'Fermium', 'color': ACTINIDES, 'atomic_number': 100, 'mass': 257, 'electron_config': '[Rn] 5f12 7s2', 'shells': [2, 8, 18, 32, 30, 8, 2]},
-    'Md': {'name': 'Mendelevium', 'color': ACTINIDES, 'atomic_number': 101, 'mass': 258, 'electron_config': '[Rn] 5f13 7s2', 'shells': [2, 8, 18, 32, 31, 8, 2]},
-    'No': {'name': 'Nobelium', 'color': ACTINIDES, 'atomic_number': 102, 'mass': 259, 'electron_config': '[Rn] 5f14 7s2', 'shells': [2, 8, 18, 32, 32, 8, 2]},
-    'Lr': {'name': 'Lawrencium', 'color': ACTINIDES, 'atomic_number': 103, 'mass': 262, 'electron_config': '[Rn] 5f14 7s2 7p1', 'shells': [2, 8, 18, 32, 32, 8, 3]},
-}
-
-
-# Define compounds
-COMPOUNDS = {
-    'H2O': {'elements': ['H', 'H', 'O'], 'name': 'Water', 'uses': 'Essential for life, solvent', 'properties': 'Colorless, odorless liquid'},
-    'CO2': {'elements': ['C', 'O', 'O'], 'name': 'Carbon Dioxide', 'uses': 'Carbonated drinks, plant photosynthesis', 'properties': 'Colorless gas, soluble in water'},
-    'NaCl': {'elements': ['Na', 'Cl'], 'name': 'Sodium Chloride', 'uses': 'Table salt, food preservative', 'properties': 'White crystalline solid, soluble in water'},
-    'CH4': {'elements': ['C', 'H', 'H', 'H', 'H'], 'name': 'Methane', 'uses': 'Natural gas, fuel', 'properties': 'Colorless, odorless gas'},
-    'NH3': {'elements': ['N', 'H', 'H', 'H'], 'name': 'Ammonia', 'uses': 'Fertilizer, cleaner', 'properties': 'Colorless gas with a strong odor'},
-    'C6H12O6': {'elements': ['C', 'H', 'O', 'C', 'H', 'O', 'C', 'H', 'O', 'C', 'H', 'O', 'C', 'H', 'O'], 'name': 'Glucose', 'uses': 'Energy source in cells', 'properties': 'White crystalline solid, soluble in water'},
-    'H2SO4': {'elements': ['H', 'H', 'S', 'O', 'O', 'O', 'O'], 'name': 'Sulfuric Acid', 'uses': 'Manufacturing, battery acid', 'properties': 'Colorless, oily liquid, very corrosive'},
-    'C2H5OH': {'elements': ['C', 'H', 'H', 'H', 'H', 'H', 'C', 'H', 'O', 'H'], 'name': 'Ethanol', 'uses': 'Alcoholic beverages, solvent, fuel', 'properties': 'Colorless, volatile liquid with a distinctive odor'},
-    'CaCO3': {'elements': ['Ca', 'C', 'O', 'O', 'O'], 'name': 'Calcium Carbonate', 'uses': 'Antacid, construction', 'properties': 'White, insoluble solid'},
-    'NaOH': {'elements': ['Na', 'O', 'H'], 'name': 'Sodium Hydroxide', 'uses': 'Soap making, drain cleaner', 'properties': 'White solid, very corrosive'},
-    'HCl': {'elements': ['H', 'Cl'], 'name': 'Hydrochloric Acid', 'uses': 'Stomach acid, industrial applications', 'properties': 'Colorless to light yellow liquid, highly corrosive'},
-    'KNO3': {'elements': ['K', 'N', 'O', 'O', 'O'], 'name': 'Potassium Nitrate', 'uses': 'Fertilizer, food preservation', 'properties': 'White crystalline solid, soluble in water'},
-    'NaHCO3': {'elements': ['Na', 'H', 'C', 'O', 'O', 'O'], 'name': 'Sodium Bicarbonate', 'uses': 'Baking soda, antacid', 'properties': 'White crystalline solid, soluble in water'},
-    'H2O2': {'elements': ['H', 'H', 'O', 'O'], 'name': 'Hydrogen Peroxide', 'uses': 'Disinfectant, bleaching agent', 'properties': 'Colorless liquid, unstable'},
-    'CaSO4': {'elements': ['Ca', 'S', 'O', 'O', 'O', 'O'], 'name': 'Calcium Sulfate', 'uses': 'Plaster, construction', 'properties': 'White crystalline solid, slightly soluble in water'},
-    'HNO3': {'elements': ['H', 'N', 'O', 'O', 'O'], 'name': 'Nitric Acid', 'uses': 'Fertilizer production, explosives', 'properties': 'Colorless to yellowish liquid, highly corrosive'},
-    'C12H22O11': {'elements': ['C', 'H', 'O'], 'name': 'Sucrose', 'uses': 'Table sugar, food sweetener', 'properties': 'White crystalline solid, soluble in water'},
-    'CH3OH': {'elements': ['C', 'H', 'H', 'H', 'O', 'H'], 'name': 'Methanol', 'uses': 'Solvent, antifreeze, fuel', 'properties': 'Colorless, volatile liquid, poisonous'},
-    'C2H4': {'elements': ['C', 'H', 'H', 'C', 'H', 'H'], 'name': 'Ethylene', 'uses': 'Plastic production, ripening agent', 'properties': 'Colorless gas, sweet odor'},
-    'C3H8': {'elements': ['C', 'H', 'H', 'H', 'C', 'H', 'H', 'H', 'C', 'H', 'H', 'H'], 'name': 'Propane', 'uses': 'Fuel, heating', 'properties': 'Colorless, odorless gas'},
-    'C4H10': {'elements': ['C', 'H', 'H', 'H', 'C', 'H', 'H', 'H', 'C', 'H', 'H', 'H', 'C', 'H', 'H', 'H'], 'name': 'Butane', 'uses': 'Fuel, lighter fluid', 'properties': 'Colorless, odorless gas'},
-    'C2H2': {'elements': ['C', 'H', 'C', 'H'], 'name': 'Acetylene', 'uses': 'Welding, chemical synthesis', 'properties': 'Colorless gas, sweet odor'},
-    'C6H6': {'elements': ['C', 'H', 'C', 'H', 'C', 'H', 'C', 'H', 'C', 'H', 'C', 'H'], 'name': 'Benzene', 'uses': 'Solvent, precursor in chemical synthesis', 'properties': 'Colorless liquid, sweet odor, carcinogenic'},
-    'C3H6O': {'elements': ['C', 'H', 'H', 'H', 'C', 'H', 'H', 'O', 'C', 'H', 'H', 'H'], 'name': 'Acetone', 'uses': 'Solvent, nail polish remover', 'properties': 'Colorless liquid, sweet odor'},
-    'C7H8': {'elements': ['C', 'H', 'C', 'H', 'C', 'H', 'C', 'H', 'C', 'H', 'C', 'H', 'C', 'H'], 'name': 'Toluene', 'uses': 'Solvent, paint thinner', 'properties': 'Colorless liquid, sweet odor'},
-    'H2S': {'elements': ['H', 'H', 'S'], 'name': 'Hydrogen Sulfide', 'uses': 'Chemical precursor, produced by bacteria', 'properties': 'Colorless gas, rotten egg smell, toxic'},
-    'HBr': {'elements': ['H', 'Br'], 'name': 'Hydrobromic Acid', 'uses': 'Chemical synthesis, catalyst', 'properties': 'Colorless to pale yellow liquid, highly corrosive'},
-    'HI': {'elements': ['H', 'I'], 'name': 'Hydroiodic Acid', 'uses': 'Chemical synthesis, catalyst', 'properties': 'Colorless liquid, highly corrosive'},
-    'HF': {'elements': ['H', 'F'], 'name': 'Hydrofluoric Acid', 'uses': 'Glass etching, chemical synthesis', 'properties': 'Colorless liquid, highly corrosive'},
-    'SO2': {'elements': ['S', 'O', 'O'], 'name': 'Sulfur Dioxide', 'uses': 'Preservative, bleaching agent', 'properties': 'Colorless gas, pungent odor'},
-    'SO3': {'elements': ['S', 'O', 'O', 'O'], 'name': 'Sulfur Trioxide', 'uses': 'Sulfuric acid production', 'properties': 'Colorless liquid, very corrosive'},
-    'NO2': {'elements': ['N', 'O', 'O'], 'name': 'Nitrogen Dioxide', 'uses': 'Pollutant, used in chemical synthesis', 'properties': 'Brown gas, pungent odor'},
-    'N2O': {'elements': ['N', 'N', 'O'], 'name': 'Nitrous Oxide', 'uses': 'Anesthetic, fuel oxidizer', 'properties': 'Colorless gas, slightly sweet odor'},
-    'N2H4': {'elements': ['N', 'N', 'H', 'H', 'H', 'H'], 'name': 'Hydrazine', 'uses': 'Rocket propellant, chemical synthesis', 'properties': 'Colorless liquid, toxic'},
-    'H2CO3': {'elements': ['H', 'H', 'C', 'O', 'O', 'O'], 'name': 'Carbonic Acid', 'uses': 'Soda production, buffer', 'properties': 'Weak acid, found in carbonated beverages'},
-    'H3PO4': {'elements': ['H', 'H', 'H', 'P', 'O', 'O', 'O', 'O'], 'name': 'Phosphoric Acid', 'uses': 'Fertilizers, food additive', 'properties': 'Colorless liquid, mildly acidic'},
-    'Na2CO3': {'elements': ['Na', 'Na', 'C', 'O', 'O', 'O'], 'name': 'Sodium Carbonate', 'uses': 'Glass making, water softening', 'properties': 'White crystalline solid, soluble in water'},
-    'K2CO3': {'elements': ['K', 'K', 'C', 'O', 'O', 'O'], 'name': 'Potassium Carbonate', 'uses': 'Soap making, glass production', 'properties': 'White crystalline solid, soluble in water'},
-    'CaCl2': {'elements': ['Ca', 'Cl', 'Cl'], 'name': 'Calcium Chloride', 'uses': 'De-icing, food additive', 'properties': 'White crystalline solid, soluble in water'},
-    'NaClO': {'elements': ['Na', 'Cl', 'O'], 'name': 'Sodium Hypochlorite', 'uses': 'Bleach, disinfectant', 'properties': 'Colorless to pale green liquid, strong oxidizer'},
-    'CaClO2': {'elements': ['Ca', 'Cl', 'O', 'O'], 'name': 'Calcium Hypochlorite', 'uses': 'Water treatment, bleaching agent', 'properties': 'White crystalline solid, strong oxidizer'},
-    'MgSO4': {'elements': ['Mg', 'S', 'O', 'O', 'O', 'O'], 'name': 'Magnesium Sulfate', 'uses': 'Laxative, Epsom salts', 'properties': 'White crystalline solid, soluble in water'},
-    'ZnSO4': {'elements': ['Zn', 'S', 'O', 'O', 'O', 'O'], 'name': 'Zinc Sulfate', 'uses': 'Dietary supplement, industrial applications', 'properties': 'White crystalline solid, soluble in water'},
-    'CuSO4': {'elements': ['Cu', 'S', 'O', 'O', 'O', 'O'], 'name': 'Copper Sulfate', 'uses': 'Fungicide, algicide', 'properties': 'Blue crystalline solid, soluble in water'},
-    'FeSO4': {'elements': ['Fe', 'S', 'O', 'O', 'O', 'O'], 'name': 'Iron(II) Sulfate', 'uses': 'Dietary supplement, industrial applications', 'properties': 'Green crystalline solid, soluble in water'},
-    'H2C2O4': {'elements': ['H', 'H', 'C', 'C', 'O', 'O', 'O', 'O'], 'name': 'Oxalic Acid', 'uses': 'Cleaning agent, bleaching agent', 'properties': 'Colorless crystalline solid, soluble in water'},
-    'Na2SO4': {'elements': ['Na', 'Na', 'S', 'O', 'O', 'O', 'O'], 'name': 'Sodium Sulfate', 'uses': 'Detergent manufacturing, paper production', 'properties': 'White crystalline solid, soluble in water'},
-    'Na2S2O3': {'elements': ['Na', 'Na', 'S', 'S', 'O', 'O', 'O'], 'name': 'Sodium Thiosulfate', 'uses': 'Photographic fixer, dechlorination', 'properties': 'White crystalline solid, soluble in water'},
-    'PbSO4': {'elements': ['Pb', 'S', 'O', 'O', 'O', 'O'], 'name': 'Lead(II) Sulfate', 'uses': 'Battery production', 'properties': 'White crystalline solid, slightly soluble in water'},
-    'BaSO4': {'elements': ['Ba', 'S', 'O', 'O', 'O', 'O'], 'name': 'Barium Sulfate', 'uses': 'Radiocontrast agent, pigment', 'properties': 'White crystalline solid, insoluble in water'},
-    'KOH': {'elements': ['K', 'O', 'H'], 'name': 'Potassium Hydroxide', 'uses': 'Soap making, electrolyte in batteries', 'properties': 'White solid, very corrosive'},
-    'Mg(OH)2': {'elements': ['Mg', 'O', 'H', 'O', 'H'], 'name': 'Magnesium Hydroxide', 'uses': 'Antacid, laxative', 'properties': 'White solid, insoluble in water'},
-    'Al(OH)3': {'elements': ['Al', 'O', 'H', 'O', 'H', 'O', 'H'], 'name': 'Aluminum Hydroxide', 'uses': 'Antacid, fire retardant', 'properties': 'White solid, insoluble in water'},
-    'Fe(OH)3': {'elements': ['Fe', 'O', 'H', 'O', 'H', 'O', 'H'], 'name': 'Iron(III) Hydroxide', 'uses': 'Pigment, water purification', 'properties': 'Brown solid, insoluble in water'},
-    'Cu(OH)2': {'elements': ['Cu', 'O', 'H', 'O', 'H'], 'name': 'Copper(II) Hydroxide', 'uses': 'Fungicide, pigment', 'properties': 'Blue solid, insoluble in water'},
-    'NaNO3': {'elements': ['Na', 'N', 'O', 'O', 'O'], 'name': 'Sodium Nitrate', 'uses': 'Fertilizer, food preservative', 'properties': 'White crystalline solid, soluble in water'},
-    'KNO3': {'elements': ['K', 'N', 'O', 'O', 'O'], 'name': 'Potassium Nitrate', 'uses': 'Fertilizer, food preservation', 'properties': 'White crystalline solid, soluble in water'},
-    'AgNO3': {'elements': ['Ag', 'N', 'O', 'O', 'O'], 'name': 'Silver Nitrate', 'uses': 'Antiseptic, photographic film', 'properties': 'Colorless crystalline solid, soluble in water'},
-    'NH4NO3': {'elements': ['N', 'H', 'H', 'H', 'H', 'N', 'O', 'O', 'O'], 'name': 'Ammonium Nitrate', 'uses': 'Fertilizer, explosive', 'properties': 'White crystalline solid, highly soluble in water'},
-    'Ca(NO3)2': {'elements': ['Ca', 'N', 'O', 'O', 'O', 'N', 'O', 'O', 'O'], 'name': 'Calcium Nitrate', 'uses': 'Fertilizer, concrete additive', 'properties': 'White crystalline solid, highly soluble in water'},
-    'Mg(NO3)2': {'elements': ['Mg', 'N', 'O', 'O', 'O', 'N', 'O', 'O', 'O'], 'name': 'Magnesium Nitrate', 'uses': 'Fertilizer, dehydrating agent', 'properties': 'White crystalline solid, soluble in water'},
-    'Pb(NO3)2': {'elements': ['Pb', 'N', 'O', 'O', 'O', 'N', 'O', 'O', 'O'], 'name': 'Lead(II) Nitrate', 'uses': 'Heat stabilizer, pyrotechnics', 'properties': 'White crystalline solid, soluble in water'},
-    'Na3PO4': {'elements': ['Na', 'Na', 'Na', 'P', 'O', 'O', 'O', 'O'], 'name': 'Trisodium Phosphate', 'uses': 'Cleaning agent, food additive', 'properties': 'White crystalline solid, soluble in water'},
-    'K3PO4': {'elements': ['K', 'K', 'K', 'P', 'O', 'O', 'O', 'O'], 'name': 'Tripotassium Phosphate', 'uses': 'Food additive, water softening', 'properties': 'White crystalline solid, soluble in water'},
-    'Ca3(PO4)2': {'elements': ['Ca', 'Ca', 'Ca', 'P', 'O', 'O', 'O', 'O', 'P', 'O', 'O', 'O', 'O'], 'name': 'Calcium Phosphate', 'uses': 'Fertilizer, food additive', 'properties': 'White crystalline solid, insoluble in water'},
-    'Mg3(PO4)2': {'elements': ['Mg', 'Mg', 'Mg', 'P', 'O', 'O', 'O', 'O', 'P', 'O', 'O', 'O', 'O'], 'name': 'Magnesium Phosphate', 'uses': 'Fertilizer, food additive', 'properties': 'White crystalline solid, insoluble in water'},
-    'AlPO4': {'elements': ['Al', 'P', 'O', 'O', 'O', 'O'], 'name': 'Aluminum Phosphate', 'uses': 'Antacid, dental cement', 'properties': 'White crystalline solid, insoluble in water'},
-    'Na3PO4': {'elements': ['Na', 'Na', 'Na', 'P', 'O', 'O', 'O', 'O'], 'name': 'Trisodium Phosphate', 'uses': 'Cleaning agent, food additive', 'properties': 'White crystalline solid, soluble in water'},
-    'Na2HPO4': {'elements': ['Na', 'Na', 'H', 'P', 'O', 'O', 'O', 'O'], 'name': 'Disodium Phosphate', 'uses': 'Food additive, buffering agent', 'properties': 'White crystalline solid, soluble in water'},
-    'NaH2PO4': {'elements': ['Na', 'H', 'H', 'P', 'O', 'O', 'O', 'O'], 'name': 'Monosodium Phosphate', 'uses': 'Food additive, buffering agent', 'properties': 'White crystalline solid, soluble in water'},
-    'K2HPO4': {'elements': ['K', 'K', 'H', 'P', 'O', 'O', 'O', 'O'], 'name': 'Dipotassium Phosphate', 'uses': 'Food additive, buffering agent', 'properties': 'White crystalline solid, soluble in water'},
-    'KH2PO4': {'elements': ['K', 'H', 'H', 'P', 'O', 'O', 'O', 'O'], 'name': 'Monopotassium Phosphate', 'uses': 'Food additive, buffering agent', 'properties': 'White crystalline solid, soluble in water'},
-    'Na2SiO3': {'elements': ['Na', 'Na', 'Si', 'O', 'O', 'O'], 'name': 'Sodium Silicate', 'uses': 'Adhesive, cement additive', 'properties': 'White crystalline solid, soluble in water'},
-    'K2SiO3': {'elements': ['K', 'K', 'Si', 'O', 'O', 'O'], 'name': 'Potassium Silicate', 'uses': 'Adhesive, cement additive', 'properties': 'White crystalline solid, soluble in water'},
-    'CaSiO3': {'elements': ['Ca', 'Si', 'O', 'O', 'O'], 'name': 'Calcium Silicate', 'uses': 'Cement additive, insulation material', 'properties': 'White crystalline solid, insoluble in water'},
-    'MgSiO3': {'elements': ['Mg', 'Si', 'O', 'O', 'O'], 'name': 'Magnesium Silicate', 'uses': 'Talc, cosmetics', 'properties': 'White crystalline solid, insoluble in water'},
-    'Al2SiO5': {'elements': ['Al', 'Al', 'Si', 'O', 'O', 'O', 'O', 'O', 'O'], 'name': 'Aluminum Silicate', 'uses': 'Ceramics, refractory material', 'properties': 'White crystalline solid, insoluble in water'},
-    'SiO2': {'elements': ['Si', 'O', 'O'], 'name': 'Silicon Dioxide', 'uses': 'Glass making, abrasives', 'properties': 'White crystalline solid, insoluble in water'},
-    'Fe2O3': {'elements': ['Fe', 'Fe', 'O', 'O', 'O'], 'name': 'Iron(III) Oxide', 'uses': 'Pigment, iron production', 'properties': 'Red-brown solid, insoluble in water'},
-    'Fe3O4': {'elements': ['Fe', 'Fe', 'Fe', 'O', 'O', 'O', 'O'], 'name': 'Magnetite', 'uses': 'Magnetic storage, iron production', 'properties': 'Black solid, insoluble in water'},
-    'Al2O3': {'elements': ['Al', 'Al', 'O', 'O', 'O'], 'name': 'Aluminum Oxide', 'uses': 'Abrasives, refractory material', 'properties': 'White solid, insoluble in water'},
-    'CaO': {'elements': ['Ca', 'O'], 'name': 'Calcium Oxide', 'uses': 'Cement, lime', 'properties': 'White solid, soluble in water'},
-    'MgO': {'elements': ['Mg', 'O'], 'name': 'Magnesium Oxide', 'uses': 'Refractory material, antacid', 'properties': 'White solid, soluble in water'},
-    'CuO': {'elements': ['Cu', 'O'], 'name': 'Copper(II) Oxide', 'uses': 'Pigment, catalyst', 'properties': 'Black solid, insoluble in water'},
-    'ZnO': {'elements': ['Zn', 'O'], 'name': 'Zinc Oxide', 'uses': 'Sunscreen, pigment', 'properties': 'White solid, insoluble in water'},
-    'PbO': {'elements': ['Pb', 'O'], 'name': 'Lead(II) Oxide', 'uses': 'Battery production, glass making', 'properties': 'Yellow solid, insoluble in water'},
-    'HgO': {'elements': ['Hg', 'O'], 'name': 'Mercury(II) Oxide', 'uses': 'Medicinal use, pigment', 'properties': 'Red or yellow solid, insoluble in water'},
-    'Ca(OH)2': {'elements': ['Ca', 'O', 'H', 'O', 'H'], 'name': 'Calcium Hydroxide', 'uses': 'Water treatment, plaster', 'properties': 'White solid, slightly soluble in water'},
-    'KOH': {'elements': ['K', 'O', 'H'], 'name': 'Potassium Hydroxide', 'uses': 'Soap making, electrolyte in batteries', 'properties': 'White solid, very corrosive'},
-    'NaOH': {'elements': ['Na', 'O', 'H'], 'name': 'Sodium Hydroxide', 'uses': 'Soap making, drain cleaner', 'properties': 'White solid, very corrosive'},
-    'Mg(OH)2': {'elements': ['Mg', 'O', 'H', 'O', 'H'], 'name': 'Magnesium Hydroxide', 'uses': 'Antacid, laxative', 'properties': 'White solid, insoluble in water'},
-    'Al(OH)3': {'elements': ['Al', 'O', 'H', 'O', 'H', 'O', 'H'], 'name': 'Aluminum Hydroxide', 'uses': 'Antacid, fire retardant', 'properties': 'White solid, insoluble in water'},
-    'Fe(OH)3': {'elements': ['Fe', 'O', 'H', 'O', 'H', 'O', 'H'], 'name': 'Iron(III) Hydroxide', 'uses': 'Pigment, water purification', 'properties': 'Brown solid, insoluble in water'},
-    'Cu(OH)2': {'elements': ['Cu', 'O', 'H', 'O', 'H'], 'name': 'Copper(II) Hydroxide', 'uses': 'Fungicide, pigment', 'properties': 'Blue solid, insoluble in water'},
-}
-
-
-
-# Define the layout of the periodic table
-PERIODIC_TABLE_LAYOUT = [
-    ['H', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', 'He'],
-    ['Li', 'Be', '', '', '', '', '', '', '', '', '', '', 'B', 'C', 'N', 'O', 'F', 'Ne'],
-    ['Na', 'Mg', '', '', '', '', '', '', '', '', '', '', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar'],
-    ['K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr'],
-    ['Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe'],
-    ['Cs', 'Ba', 'La', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn'],
-    ['Fr', 'Ra', 'Ac', 'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og'],
-    ['', '', '*', '', '', '', '', '', '', '', '', '', '', '', '', '', '', ''],
-    ['', '', '#', '', '', '', '', '', '', '', '', '', '', '', '', '', '', ''],
-    ['', '', '*La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu', ''],
-    ['', '', '#Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr', '']
-]
-
-def draw_element(element, x, y, angle=0):
+def apply_layout(width, height):
+    # Size and place everything for a width x height window. Sizes come from
+    # the design scaled by layout_scale; positions follow the window's edges,
+    # so the panels stay on the right and the information at the bottom.
+    global WIDTH, HEIGHT, SCALE, CELL_SIZE, GRID_PADDING, TABLE_OFFSET_X, HUD_POS
+    global MERGE_AREA_RECT, ELECTRON_SHELL_RECT, MERGE_BUTTON, INFO_RECT, HINT_RECT
+    global INFO_DIRTY_RECT, SEARCH_RECT, SEARCH_RESULTS_RECT, SEARCH_LINE_HEIGHT
+    global BADGE_SIZE, BADGE_GAP, BADGE_MARGIN
+    global font, large_font, bold_font, element_font, popup_font, hint_font, badge_font
+    WIDTH, HEIGHT = width, height
+    SCALE = layout_scale(width, height)
+
+    # Element cell size
+    CELL_SIZE = scaled(53)          # Size of each element cell in pixels
+    GRID_PADDING = scaled(4)        # Padding between cells in pixels
+    TABLE_OFFSET_X = scaled(80)     # Horizontal offset for the entire periodic table
+
+    # Where the performance HUD goes (toggled with F3)
+    HUD_POS = (scaled(300), scaled(12))
+
+    # Define rectangles for various UI elements
+    # The merge area, electron shells, hints and merge button share a column on the right
+    column_x, column_width = width - scaled(200), scaled(180)
+    MERGE_AREA_RECT = pygame.Rect(column_x, height - scaled(150), column_width, scaled(100))
+    # Electron shell visualization
+    ELECTRON_SHELL_RECT = pygame.Rect(column_x, height - scaled(260), column_width, scaled(100))
+    MERGE_BUTTON = pygame.Rect(column_x, height - scaled(40), column_width, scaled(30))
+    INFO_RECT = pygame.Rect(scaled(10), height - scaled(150), scaled(300), scaled(140))
+    # Compound hints, above the electron shell visualization
+    HINT_RECT = pygame.Rect(column_x, height - scaled(320), column_width, scaled(56))
+    # Region to refresh when the information text changes (long lines overflow INFO_RECT)
+    INFO_DIRTY_RECT = pygame.Rect(0, height - scaled(150), width - scaled(210), scaled(150))
+    # Search box and its results, in the gap above the transition metals
+    SEARCH_RECT = pygame.Rect(TABLE_OFFSET_X + scaled(120), scaled(64), scaled(560), scaled(28))
+    SEARCH_RESULTS_RECT = pygame.Rect(TABLE_OFFSET_X + scaled(120), scaled(96),
+                                      scaled(560), scaled(76))
+    # The height of each line of search results
+    SEARCH_LINE_HEIGHT = scaled(19)
+    # Element badges in the merge area, the space between them, and around them
+    BADGE_SIZE = scaled(38)
+    BADGE_GAP = scaled(4)
+    BADGE_MARGIN = scaled(6)
+
+    # Fonts can only be loaded once pygame is running; init_display lays out again then
+    if not pygame.font.get_init():
+        return
+    # Set up fonts
+    # Default font for general text, size 29
+    font = load_font(scaled(29))
+    # Larger font for headings or emphasized text
+    large_font = load_font(scaled(36))
+    # Bold font for emphasis, size 33
+    bold_font = load_font(scaled(33), bold=True)
+
+    element_font = load_font(scaled(28))
+    # Font for popups, size 46
+    popup_font = load_font(scaled(46))
+    # Small font for compound hints, size 22
+    hint_font = load_font(scaled(22))
+    # Font for the counts on merge area badges, size 18
+    badge_font = load_font(scaled(18))
+
+
+# Lay out for the default window size, so the geometry is there before the window is
+apply_layout(WIDTH, HEIGHT)
+
+# Cache of rendered text surfaces, shared by every font
+TEXT_CACHE_SIZE = 512
+text_cache = OrderedDict()
+text_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def render_text(font, text, antialias, color, background=None):
+    # Look up a previously rendered surface for this exact text and style
+    key = (font, text, antialias, color, background)
+    surface = text_cache.get(key)
+    if surface is not None:
+        # Mark the entry as recently used
+        text_cache.move_to_end(key)
+        text_cache_stats['hits'] += 1
+        return surface
+    # Render the text and remember it
+    text_cache_stats['misses'] += 1
+    surface = font.render(text, antialias, color, background)
+    text_cache[key] = surface
+    # Drop the least recently used surface when the cache is full
+    if len(text_cache) > TEXT_CACHE_SIZE:
+        text_cache.popitem(last=False)
+    return surface
+
+
+def draw_element(element, x, y, angle=0, surface=None):
+    # Draw on the screen unless another surface is given
+    if surface is None:
+        surface = screen
     # If angle is 0 (no rotation)
     if angle == 0:
         # Check if the element exists and is in the ELEMENTS dictionary
@@ -283,63 +207,186 @@ def draw_element(element, x, y, angle=0):
             # Create a rectangle for the element
             rect = pygame.Rect(x, y, CELL_SIZE, CELL_SIZE)
             # Draw the element's background color
-            pygame.draw.rect(screen, ELEMENTS[element]['color'], rect)
+            pygame.draw.rect(surface, ELEMENTS.color_of[element], rect)
             # Draw a black border around the element
-            pygame.draw.rect(screen, BLACK, rect, 1)
+            pygame.draw.rect(surface, BLACK, rect, 1)
 
             # Render the element's symbol
-            symbol = element_font.render(element, True, ELEMENT_FONT_COLOR)
+            symbol = render_text(element_font, element, True, ELEMENT_FONT_COLOR)
             # Center the symbol in the element's rectangle
             symbol_rect = symbol.get_rect(center=\
                                         (x + CELL_SIZE // 2, y + CELL_SIZE // 2))
-            # Draw the symbol on the screen
-            screen.blit(symbol, symbol_rect)
-    
-def draw_periodic_table():
+            # Draw the symbol on the surface
+            surface.blit(symbol, symbol_rect)
+
+
+# Pre-rendered periodic tables, rebuilt only when their inputs change. One is
+# kept for each of the last few cell sizes, so resizing the window back and
+# forth doesn't draw the table again.
+TABLE_CACHE_SIZE = 4
+table_cache = OrderedDict()
+
+
+def invalidate_table_cache():
+    # Forget every pre-rendered table (the cache key already notices changes
+    # to the layout and colors; this just frees the surfaces)
+    table_cache.clear()
+
+
+def table_contents():
+    # What the table shows: each row of the layout, and the color of every
+    # cell in it. Keying on this rather than on the layout list itself means
+    # a layout or color changed in place, or a new layout list, gets drawn
+    # again, and a stale table can't be served for a list that reuses an id.
+    layout = tuple(map(tuple, PERIODIC_TABLE_LAYOUT))
+    colors = tuple(map(ELEMENTS.color_of.get, chain.from_iterable(layout)))
+    return layout, colors
+
+
+def cell_position(row, col):
+    # Calculate the top-left corner of a cell, relative to the table
+    x = col * (CELL_SIZE + GRID_PADDING) + GRID_PADDING
+    y = row * (CELL_SIZE + GRID_PADDING) + GRID_PADDING
+    return x, y
+
+
+def build_table_surface():
+    # Size the surface to fit every row and column of the layout
+    rows = len(PERIODIC_TABLE_LAYOUT)
+    cols = len(PERIODIC_TABLE_LAYOUT[0])
+    width, height = cell_position(rows, cols)
+    # Use a transparent surface so the background shows between cells
+    surface = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
+    # Remember where each element sits, for drawing highlights later
+    positions = {}
     # Iterate through each row in the PERIOD_TABLE_LAYOUT
     for row, elements in enumerate(PERIODIC_TABLE_LAYOUT):
         # Iterate through each element in the row
         for col, element in enumerate(elements):
-            # Calculate the x position of the element
-            x = col * (CELL_SIZE + GRID_PADDING) + GRID_PADDING + TABLE_OFFSET_X
-            # Calculate the y position of the element
-            y = row * (CELL_SIZE + GRID_PADDING) + GRID_PADDING
-            # Draw the element at the calculated position
-            draw_element(element, x, y)
-
-def draw_electron_shells(element, x, y, width, height):
-    # Get the electron shell configuration for the element
-    shells = ELEMENT[element]['shells']
-    # Calculate the center of the drawing area
-    center_x, center_y = x + width // 2, y + height // 2
-    # Iterate through each shell
-    for i, electrons in enumerate(shells):
-        # Calculate the radius for this shell
-        radius = (i + 1) * (min(width, height)) // (2 * len(shells))
-        # Draw the shell circle
-        pygame.draw.circle(screen, WHITE, (center_x, center_y), radius, 1)
-        # Calculate the angle step between electrons
-        angle_step = 360 / electrons
-        # Draw each electron in the shell
-        for j in range(electrons):
-            # Calculate the angle for this electron
-            angle = math.radians(j * angle_step)
-            # Calculate the x position of the electron
-            ex = center_x + int(radius * math.cos(angle))
-            # Calculate the y position of the electron
-            ey = center_y + int(radius * math.sin(angle))
-            # Draw the electron
-            pygame.draw.circle(screen, WHITE, (ex, ey), 2)
+            # Calculate the position of the element on the table surface
+            x, y = cell_position(row, col)
+            # Draw the element onto the table surface
+            draw_element(element, x, y, surface=surface)
+            if element in ELEMENTS:
+                positions[element] = (x, y)
+    return surface, positions
+
+
+def draw_periodic_table(highlight=None):
+    # Returns the rectangle of the highlight border, or None
+    # Build the table if the layout, colors or cell size haven't been drawn before
+    key = (table_contents(), CELL_SIZE, GRID_PADDING, ELEMENT_FONT_COLOR, element_font)
+    if key in table_cache:
+        table_cache.move_to_end(key)
+    else:
+        table_cache[key] = build_table_surface()
+        # Forget the table for the size least recently used
+        if len(table_cache) > TABLE_CACHE_SIZE:
+            table_cache.popitem(last=False)
+    surface, positions = table_cache[key]
+    # Draw the whole table in a single blit
+    screen.blit(surface, (TABLE_OFFSET_X, 0))
+    # Draw a highlight border over the hovered or selected element
+    if highlight in positions:
+        x, y = positions[highlight]
+        rect = pygame.Rect(TABLE_OFFSET_X + x, y, CELL_SIZE, CELL_SIZE)
+        pygame.draw.rect(screen, WHITE, rect, scaled(2))
+        return rect
+    return None
+
+
+# Electron shell drawings, keyed by (element, width, height); the least
+# recently used go once there are drawings for more than a couple of sizes
+SHELL_CACHE_SIZE = 256
+shell_cache = OrderedDict()
+# How fast the innermost shell turns in orbit mode (degrees per second);
+# each shell further out turns more slowly
+ORBIT_SPEED = 90
+
+
+def shell_geometry(element, width, height):
+    # Work out the shell rings and electron positions once per element and size
+    key = (element, width, height)
+    if key in shell_cache:
+        shell_cache.move_to_end(key)
+    else:
+        # Get the electron shell configuration for the element
+        shells = ELEMENTS[element].shells
+        # Calculate the center of the drawing area
+        center = (width // 2, height // 2)
+        # Surfaces with just the rings, and with the rings and resting electrons
+        rings = pygame.Surface((width, height), pygame.SRCALPHA)
+        still = pygame.Surface((width, height), pygame.SRCALPHA)
+        # Radius and electron directions (cos, sin) for each shell
+        vertices = []
+        # Leave room for the electrons on the outer shell
+        dot = electron_radius(height)
+        # Iterate through each shell
+        for i, electrons in enumerate(shells):
+            # Calculate the radius for this shell
+            radius = (i + 1) * (min(width, height) - 2 * dot) // (2 * len(shells))
+            # Draw the shell circle
+            pygame.draw.circle(rings, WHITE, center, radius, 1)
+            pygame.draw.circle(still, WHITE, center, radius, 1)
+            # Calculate the angle step between electrons
+            angle_step = 2 * math.pi / electrons
+            directions = [(math.cos(j * angle_step), math.sin(j * angle_step))
+                          for j in range(electrons)]
+            vertices.append((radius, directions))
+            # Draw each electron in its resting position
+            for cos_a, sin_a in directions:
+                pygame.draw.circle(still, WHITE, (center[0] + int(radius * cos_a),
+                                                  center[1] + int(radius * sin_a)), dot)
+        shell_cache[key] = (rings, still, vertices)
+        if len(shell_cache) > SHELL_CACHE_SIZE:
+            shell_cache.popitem(last=False)
+    return shell_cache[key]
+
+
+def electron_radius(height):
+    # Electrons grow with the drawing: 2 pixels across the 100 pixel design
+    return max(2, height // 50)
+
+
+# A single electron for each radius, blitted many times in orbit mode
+electron_dots = {}
+
+
+def draw_electron_shells(element, x, y, width, height, angle=None):
+    # Draw the resting diagram, or rotate the electrons by angle (degrees)
+    rings, still, vertices = shell_geometry(element, width, height)
+    if angle is None:
+        # Nothing moves, so draw the cached diagram in one blit
+        screen.blit(still, (x, y))
+        return
+
+    radius = electron_radius(height)
+    electron_dot = electron_dots.get(radius)
+    if electron_dot is None:
+        electron_dot = electron_dots[radius] = \
+            pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+        pygame.draw.circle(electron_dot, WHITE, (radius, radius), radius)
+    screen.blit(rings, (x, y))
+    # Calculate the center of the drawing area, offset to the dot's corner
+    center_x, center_y = x + width // 2 - radius, y + height // 2 - radius
+    dots = []
+    for i, (radius, directions) in enumerate(vertices):
+        # Rotate the cached positions; only two trig calls per shell
+        turn = math.radians(angle) / (i + 1)
+        cos_t, sin_t = radius * math.cos(turn), radius * math.sin(turn)
+        for cos_a, sin_a in directions:
+            dots.append((electron_dot, (center_x + int(cos_a * cos_t - sin_a * sin_t),
+                                        center_y + int(sin_a * cos_t + cos_a * sin_t))))
+    # Draw every electron in one call
+    screen.blits(dots, doreturn=False)
 
 
 def create_tooltip(element):
-    # Get the information for the given element from the ELEMENTS dictionary
-    info = ELEMENTS[element]
     # Create the tooltip text, which is just the name of the element
-    tooltip_text = f"{info['name']}"
+    tooltip_text = ELEMENTS.name_of[element]
     # Render the tooltip text as a surface
     # Text color is (44, 44, 47) (#2c2c2f), background is (229, 229, 229)
-    tooltip = font.render(tooltip_text, True, (44, 44, 47), (229, 229, 229))
+    tooltip = render_text(font, tooltip_text, True, (44, 44, 47), (229, 229, 229))
     # Return the rendered tooltip surface
     return tooltip
 
@@ -347,63 +394,52 @@ def create_tooltip(element):
 def draw_tooltip(screen, tooltip, pos):
     # Draw the tooltip on the screen
     # Position is offset by 15 pixels right and down from the cursor position
-    screen.blit(tooltip, (pos[0] + 15, pos[1] + 15))
-
-
-def show_element_info(element):
-    # Get the information for the given element from the ELEMENTS dictionary
-    info = ELEMENTS[element]
-    # Create a list of formatted strings with element information
-    lines = [
-        f"Name: {info['name']}",
-        f"Atomic Number: {info['atomic_number']}",
-        f"Mass: {info['mass']}",
-        f"Electron Config: {info['electron_config']}"
-    ]
-    # Return the list of information lines
-    return lines
+    screen.blit(tooltip, tooltip_pos(pos))
 
 
-def show_compound_info(compound):
-    # Get the information for compound from the COMPOUNDS dictionary
-    info = COMPOUNDS[compound]
-    # Create a list of formatted strings with compound information
-    lines = [
-        f"Name: {info['name']}",
-        f"Formula: {compound}",
-        f"Uses: {info['uses']}",
-        f"Properties: {info['properties']}"
-    ]
-    # Return the list of information lines
-    return lines
+def tooltip_pos(pos):
+    # Where the tooltip goes for the cursor at pos (15 pixels at the design size)
+    return pos[0] + scaled(15), pos[1] + scaled(15)
 
 
-def check_compound(elements):
-    # Sort the input elements to ensure consistent ordering
-    elements.sort()
-    # Iterate through all known compounds
-    for compound, data in COMPOUNDS.items():
-        # Compare the sorted input elements with
-        # the sorted elements of each compound
-        if elements == sorted(data['elements']):
-            # If a match is found, return the compound formula and name
-            return compound, data['name']
-    # If no match is found, return None for both compound and name
-    return None, None
-
-
-def show_popup(message, color):
-    # Render the popup message with the specified color
-    popup = popup_font.render(message, True, color)
-    # Create a rectangle for the popup,
-    # Centered horizontally and 260 pixels from the bottom
-    popup_rect = popup.get_rect(center=(WIDTH // 2, HEIGHT - 260))
-    # Draw the popup on the screen
-    screen.blit(popup, popup_rect)
-    # Update the display to show the popup
-    pygame.display.flip()
-    # Wait for 1.5 seconds (1500 milliseconds)
-    pygame.time.wait(1500)
+# How long a popup stays on screen, and how long it takes to fade in or out (ms)
+POPUP_LIFETIME = 1500
+POPUP_FADE = 200
+# Most popups shown at once; older ones are dropped first
+MAX_POPUPS = 4
+# Popups currently on screen, oldest first
+popups = []
+
+
+def show_popup(message, color, lifetime=POPUP_LIFETIME):
+    # Queue the popup; it is drawn by draw_popups as part of the normal frame
+    popups.append({'message': message, 'color': color,
+                   'start': pygame.time.get_ticks(), 'lifetime': lifetime})
+    # Drop the oldest popups if too many are stacked
+    del popups[:-MAX_POPUPS]
+
+
+def draw_popups(now):
+    # Forget popups that have run out of time
+    popups[:] = [p for p in popups if now - p['start'] < p['lifetime']]
+    rects = []
+    # Draw the newest popup centered 260 pixels from the bottom (at the design size),
+    # with older ones stacked above it
+    for i, popup in enumerate(reversed(popups)):
+        age = now - popup['start']
+        # Fade in at the start and out at the end of the popup's lifetime
+        fade = min(age, popup['lifetime'] - age, POPUP_FADE)
+        alpha = max(0, 255 * fade // POPUP_FADE)
+        # Render the popup message with the specified color
+        text = render_text(popup_font, popup['message'], True, popup['color'])
+        popup_rect = text.get_rect(center=(WIDTH // 2, HEIGHT - scaled(260) - i*scaled(40)))
+        # The surface is shared through the text cache, so restore its alpha after use
+        text.set_alpha(alpha)
+        screen.blit(text, popup_rect)
+        text.set_alpha(255)
+        rects.append(popup_rect)
+    # Return the areas covered by popups
+    return rects
 
 
 def get_element_at_pos(pos):
@@ -420,7 +456,298 @@ def get_element_at_pos(pos):
     # Return None if the position is outside the periodic table
     return None
 
-def main():
+# Frame rate while something on screen is changing
+FPS = 60
+# Longest time to sleep between frames when nothing is changing (milliseconds)
+IDLE_TIMEOUT = 250
+
+# Frame timings; replaced by a FrameProfiler when profiling is on
+profiler = NullProfiler()
+# How often the performance HUD refreshes (ms)
+HUD_INTERVAL = 250
+
+# How many results fit under the search box
+SEARCH_RESULTS = 4
+
+def hint_lines(hints):
+    # Describe which compounds the merge area can make now, and how many it still could
+    complete = hints.complete()
+    if complete:
+        # Name at most two, so the line fits
+        ready = ", ".join(complete[:2])
+        if len(complete) > 2:
+            ready += f" +{len(complete) - 2}"
+    else:
+        ready = "none"
+    lines = [f"Ready: {ready}"]
+    if hints.reachable_count() is None:
+        # The hints for a big catalog are still being built
+        lines.append("Counting the rest...")
+        return lines
+    others = hints.reachable_count() - len(complete)
+    lines.append(f"{others} more possible")
+    if others:
+        # Name a couple of them
+        lines.append("e.g. " + ", ".join(hints.reachable_compounds(2, skip=complete)))
+    return lines
+
+
+# Most reactions suggested in the information area at once
+REACTION_LINES = 4
+
+
+def reaction_lines(formulas):
+    # Suggest balanced reactions making formulas (the compounds the merge
+    # area holds exactly) from their elements, for the information area
+    reactions = [reaction for reaction in map(formation_reaction, formulas) if reaction]
+    if not reactions:
+        return []
+    return ["Balanced reaction" + ("s:" if len(reactions) > 1 else ":")] \
+        + reactions[:REACTION_LINES]
+
+
+# How a split of the merge area (the D key) is scored: 'leftovers', 'compounds',
+# or (atom, compound) weights; see decompose.OBJECTIVES
+SPLIT_OBJECTIVE = 'leftovers'
+# Longest line of compounds in a split, and how many such lines are shown
+SPLIT_LINE_LENGTH = 34
+SPLIT_LINES = 3
+
+
+def split_lines(split):
+    # Describe a split of the merge area into compounds, for the information area
+    if not split['compounds']:
+        return ["Split: no compound can be made"]
+    total = sum(times for _, times in split['compounds'])
+    lines = [f"Split into {total} compound{'s' if total > 1 else ''}"
+             + ("" if split['optimal'] else " (best found)")]
+    line = ""
+    for formula, times in split['compounds']:
+        part = f"{times} {formula}" if times > 1 else formula
+        if line and len(line) + len(part) + 2 > SPLIT_LINE_LENGTH:
+            lines.append(line + ",")
+            line = ""
+        line = f"{line}, {part}" if line else part
+    lines.append(line)
+    # Keep the leftovers line on screen if the compounds don't all fit
+    if len(lines) > SPLIT_LINES + 1:
+        lines[SPLIT_LINES:] = [lines[SPLIT_LINES].rstrip(",") + " ..."]
+    leftovers = ", ".join(f"{n} {symbol}" for symbol, n in split['leftovers'].items())
+    lines.append(f"Left over: {leftovers}" if leftovers else "Nothing left over")
+    return lines
+
+
+def search_lines(results, indexing=False):
+    # One line per search result: the symbol or formula, then the name
+    if indexing:
+        return ["Indexing..."]
+    lines = []
+    for kind, key in results:
+        if kind == 'element':
+            lines.append(f"{key}   {ELEMENTS.name_of[key]}   (element)")
+        else:
+            lines.append(f"{key}   {COMPOUNDS[key]['name']}")
+    return lines
+
+
+def result_at_pos(pos, results):
+    # Return the search result under pos, or None
+    if not SEARCH_RESULTS_RECT.collidepoint(pos):
+        return None
+    i = (pos[1] - SEARCH_RESULTS_RECT.y) // SEARCH_LINE_HEIGHT
+    return results[i] if i < len(results) else None
+
+
+def draw_search(text, focused, lines):
+    # Draw the search box with its text (or a prompt) and the results below it
+    pygame.draw.rect(screen, WHITE if focused else GREY, SEARCH_RECT, 1)
+    margin = scaled(6)
+    if text or focused:
+        # Show the end of the text if it's too long for the box
+        shown = text
+        while shown and font.size(shown + "|")[0] > SEARCH_RECT.width - 2 * margin:
+            shown = shown[1:]
+        label = render_text(font, shown + ("|" if focused else ""), True, WHITE)
+    else:
+        label = render_text(font, "Search (Ctrl+F)", True, GREY)
+    screen.blit(label, label.get_rect(midleft=(SEARCH_RECT.x + margin, SEARCH_RECT.centery)))
+    for i, line in enumerate(lines):
+        result = render_text(hint_font, line, True, WHITE)
+        screen.blit(result, (SEARCH_RESULTS_RECT.x + margin,
+                             SEARCH_RESULTS_RECT.y + scaled(2) + i * SEARCH_LINE_HEIGHT))
+
+
+def merge_grid():
+    # How many badge columns fit across the merge area, and rows down it
+    pitch = BADGE_SIZE + BADGE_GAP
+    columns = max(1, (MERGE_AREA_RECT.width - 2 * BADGE_MARGIN + BADGE_GAP) // pitch)
+    rows = max(1, (MERGE_AREA_RECT.height - 2 * BADGE_MARGIN + BADGE_GAP) // pitch)
+    return columns, rows
+
+
+def merge_scroll_limit(merge_area):
+    # The furthest the merge area can scroll, in rows
+    columns, rows = merge_grid()
+    return max(0, -(-len(merge_area) // columns) - rows)
+
+
+def merge_row(merge_area, element):
+    # The badge row holding element (badges go in the order elements were first dropped)
+    return list(merge_area).index(element) // merge_grid()[0]
+
+
+def draw_badge(element, count, x, y, surface=None):
+    # A small element cell with the number of atoms in its corner,
+    # on the screen unless another surface is given
+    if surface is None:
+        surface = screen
+    rect = pygame.Rect(x, y, BADGE_SIZE, BADGE_SIZE)
+    pygame.draw.rect(surface, ELEMENTS.color_of[element], rect)
+    pygame.draw.rect(surface, BLACK, rect, 1)
+    symbol = render_text(element_font, element, True, ELEMENT_FONT_COLOR)
+    if count == 1:
+        surface.blit(symbol, symbol.get_rect(center=rect.center))
+        return
+    # Move the symbol up to make room for the count
+    surface.blit(symbol, symbol.get_rect(center=(rect.centerx, rect.y + BADGE_SIZE * 2 // 5)))
+    number = render_text(badge_font, str(count), True, BLACK)
+    surface.blit(number, number.get_rect(bottomright=(rect.right - scaled(3),
+                                                      rect.bottom - scaled(2))))
+
+
+def draw_merge_area(merge_area, scroll=0):
+    # Draw a badge for each element in the merge area ({element: count}),
+    # starting at row scroll. Only the rows that fit are drawn, so the cost
+    # depends on how many different elements there are, not how many atoms.
+    pygame.draw.rect(screen, WHITE, MERGE_AREA_RECT, scaled(2))
+    columns, rows = merge_grid()
+    pitch = BADGE_SIZE + BADGE_GAP
+    items = list(merge_area.items())
+    shown = items[scroll * columns:(scroll + rows) * columns]
+    for i, (element, count) in enumerate(shown):
+        row, col = divmod(i, columns)
+        draw_badge(element, count, MERGE_AREA_RECT.x + BADGE_MARGIN + col * pitch,
+                   MERGE_AREA_RECT.y + BADGE_MARGIN + row * pitch)
+    # A scroll bar down the right edge when some rows are out of view
+    total = -(-len(items) // columns)
+    if total > rows:
+        track = MERGE_AREA_RECT.height - 2 * BADGE_MARGIN
+        bar = pygame.Rect(MERGE_AREA_RECT.right - scaled(5), 0, scaled(2), track * rows // total)
+        bar.y = MERGE_AREA_RECT.y + BADGE_MARGIN + track * scroll // total
+        pygame.draw.rect(screen, GREY, bar)
+
+
+def draw_frame(merge_area, info_area, hints_text, hover_element, mouse_pos, dragged_element,
+               shell_angle=None, search_text="", search_focused=False, search_results_text=(),
+               merge_scroll=0, shell_element=None):
+    # merge_area is {element: count}; the shells are drawn for shell_element,
+    # or the last element added to the merge area
+    # Fill the screen with the background color
+    screen.fill(BACKGROUND)
+    # Draw the periodic table, highlighting the hovered element
+    highlight_rect = draw_periodic_table(hover_element)
+    profiler.mark('table')
+
+    # Draw the merge area
+    draw_merge_area(merge_area, merge_scroll)
+    profiler.mark('merge_area')
+
+    # Draw the electron shell visualization area
+    pygame.draw.rect(screen, WHITE, ELECTRON_SHELL_RECT, scaled(2))
+    if merge_area:
+        # Draw electron shells for the element dropped last
+        draw_electron_shells(shell_element or next(reversed(merge_area)), \
+                            ELECTRON_SHELL_RECT.x, ELECTRON_SHELL_RECT.y,
+                            ELECTRON_SHELL_RECT.width, \
+                            ELECTRON_SHELL_RECT.height, shell_angle)
+    profiler.mark('shells')
+
+    # Draw the compound hints for the merge area
+    for i, line in enumerate(hints_text):
+        hint_text = render_text(hint_font, line, True, WHITE)
+        screen.blit(hint_text, (HINT_RECT.x, HINT_RECT.y + i*scaled(18)))
+
+    # Draw the merge button
+    pygame.draw.rect(screen, WHITE, MERGE_BUTTON)
+    merge_text = render_text(font, "Merge", True, BLACK)
+    screen.blit(merge_text, merge_text.get_rect(center=MERGE_BUTTON.center))
+    profiler.mark('merge_area')
+
+    # Draw information area
+    for i, line in enumerate(info_area):
+        # Render each line of information as white text
+        info_text = render_text(font, line, True, WHITE)
+        # DIsplay the text in the information area
+        screen.blit(info_text, (INFO_RECT.x, INFO_RECT.y + i*scaled(30)))
+    profiler.mark('info')
+
+    # Draw the search box and its results
+    draw_search(search_text, search_focused, search_results_text)
+    profiler.mark('search')
+
+    # Keep track of everything drawn on top of the static layout
+    overlays = []
+    if highlight_rect:
+        overlays.append(highlight_rect)
+
+    # Handle tooltips
+    if hover_element and hover_element in ELEMENTS:
+        # Create and draw a tooltip for the hovered element
+        tooltip = create_tooltip(hover_element)
+        draw_tooltip(screen, tooltip, mouse_pos)
+        overlays.append(tooltip.get_rect(topleft=tooltip_pos(mouse_pos)))
+
+    # Draw dragged element
+    if dragged_element:
+        # Draw the dragged element at the mouse position
+        x, y = mouse_pos[0] - CELL_SIZE // 2, mouse_pos[1] - CELL_SIZE // 2
+        draw_element(dragged_element, x, y)
+        overlays.append(pygame.Rect(x, y, CELL_SIZE, CELL_SIZE))
+
+    # Draw any popups on top of everything else
+    overlays += draw_popups(pygame.time.get_ticks())
+    profiler.mark('overlays')
+
+    # Return the areas covered by overlays, so they can be refreshed next frame
+    return overlays
+
+
+def hud_text():
+    # One line of frame statistics for the performance HUD
+    stats = profiler.stats()
+    if stats is None:
+        return "Measuring..."
+    return "{:.0f} FPS   frame work p50 {:.1f}  p95 {:.1f}  p99 {:.1f} ms".format(*stats)
+
+
+def main(profile=False, profile_out=None, record=None, replay=None, realtime=False,
+         size=None):
+    global profiler
+    replay_events = None
+    if replay:
+        # Replays run headless unless a video driver is chosen explicitly
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        replay_events = ReplayEvents(read_log(replay), realtime)
+    # Open the window and load fonts
+    init_display(size)
+    # Time each phase of every frame if asked to (every frame, when replaying)
+    if replay_events:
+        profiler = FrameProfiler(max(600, len(replay_events.batches) + 1))
+    elif profile or profile_out:
+        profiler = FrameProfiler()
+    # Save the events handled each frame, if asked to, starting with the
+    # window size so a replay lays things out the same way. When replaying,
+    # the log already brings its own, and recording it must give the same log.
+    recorder = EventRecorder(record) if record else None
+    if recorder and not replay_events:
+        recorder.write(0, [pygame.event.Event(pygame.VIDEORESIZE, size=(WIDTH, HEIGHT),
+                                              w=WIDTH, h=HEIGHT)])
+    # Whether the performance HUD is shown, and what it says
+    show_hud = False
+    hud = ""
+    last_hud_update = -HUD_INTERVAL
+
     # Create a clock object to control the game's frame rate
     clock = pygame.time.Clock()
 
@@ -430,30 +757,172 @@ def main():
     # Store the currently dragged element
     dragged_element = None
 
-    # List to store elements in the merge area
-    merge_area = []
-
-    # Define rectangles for various UI elements
-    merge_area_rect = pygame.Rect(WIDTH - 200, HEIGHT - 150, 180, 100)
-    electron_shell_rect = pygame.Rect(WIDTH - 200, HEIGHT - 260, 180, 100)
-    # Electron shell visualization
-    merge_button = pygame.Rect(WIDTH - 200, HEIGHT - 40, 180, 30)
+    # How many atoms of each element are in the merge area, in the order
+    # they were first dropped; the rows scrolled past; and the element dropped last
+    merge_area = {}
+    merge_scroll = 0
+    last_dropped = None
 
     # List to store information about selected elements or compounds
     info_area = []
 
-    # Store the tooltip to be displayed
-    tooltip = None
+    # Keep track of which compounds the merge area can still make
+    # (building its lists in the background too, like the search index below)
+    hints = CompoundHints(COMPOUNDS)
+    if replay_events:
+        hints.build()
+    else:
+        hints.build_in_background()
+    hints_text = []
+    # Whether the hint lists were ready when hints_text was made
+    hints_ready = hints.ready
+
+    # Build the search index without holding up the first frames
+    # (or right away when replaying, so results don't depend on timing)
+    search_index = SearchIndex()
+    if replay_events:
+        search_index.build(ELEMENTS, COMPOUNDS)
+    else:
+        search_index.build_in_background(ELEMENTS, COMPOUNDS)
+    # What's typed in the search box, whether it has the keyboard, and the results
+    search_text = ""
+    search_focused = False
+    search_results = []
+    search_results_text = []
+    # The query (and whether the index was ready) the results are for
+    last_search = None
+
+    # What was drawn last frame, to work out which regions need refreshing
+    last_state = None
+    last_merge_state = None
+    last_info_area = None
+    last_hints_text = None
+    last_search_state = None
+    last_overlays = []
+    last_animating = False
+    last_show_hud = False
+    # Redraw the whole window on the first frame
+    full_redraw = True
+    # Whether the last frame had nothing to draw
+    idle = False
+    # Whether the electrons orbit (toggled with the O key)
+    orbiting = False
+    # Follow the mouse through its events, so a burst of events is seen in order
+    mouse_pos = pygame.mouse.get_pos()
+    # Frames drawn, and when the loop started, for the replay report
+    frames_drawn = 0
+    started = time.perf_counter()
+
+    # Start without popups left over from an earlier run (their times may be a replay's)
+    popups.clear()
+
+    # The frame cap; a fast replay doesn't wait between frames
+    fps = FPS
+    if replay_events:
+        # Feed the log in place of real events
+        replay_events.install()
+        if not realtime:
+            fps = 0
 
     while True:
-        # Event handling loop
-        for event in pygame.event.get():
+        # Handle every pending event before drawing anything
+        events = pygame.event.get()
+        if idle and not events:
+            # Nothing is changing, so sleep until an event arrives
+            event = pygame.event.wait(IDLE_TIMEOUT)
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+        if recorder:
+            recorder.write(pygame.time.get_ticks(), events)
+        profiler.start_frame()
+
+        for event in events:
+            if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN,
+                              pygame.MOUSEBUTTONUP):
+                # Remember where the mouse is
+                mouse_pos = event.pos
+
             if event.type == pygame.QUIT:
+                if recorder:
+                    recorder.close()
+                # Save the frame timings, if asked to
+                if profile_out:
+                    profiler.dump(profile_out)
+                if replay_events:
+                    # Report how the replay ended up, and how long its frames took
+                    replay_events.uninstall()
+                    stats = profiler.stats() or (0, 0, 0, 0)
+                    print(json.dumps({
+                        'frames': frames_drawn,
+                        'seconds': round(time.perf_counter() - started, 3),
+                        'frame_work_ms': dict(zip(('p50', 'p95', 'p99'),
+                                                  (round(ms, 3) for ms in stats[1:]))),
+                        'merge_area': merge_area,
+                        'info_area': info_area,
+                        'hints': hints_text,
+                        'search': search_text,
+                        'popups': [popup['message'] for popup in popups],
+                    }, indent=2))
                 # Exit the game if the window is closed
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.KEYDOWN and search_focused and event.key in (
+                    pygame.K_BACKSPACE, pygame.K_ESCAPE, pygame.K_RETURN, pygame.K_KP_ENTER):
+                if event.key == pygame.K_BACKSPACE:
+                    search_text = search_text[:-1]
+                elif event.key == pygame.K_ESCAPE:
+                    # Clear the search and give the keyboard back
+                    search_text = ""
+                    search_focused = False
+                elif search_results:
+                    # Enter shows the top result
+                    kind, key = search_results[0]
+                    info_area = (show_element_info(key) if kind == 'element'
+                                 else show_compound_info(key))
+            elif event.type == pygame.TEXTINPUT and search_focused:
+                # Typed characters go to the search box while it has the keyboard
+                search_text += event.text
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_f \
+                    and event.mod & pygame.KMOD_CTRL:
+                search_focused = True
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_o and not search_focused:
+                # Start or stop the electrons orbiting
+                orbiting = not orbiting
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_d \
+                    and not search_focused and merge_area:
+                # Split the merge area into as many compounds as it can make
+                split = decompose(merge_area, COMPOUNDS, hints.fitting(merge_area),
+                                  SPLIT_OBJECTIVE)
+                info_area = split_lines(split)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                # Show or hide the performance HUD, which needs the profiler
+                show_hud = not show_hud
+                if isinstance(profiler, NullProfiler):
+                    # This frame already started on the null profiler, so
+                    # start it again, or the new one times it from zero
+                    profiler = FrameProfiler()
+                    profiler.start_frame()
+            elif event.type == pygame.MOUSEWHEEL and MERGE_AREA_RECT.collidepoint(mouse_pos):
+                # Scroll the merge area's badges a row at a time
+                merge_scroll = min(max(merge_scroll - event.y, 0), merge_scroll_limit(merge_area))
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The window contents were lost, so draw everything again
+                full_redraw = True
+            elif event.type == pygame.VIDEORESIZE:
+                # Lay everything out for the new size, and draw it all again
+                resize_display(event.w, event.h)
+                merge_scroll = min(merge_scroll, merge_scroll_limit(merge_area))
+                full_redraw = True
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                if merge_button.collidepoint(event.pos):
+                # Clicking the search box gives it the keyboard; clicking elsewhere takes it away
+                search_focused = SEARCH_RECT.collidepoint(event.pos)
+                result = result_at_pos(event.pos, search_results)
+                if result:
+                    # Show the clicked search result
+                    kind, key = result
+                    info_area = (show_element_info(key) if kind == 'element'
+                                 else show_compound_info(key))
+                elif MERGE_BUTTON.collidepoint(event.pos):
                     # Check if a compound can be formed from elements in the merge area
                     compound, name = check_compound(merge_area)
                     if compound:
@@ -465,7 +934,11 @@ def main():
                         # Show a popup if no compound can be formed
                         show_popup("No compound formed", RED)
                     # Clear the merge area
-                    merge_area = []
+                    merge_area = {}
+                    merge_scroll = 0
+                    last_dropped = None
+                    hints.reset()
+                    hints_text = []
                 else:
                     # Check if an element was clicked
                     element = get_element_at_pos(event.pos)
@@ -478,79 +951,146 @@ def main():
             elif event.type == pygame.MOUSEBUTTONUP:
                 if dragging:
                     dragging = False
-                    if merge_area_rect.collidepoint(event.pos) and dragged_element:
+                    if MERGE_AREA_RECT.collidepoint(event.pos) and dragged_element:
                         # Add the dragged element to the merge area if released there
-                        merge_area.append(dragged_element)
+                        merge_area[dragged_element] = merge_area.get(dragged_element, 0) + 1
+                        last_dropped = dragged_element
+                        # Scroll to its badge if it's out of view
+                        row = merge_row(merge_area, dragged_element)
+                        rows = merge_grid()[1]
+                        merge_scroll = min(max(merge_scroll, row - rows + 1), row)
+                        # Update the hints with just the new element
+                        hints.add(dragged_element)
+                        hints_text = hint_lines(hints)
+                        # Suggest how to make what the merge area holds now, if it's a compound
+                        info_area = reaction_lines(hints.complete()) or info_area
                     else:
                         # Show a popup with the element name if released elsewhere
-                        show_popup(f"{ELEMENTS[dragged_element]['name']}", WHITE)
+                        show_popup(ELEMENTS.name_of[dragged_element], WHITE)
                 # Reset the dragged element
                 dragged_element = None
-                
-            # Fill the screen with the background color
-            screen.fill(BACKGROUND)
-            # Draw the periodic table
-            draw_periodic_table()
-
-            # Draw the merge area
-            pygame.draw.rect(screen, WHITE, merge_area_rect, 2)
-            for i, elem in enumerate(merge_area):
-                # Draw elements in the merge area
-                draw_element(elem, merge_area_rect.x + 10 + i*40,\
-                            merge_area_rect.y + 10)
-            
-            # Draw the electron shell visualization area
-            pygame.draw.rect(screen, WHITE, electron_shell_rect, 2)
-            if merge_area:
-                # Draw electron shells for the last element in the merge area
-                draw_electron_shells(merge_area[-1], \
-                                    electron_shell_rect.x, electron_shell_rect.y,
-                                    electron_shell_rect.width, \
-                                    electron_shell_rect.height)
-            
-            # Draw the merge button
-            pygame.draw.rect(screen, WHITE, merge_button)
-            merge_text = font.render("Merge", True, BLACK)
-            screen.blit(merge_text, (merge_button.x + 70, merge_button.y + 8))
-
-            # Draw information area
-            info_rect = pygame.Rect(10, HEIGHT - 150, 300, 140)
-            for i, line in enumerate(info_area):
-                # Render each line of information as white text
-                info_text = font.render(line, True, WHITE)
-                # DIsplay the text in the information area
-                screen.blit(info_text, (info_rect.x, info_rect.y + i*30))
-                
-            # Handle tooltips
-            mouse_pos = pygame.mouse.get_pos()
-            # Get the element at the current mouse position
-            hover_element = get_element_at_pos(mouse_pos)
-            if hover_element and hover_element in ELEMENTS:
-                # Create a tooltip for the hovered element
-                tooltip = create_tooltip(hover_element)
-            else:
-                # Clear the tooltip if not hovering over an element
-                tooltip = None
-            
-            if tooltip:
-                # Draw the tooltip if one exists
-                draw_tooltip(screen, tooltip, mouse_pos)
-                
-            # Draw dragged element
-            if dragging and dragged_element:
-                # Get the current mouse position
-                x, y = pygame.mouse.get_pos()
-                # Draw the dragged element at the moust position
-                draw_element(dragged_element, x - \
-                            CELL_SIZE // 2, y - CELL_SIZE // 2)
-            
-            # Update the display
+
+        # Search again whenever the text changes (or the index becomes ready)
+        if (search_text, search_index.ready) != last_search:
+            search_results = search_index.search(search_text, SEARCH_RESULTS)
+            search_results_text = search_lines(
+                search_results, indexing=bool(search_text) and not search_index.ready)
+            last_search = (search_text, search_index.ready)
+        # Fill in the hints once their lists are built
+        if hints.ready != hints_ready:
+            hints_ready = hints.ready
+            if hints_text:
+                hints_text = hint_lines(hints)
+
+        # Get the element under the mouse, for the highlight and tooltip
+        hover_element = get_element_at_pos(mouse_pos)
+        if hover_element not in ELEMENTS:
+            hover_element = None
+        # The mouse position only matters while a tooltip or dragged element follows it
+        follow_pos = mouse_pos if hover_element or dragging else None
+
+        # Electrons only move in orbit mode, and when there is an element to show
+        animating = orbiting and bool(merge_area)
+        shell_angle = pygame.time.get_ticks() * ORBIT_SPEED / 1000 if animating else None
+
+        # Skip the frame entirely if nothing visible has changed
+        # (popups fade in and out, so keep drawing while any are shown)
+        search_state = (search_text, search_focused, tuple(search_results_text))
+        merge_state = (tuple(merge_area.items()), merge_scroll, last_dropped)
+        state = (hover_element, follow_pos, dragged_element,
+                 merge_state, tuple(info_area), tuple(hints_text), animating, search_state)
+        # (the HUD keeps frames coming too, so it has something to measure)
+        if state == last_state and not full_redraw and not popups and not animating \
+                and not show_hud and not last_show_hud:
+            idle = True
+            continue
+        idle = False
+        profiler.mark('events')
+
+        # Draw the frame into the back buffer
+        overlays = draw_frame(merge_area, info_area, hints_text, hover_element, mouse_pos,
+                              dragged_element if dragging else None, shell_angle,
+                              search_text, search_focused, search_results_text,
+                              merge_scroll, last_dropped)
+        frames_drawn += 1
+
+        # Draw the performance HUD, refreshing its text a few times a second
+        if show_hud:
+            now = pygame.time.get_ticks()
+            if now - last_hud_update >= HUD_INTERVAL:
+                hud = hud_text()
+                last_hud_update = now
+            hud_surface = render_text(font, hud, True, WHITE, BACKGROUND)
+            screen.blit(hud_surface, HUD_POS)
+            # The text changes without moving, so always refresh it
+            overlays.append(hud_surface.get_rect(topleft=HUD_POS))
+
+        if full_redraw:
+            # Update the whole display
             pygame.display.flip()
-            # Control the frame rate
-            clock.tick(60)
+            full_redraw = False
+        else:
+            # Only push the regions that changed to the display
+            dirty = []
+            if overlays != last_overlays or popups or show_hud:
+                dirty += last_overlays + overlays
+            if merge_state != last_merge_state or animating or last_animating:
+                dirty += [MERGE_AREA_RECT, ELECTRON_SHELL_RECT, HINT_RECT]
+            if info_area != last_info_area:
+                dirty.append(INFO_DIRTY_RECT)
+            # The hints also change on their own, once their lists are built
+            if hints_text != last_hints_text:
+                dirty.append(HINT_RECT)
+            if search_state != last_search_state:
+                dirty += [SEARCH_RECT, SEARCH_RESULTS_RECT]
+            pygame.display.update(dirty)
+        profiler.mark('display')
+
+        last_state = state
+        last_merge_state = merge_state
+        last_info_area = info_area
+        last_hints_text = hints_text
+        last_search_state = search_state
+        last_overlays = overlays
+        last_animating = animating
+        last_show_hud = show_hud
+        # Control the frame rate
+        clock.tick(fps)
+        profiler.mark('tick')
+        profiler.end_frame()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Periodic Combinator")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each phase of every frame (F3 shows the HUD)")
+    parser.add_argument('--profile-out', metavar='FILE',
+                        help="save the recent frame timings to FILE (.json or .csv) on exit")
+    parser.add_argument('--record', metavar='FILE',
+                        help="save every input event to FILE, to replay later")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="replay the events in FILE headless, as fast as possible, "
+                             "then print the final state and frame timings")
+    parser.add_argument('--realtime', action='store_true',
+                        help="with --replay, replay at the recorded pace")
+    parser.add_argument('--split-objective', metavar='OBJECTIVE', default=SPLIT_OBJECTIVE,
+                        help="how the D key splits the merge area into compounds: "
+                             "'leftovers' (fewest atoms left), 'compounds' (most compounds), "
+                             "or ATOM,COMPOUND weights such as 1,5")
+    parser.add_argument('--size', metavar='WxH',
+                        type=lambda text: tuple(int(n) for n in text.lower().split('x')),
+                        help=f"starting window size (default {BASE_WIDTH}x{BASE_HEIGHT}); "
+                             "the window can be resized")
+    args = parser.parse_args()
+    if ',' in args.split_objective:
+        SPLIT_OBJECTIVE = tuple(float(weight) for weight in args.split_objective.split(','))
+    else:
+        SPLIT_OBJECTIVE = args.split_objective
+    # Catch a mistyped objective now rather than at the first split
+    try:
+        objective_weights(SPLIT_OBJECTIVE)
+    except ValueError as error:
+        parser.error(str(error))
+    main(args.profile, args.profile_out, args.record, args.replay, args.realtime, args.size)
 
                 
\ No newline at end of file
@@ -0,0 +1,243 @@
+import argparse
+import random
+import struct
+import time
+
+import pygame
+
+# Event logs start with this, and hold one batch per frame: the time in ms,
+# the number of events, then each event as its type and packed fields
+MAGIC = b'PTEVLOG1'
+BATCH = struct.Struct('<IH')
+EVENT_TYPE = struct.Struct('<H')
+# Fields kept for each kind of event main() handles; anything else isn't recorded
+FIELDS = {
+    pygame.MOUSEMOTION: struct.Struct('<hhB'),       # x, y, buttons held (bits)
+    pygame.MOUSEBUTTONDOWN: struct.Struct('<hhB'),   # x, y, button
+    pygame.MOUSEBUTTONUP: struct.Struct('<hhB'),     # x, y, button
+    pygame.KEYDOWN: struct.Struct('<iH'),            # key, modifiers
+    pygame.TEXTINPUT: struct.Struct('<B'),           # length of the UTF-8 text after it
+    pygame.VIDEORESIZE: struct.Struct('<HH'),        # new window width, height
+    pygame.MOUSEWHEEL: struct.Struct('<hh'),         # x, y scrolled
+    pygame.QUIT: None,
+    pygame.VIDEOEXPOSE: None,
+    pygame.WINDOWEXPOSED: None,
+}
+
+
+def pack_event(event):
+    # Encode one event, or return None if it isn't one that gets recorded
+    if event.type not in FIELDS:
+        return None
+    data = EVENT_TYPE.pack(event.type)
+    if event.type == pygame.MOUSEMOTION:
+        buttons = sum(1 << i for i, held in enumerate(event.buttons) if held)
+        data += FIELDS[event.type].pack(*event.pos, buttons)
+    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        data += FIELDS[event.type].pack(*event.pos, event.button)
+    elif event.type == pygame.KEYDOWN:
+        data += FIELDS[event.type].pack(event.key, event.mod)
+    elif event.type == pygame.TEXTINPUT:
+        text = event.text.encode()
+        data += FIELDS[event.type].pack(len(text)) + text
+    elif event.type == pygame.VIDEORESIZE:
+        data += FIELDS[event.type].pack(event.w, event.h)
+    elif event.type == pygame.MOUSEWHEEL:
+        data += FIELDS[event.type].pack(event.x, event.y)
+    return data
+
+
+def unpack_event(data, pos):
+    # Decode the event at pos; returns it and the position after it
+    kind = EVENT_TYPE.unpack_from(data, pos)[0]
+    pos += EVENT_TYPE.size
+    fields = FIELDS[kind]
+    if fields is None:
+        return pygame.event.Event(kind), pos
+    values = fields.unpack_from(data, pos)
+    pos += fields.size
+    if kind == pygame.MOUSEMOTION:
+        x, y, buttons = values
+        event = pygame.event.Event(kind, pos=(x, y), rel=(0, 0),
+                                   buttons=tuple(buttons >> i & 1 for i in range(3)))
+    elif kind in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        x, y, button = values
+        event = pygame.event.Event(kind, pos=(x, y), button=button)
+    elif kind == pygame.KEYDOWN:
+        key, mod = values
+        event = pygame.event.Event(kind, key=key, mod=mod, unicode='', scancode=0)
+    elif kind == pygame.VIDEORESIZE:
+        w, h = values
+        event = pygame.event.Event(kind, size=(w, h), w=w, h=h)
+    elif kind == pygame.MOUSEWHEEL:
+        x, y = values
+        event = pygame.event.Event(kind, x=x, y=y, flipped=False, precise_x=float(x),
+                                   precise_y=float(y))
+    else:
+        text = data[pos:pos + values[0]].decode()
+        pos += values[0]
+        event = pygame.event.Event(kind, text=text)
+    return event, pos
+
+
+class EventRecorder:
+    # Writes the events main() handles to a log, one batch per frame
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+
+    def write(self, ticks, events):
+        packed = [data for data in map(pack_event, events) if data is not None]
+        if packed:
+            self.file.write(BATCH.pack(ticks, len(packed)) + b''.join(packed))
+
+    def close(self):
+        self.file.close()
+
+
+def read_log(path):
+    # Return the (ms, events) batches of a log
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an event log")
+    batches = []
+    pos = len(MAGIC)
+    while pos < len(data):
+        ticks, count = BATCH.unpack_from(data, pos)
+        pos += BATCH.size
+        events = []
+        for _ in range(count):
+            event, pos = unpack_event(data, pos)
+            events.append(event)
+        batches.append((ticks, events))
+    return batches
+
+
+class ReplayEvents:
+    # Stands in for pygame.event.get/wait and pygame.time.get_ticks while a
+    # log is replayed. Each batch comes back as one frame's events, in order.
+    # With realtime, batches wait until their recorded time; otherwise they
+    # come as fast as the loop takes them, and the clock jumps to each
+    # batch's recorded time, so timed things like popups run the same way
+    # every replay. A QUIT is added at the end if the log doesn't have one.
+
+    def __init__(self, batches, realtime=False):
+        self.batches = list(batches)
+        if not self.batches or all(event.type != pygame.QUIT for event in self.batches[-1][1]):
+            last = self.batches[-1][0] if self.batches else 0
+            self.batches.append((last, [pygame.event.Event(pygame.QUIT)]))
+        self.realtime = realtime
+        self.next = 0
+        self.ticks = 0
+        self.start = time.perf_counter()
+        # Events from a batch that wait() handed out only the first of
+        self.pending = []
+        self.originals = None
+
+    def install(self):
+        self.originals = (pygame.event.get, pygame.event.wait, pygame.time.get_ticks)
+        pygame.event.get, pygame.event.wait, pygame.time.get_ticks = \
+            self.get, self.wait, self.get_ticks
+
+    def uninstall(self):
+        if self.originals:
+            pygame.event.get, pygame.event.wait, pygame.time.get_ticks = self.originals
+            self.originals = None
+
+    def elapsed(self):
+        return int((time.perf_counter() - self.start) * 1000)
+
+    def take(self, timeout=None):
+        # The next batch if it's due, waiting up to timeout ms for it in realtime mode
+        if self.next >= len(self.batches):
+            return []
+        ticks, events = self.batches[self.next]
+        if self.realtime:
+            delay = ticks - self.elapsed()
+            if timeout is not None:
+                if delay > timeout:
+                    time.sleep(timeout / 1000)
+                    return []
+                time.sleep(max(delay, 0) / 1000)
+            elif delay > 0:
+                return []
+        self.next += 1
+        self.ticks = ticks
+        return list(events)
+
+    def get(self, *args, **kwargs):
+        if self.pending:
+            events, self.pending = self.pending, []
+            return events
+        return self.take()
+
+    def wait(self, timeout=0):
+        events = self.pending or self.take(timeout or None)
+        if not events:
+            return pygame.event.Event(pygame.NOEVENT)
+        self.pending = events[1:]
+        return events[0]
+
+    def get_ticks(self):
+        return self.elapsed() if self.realtime else self.ticks
+
+
+def synthesize_drags(drags, merge_every=3, seed=0, step_ms=50):
+    # A session of dragging random elements from the table into the merge
+    # area, with a Merge click after every merge_every drops, in a window of
+    # elemental_coding's current size.
+    # Needs elemental_coding's layout, so it's imported here.
+    import elemental_coding as ec
+    rng = random.Random(seed)
+    cells = [(row, col) for row, symbols in enumerate(ec.PERIODIC_TABLE_LAYOUT)
+             for col, symbol in enumerate(symbols) if symbol in ec.ELEMENTS]
+    drop = ec.MERGE_AREA_RECT.center
+    batches = []
+    ticks = 0
+
+    def add(*events):
+        nonlocal ticks
+        ticks += step_ms
+        batches.append((ticks, list(events)))
+
+    add(pygame.event.Event(pygame.VIDEORESIZE, size=(ec.WIDTH, ec.HEIGHT),
+                           w=ec.WIDTH, h=ec.HEIGHT))
+    for i in range(drags):
+        x, y = ec.cell_position(*rng.choice(cells))
+        cell = (ec.TABLE_OFFSET_X + x + ec.CELL_SIZE // 2, y + ec.CELL_SIZE // 2)
+        add(pygame.event.Event(pygame.MOUSEMOTION, pos=cell, rel=(0, 0), buttons=(0, 0, 0)))
+        add(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=cell, button=1))
+        add(pygame.event.Event(pygame.MOUSEMOTION, pos=drop, rel=(0, 0), buttons=(1, 0, 0)))
+        add(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=drop, button=1))
+        if (i + 1) % merge_every == 0:
+            add(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=ec.MERGE_BUTTON.center, button=1))
+    add(pygame.event.Event(pygame.QUIT))
+    return batches
+
+
+def write_log(path, batches):
+    recorder = EventRecorder(path)
+    for ticks, events in batches:
+        recorder.write(ticks, events)
+    recorder.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Make a synthetic event log of element drags and merges, "
+                    "for elemental_coding.py --replay.")
+    parser.add_argument('output', help="event log to write")
+    parser.add_argument('--drags', type=int, default=10_000, help="number of drags")
+    parser.add_argument('--merge-every', type=int, default=3,
+                        help="click Merge after this many drops")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    batches = synthesize_drags(args.drags, args.merge_every, args.seed)
+    write_log(args.output, batches)
+    print(f"{sum(len(events) for _, events in batches)} events in {len(batches)} frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+from functools import lru_cache
+
+# Symbols that join the parts of a hydrate, e.g. CuSO4·5H2O
+HYDRATE_DOTS = '·•.*'
+CLOSING = {'(': ')', '[': ']'}
+
+
+def read_number(formula, pos):
+    # Read the digits starting at pos. Returns the number (or None) and the new position.
+    end = pos
+    while end < len(formula) and formula[end].isdigit():
+        end += 1
+    if end == pos:
+        return None, pos
+    return int(formula[pos:end]), end
+
+
+def parse_group(formula, pos, closing=None):
+    # Parse element symbols and bracketed groups until the closing bracket
+    # (or the end of this hydrate part). Returns the counts and the new position.
+    # Counts are kept in a plain dict of ints; making a Counter per atom was
+    # most of the cost of parsing a large catalog.
+    counts = {}
+    while pos < len(formula) and formula[pos] not in HYDRATE_DOTS:
+        char = formula[pos]
+        if char in ')]':
+            if char != closing:
+                raise ValueError(f"Unbalanced {char!r} in formula {formula!r}")
+            return counts, pos + 1
+        if char.isupper():
+            # An element symbol is a capital letter, maybe followed by a small one
+            end = pos + 2 if formula[pos + 1:pos + 2].islower() else pos + 1
+            symbol = formula[pos:end]
+            # Read the count inline; this is the hot path for big catalogs
+            pos = end
+            while pos < len(formula) and formula[pos].isdigit():
+                pos += 1
+            counts[symbol] = counts.get(symbol, 0) + (int(formula[end:pos]) if pos > end else 1)
+        elif char in CLOSING:
+            group, pos = parse_group(formula, pos + 1, CLOSING[char])
+            # Apply the count after the group, if there is one
+            count, pos = read_number(formula, pos)
+            for symbol, n in group.items():
+                counts[symbol] = counts.get(symbol, 0) + n * (count or 1)
+        elif char.isdigit():
+            raise ValueError(f"Count without an element in formula {formula!r}")
+        else:
+            raise ValueError(f"Unexpected {char!r} in formula {formula!r}")
+    if closing:
+        raise ValueError(f"Missing {closing!r} in formula {formula!r}")
+    return counts, pos
+
+
+@lru_cache(maxsize=None)
+def parse_formula(formula):
+    # Return the composition of a formula like 'Ca(OH)2' or 'CuSO4·5H2O'
+    # as sorted (element, count) pairs, the same form composition_key uses
+    counts = {}
+    pos = 0
+    while pos <= len(formula):
+        # Each hydrate part may start with a multiplier, e.g. the 5 in 5H2O
+        coefficient, pos = read_number(formula, pos)
+        part, pos = parse_group(formula, pos)
+        if not part:
+            raise ValueError(f"Empty part in formula {formula!r}")
+        for symbol, count in part.items():
+            counts[symbol] = counts.get(symbol, 0) + count * (coefficient or 1)
+        # Skip over the hydrate dot, if there is one
+        pos += 1
+    return tuple(sorted(counts.items()))
+
+
+def check_known_elements(symbols, where):
+    # Masses come from ELEMENTS, so every element must be in it
+    from periodic_core import ELEMENTS
+    missing = [symbol for symbol in symbols if symbol not in ELEMENTS]
+    if missing:
+        raise ValueError(f"No mass known for {', '.join(missing)} in {where}")
+
+
+@lru_cache(maxsize=None)
+def molar_mass(formula):
+    # Molar mass in g/mol, from the masses in ELEMENTS
+    from periodic_core import ELEMENTS
+    check_known_elements([symbol for symbol, _ in parse_formula(formula)],
+                         f"formula {formula!r}")
+    return sum(ELEMENTS[symbol].mass * count for symbol, count in parse_formula(formula))
+
+
+@lru_cache(maxsize=None)
+def mass_fractions(formula):
+    # Fraction of the molar mass contributed by each element, as sorted pairs
+    from periodic_core import ELEMENTS
+    total = molar_mass(formula)
+    return tuple((symbol, ELEMENTS[symbol].mass * count / total)
+                 for symbol, count in parse_formula(formula))
+
+
+def import_numpy():
+    # NumPy is only needed for the batch functions, and is slow to import,
+    # so load it on first use. Returns None if it isn't installed.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def composition_matrix(formulas, symbols=None):
+    # Needs NumPy. Build a matrix with one row per formula and one column per element symbol,
+    # holding how many atoms of that element the formula has.
+    # Returns the matrix and the list of symbols for its columns.
+    compositions = [parse_formula(formula) for formula in formulas]
+    if symbols is None:
+        symbols = sorted({symbol for composition in compositions for symbol, _ in composition})
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    np = import_numpy()
+    matrix = np.zeros((len(compositions), len(symbols)), dtype=np.int64)
+    for row, composition in enumerate(compositions):
+        for symbol, count in composition:
+            matrix[row, column[symbol]] = count
+    return matrix, symbols
+
+
+def molar_masses(formulas):
+    # Molar masses for a large batch of formulas.
+    # Each distinct formula is parsed once; with NumPy the masses come from
+    # one matrix product over the distinct formulas.
+    np = import_numpy()
+    if np is None:
+        return [molar_mass(formula) for formula in formulas]
+    from periodic_core import ELEMENTS
+    # Give each distinct formula an id, and note the id of every input formula
+    ids = {}
+    inverse = np.fromiter((ids.setdefault(formula, len(ids)) for formula in formulas),
+                          dtype=np.intp, count=len(formulas))
+    matrix, symbols = composition_matrix(list(ids))
+    check_known_elements(symbols, "the batch")
+    masses = np.array([ELEMENTS[symbol].mass for symbol in symbols])
+    return (matrix @ masses)[inverse]
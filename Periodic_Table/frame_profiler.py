@@ -0,0 +1,93 @@
+import csv
+import json
+import time
+from array import array
+
+# The parts of a frame that get timed, in the order they happen
+PHASES = ('events', 'table', 'merge_area', 'shells', 'info', 'search', 'overlays', 'display',
+          'tick')
+# Phases that are waiting rather than working
+WAIT_PHASES = ('tick',)
+
+
+class FrameProfiler:
+    # Times each phase of the last `capacity` frames into a preallocated ring
+    # buffer, so recording a frame doesn't build any lists or dicts
+
+    def __init__(self, capacity=600, phases=PHASES):
+        self.phases = phases
+        self.slots = {phase: i for i, phase in enumerate(phases)}
+        self.work_slots = [i for i, phase in enumerate(phases) if phase not in WAIT_PHASES]
+        self.capacity = capacity
+        # One row of phase times per frame, and when each frame started
+        self.times = array('d', bytes(8 * capacity * len(phases)))
+        self.starts = array('d', bytes(8 * capacity))
+        # Row of the frame being recorded, and how many rows hold finished frames
+        self.row = 0
+        self.count = 0
+        self.last = 0.0
+
+    def start_frame(self):
+        # Begin timing a frame; an unfinished frame is simply overwritten
+        self.last = time.perf_counter()
+        self.starts[self.row] = self.last
+        base = self.row * len(self.phases)
+        for i in range(len(self.phases)):
+            self.times[base + i] = 0.0
+
+    def mark(self, phase):
+        # Charge the time since the last mark to phase
+        now = time.perf_counter()
+        self.times[self.row * len(self.phases) + self.slots[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        # Keep this frame and move on to the next row
+        self.row = (self.row + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def frame_rows(self):
+        # Rows of finished frames, oldest first
+        first = (self.row - self.count) % self.capacity
+        return [(first + i) % self.capacity for i in range(self.count)]
+
+    def stats(self):
+        # Frames per second, and the 50th/95th/99th percentile of the time each
+        # frame spent working (everything but waiting for the next tick), in ms
+        rows = self.frame_rows()
+        if len(rows) < 2:
+            return None
+        width = len(self.phases)
+        work = sorted(sum(self.times[row * width + i] for i in self.work_slots) for row in rows)
+        fps = (len(rows) - 1) / max(self.starts[rows[-1]] - self.starts[rows[0]], 1e-9)
+        p50, p95, p99 = (work[min(len(work) - 1, len(work) * p // 100)] * 1000
+                         for p in (50, 95, 99))
+        return fps, p50, p95, p99
+
+    def dump(self, path):
+        # Write the recorded frames to a .json or .csv file, oldest first
+        width = len(self.phases)
+        frames = [[self.starts[row]] + [self.times[row * width + i] for i in range(width)]
+                  for row in self.frame_rows()]
+        columns = ['start'] + list(self.phases)
+        with open(path, 'w', newline='') as f:
+            if path.endswith('.csv'):
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(frames)
+            else:
+                json.dump({'units': 'seconds',
+                           'frames': [dict(zip(columns, frame)) for frame in frames]}, f)
+
+
+class NullProfiler:
+    # Stands in for FrameProfiler when profiling is off; every call does nothing
+
+    def start_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
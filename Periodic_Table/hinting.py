@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import Counter
+
+from periodic_core import build_compound_index
+
+
+class CompoundHints:
+    # Tracks which compounds can still be made as elements are dropped
+    # into the merge area, one element at a time.
+    #
+    # For every (element, n) there is a posting list of the compounds with at
+    # least n atoms of that element, stored as the bits of a Python int. The
+    # compounds still reachable are the AND of the posting lists for the
+    # counts dropped so far, so each drop costs a single AND.
+    #
+    # The posting lists take every compound to build, which is seconds for
+    # a huge catalog, so they're built by build() (or on a thread with
+    # build_in_background). Until then only complete() has answers; the
+    # counts dropped meanwhile are applied once the lists are ready.
+
+    def __init__(self, compounds):
+        self.compounds = compounds
+        # A compiled catalog (catalog.CompoundTable) already has its
+        # composition index; only a plain dict needs one built
+        self.index = getattr(compounds, 'index', None)
+        if self.index is None:
+            self.index = build_compound_index(compounds)
+        # Set once the posting lists are built
+        self.ready = False
+        self.building = None
+        self.reset()
+
+    def build(self, pause_every=None):
+        # Build the posting lists. With pause_every, let other threads run
+        # after that many compounds, so a background build doesn't hold up
+        # the frame loop.
+        formulas = []
+        size = (len(self.compounds) + 7) // 8
+        # Set the bits in bytearrays first; setting bits on an int one at a
+        # time would copy the whole int each time
+        postings = {}
+        for i, (compound, data) in enumerate(self.compounds.items()):
+            formulas.append(compound)
+            byte, bit = divmod(i, 8)
+            for symbol, count in Counter(data['elements']).items():
+                for n in range(1, count + 1):
+                    if (symbol, n) not in postings:
+                        postings[(symbol, n)] = bytearray(size)
+                    postings[(symbol, n)][byte] |= 1 << bit
+            if pause_every and i % pause_every == 0:
+                time.sleep(0)
+        self.formulas = formulas
+        self.postings = {key: int.from_bytes(bits, 'little') for key, bits in postings.items()}
+        self.symbols = {symbol for symbol, _ in self.postings}
+        self.all_compounds = (1 << len(formulas)) - 1
+        # Everything above is in place before anything reads it
+        self.ready = True
+        return self
+
+    def build_in_background(self):
+        # Build on a daemon thread; until it's done the reachable compounds are unknown
+        self.building = threading.Thread(target=self.build, args=(200,),
+                                         name="compound-hints", daemon=True)
+        self.building.start()
+        return self.building
+
+    def postings_ready(self):
+        # Whether the posting lists can be used; with no background build
+        # running, they're built now, the first time they're needed
+        if not self.ready and self.building is None:
+            self.build()
+        return self.ready
+
+    def reset(self):
+        # Start again with an empty merge area
+        self.counts = Counter()
+        # Worked out from counts when first needed, once the posting lists are ready
+        self.reachable = None
+
+    def narrowed(self):
+        # The bits of the reachable compounds, or None while the posting lists are being built
+        if self.reachable is None and self.postings_ready():
+            bits = self.all_compounds
+            for symbol, n in self.counts.items():
+                bits &= self.postings.get((symbol, n), 0)
+            self.reachable = bits
+        return self.reachable
+
+    def add(self, symbol, count=1):
+        # Narrow the reachable compounds down after dropping count more atoms
+        # of symbol. Compounds with at least n atoms of it are among those with
+        # at least n - 1, so only the list for the new total is needed.
+        self.counts[symbol] += count
+        if self.narrowed() is not None:
+            self.reachable &= self.postings.get((symbol, self.counts[symbol]), 0)
+
+    def complete(self):
+        # Compounds made of exactly the elements dropped so far
+        if not self.counts:
+            return ()
+        return self.index.get(tuple(sorted(self.counts.items())), ())
+
+    def reachable_count(self):
+        # How many compounds contain at least the elements dropped so far,
+        # or None while the posting lists are being built
+        bits = self.narrowed()
+        return None if bits is None else bits.bit_count()
+
+    def reachable_compounds(self, limit=None, skip=()):
+        # The reachable compounds, in catalog order, up to limit of them,
+        # leaving out any formulas in skip (none while the lists are being built)
+        bits = self.narrowed()
+        return [] if bits is None else self.compounds_in(bits, limit, skip)
+
+    def fitting(self, counts):
+        # Compounds that can be made out of counts ({symbol: n}) without
+        # needing more of any element than it has, in catalog order. A
+        # compound doesn't fit if it has more than counts[symbol] atoms of
+        # some symbol, which is one posting list per symbol to take out.
+        # None while the posting lists are being built, which decompose
+        # takes as every compound.
+        if not self.postings_ready():
+            return None
+        bits = self.all_compounds
+        for symbol in self.symbols:
+            bits &= ~self.postings.get((symbol, counts.get(symbol, 0) + 1), 0)
+        return self.compounds_in(bits)
+
+    def compounds_in(self, bits, limit=None, skip=()):
+        # The formulas of the compounds whose bits are set, in catalog order
+        skip = set(skip)
+        found = []
+        while bits and (limit is None or len(found) < limit):
+            # Take the lowest set bit
+            lowest = bits & -bits
+            formula = self.formulas[lowest.bit_length() - 1]
+            if formula not in skip:
+                found.append(formula)
+            bits ^= lowest
+        return found
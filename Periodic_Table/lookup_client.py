@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+
+from lookup_server import DEFAULT_HOST, DEFAULT_PORT
+
+# A client for lookup_server, and a load generator that reports the
+# throughput and latency it sees.
+
+
+async def open_connection(host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+    if path:
+        return await asyncio.open_unix_connection(path, limit=2 ** 20)
+    return await asyncio.open_connection(host, port, limit=2 ** 20)
+
+
+class LookupClient:
+    # Sends requests without waiting for earlier answers; the server answers
+    # each connection's requests in order, so answers are matched up by order
+    #
+    #   client = await LookupClient.connect(path='/tmp/lookup.sock')
+    #   await client.element('Na')  ->  ['Name: Sodium', ...]
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.waiting = deque()
+        self.next_id = 0
+        self.reading = asyncio.create_task(self.read_answers())
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        return cls(*await open_connection(host, port, path))
+
+    async def read_answers(self):
+        try:
+            while line := await self.reader.readline():
+                answer = json.loads(line)
+                future = self.waiting.popleft()
+                if 'error' in answer:
+                    future.set_exception(LookupError(answer['error']))
+                else:
+                    future.set_result(answer['result'])
+        finally:
+            # The server went away: fail whatever is still waiting
+            while self.waiting:
+                self.waiting.popleft().set_exception(ConnectionError("connection closed"))
+
+    async def request(self, op, **arguments):
+        # Raises LookupError with the server's message for a request it can't answer
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.append(future)
+        self.writer.write(json.dumps({'id': self.next_id, 'op': op, **arguments}).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def element(self, symbol):
+        return await self.request('element', symbol=symbol)
+
+    async def compound(self, formula):
+        return await self.request('compound', formula=formula)
+
+    async def check(self, elements):
+        # (formula, name) of the compound exactly these elements make, or (None, None)
+        result = await self.request('check', elements=elements)
+        return (result['formula'], result['name']) if result else (None, None)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.reading.cancel()
+
+
+def make_requests(count, seed=0, misses=0.05):
+    # count request lines, a random mix of the three ops over the catalog,
+    # with a fraction (misses) asking for symbols and formulas that don't exist
+    from periodic_core import ELEMENTS, COMPOUNDS
+    rng = random.Random(seed)
+    symbols, formulas = list(ELEMENTS), list(COMPOUNDS)
+    lines = []
+    for i in range(count):
+        op = rng.choice(('element', 'compound', 'check'))
+        if rng.random() < misses:
+            request = {'op': op, 'symbol': f"X{i}", 'formula': f"X{i}", 'elements': [f"X{i}"]}
+        elif op == 'element':
+            request = {'op': op, 'symbol': rng.choice(symbols)}
+        elif op == 'compound':
+            request = {'op': op, 'formula': rng.choice(formulas)}
+        else:
+            elements = list(COMPOUNDS[rng.choice(formulas)]['elements'])
+            rng.shuffle(elements)
+            request = {'op': op, 'elements': elements}
+        lines.append(json.dumps({'id': i, **request}).encode() + b'\n')
+    return lines
+
+
+async def drive_connection(lines, in_flight, latencies, address):
+    # Send lines over one connection, keeping at most in_flight unanswered,
+    # and record how long each took to come back
+    reader, writer = await open_connection(*address)
+    sent = deque()
+    room = asyncio.Semaphore(in_flight)
+    errors = 0
+
+    async def send():
+        for line in lines:
+            await room.acquire()
+            sent.append(time.perf_counter())
+            writer.write(line)
+            # Only wait on the socket when its buffer is filling up
+            if writer.transport.get_write_buffer_size() > 65536:
+                await writer.drain()
+
+    sending = asyncio.create_task(send())
+    for _ in lines:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        latencies.append(time.perf_counter() - sent.popleft())
+        room.release()
+        if b'"error"' in line:
+            errors += 1
+    await sending
+    writer.close()
+    await writer.wait_closed()
+    return errors
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_load(requests=100000, connections=8, in_flight=64, host=DEFAULT_HOST,
+                   port=DEFAULT_PORT, path=None, seed=0):
+    # Send requests spread over connections, and report throughput and latency (ms)
+    lines = make_requests(requests, seed)
+    latencies = []
+    address = (host, port, path)
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(drive_connection(lines[i::connections], in_flight,
+                                                     latencies, address)
+                                    for i in range(connections)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    report = {'requests': requests, 'seconds': seconds, 'requests_per_second': requests / seconds,
+              'errors': sum(errors)}
+    for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999)):
+        report[f"{name}_ms"] = percentile(latencies, fraction) * 1000
+    report['max_ms'] = latencies[-1] * 1000
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load a running lookup_server and report throughput and latency.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help="connect to a Unix socket instead of TCP")
+    parser.add_argument('--requests', type=int, default=100000, help="requests to send in all")
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--in-flight', type=int, default=64,
+                        help="most unanswered requests per connection")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    report = asyncio.run(run_load(args.requests, args.connections, args.in_flight,
+                                  args.host, args.port, args.unix, args.seed))
+    print(f"{report['requests']} requests in {report['seconds']:.2f} s over "
+          f"{args.connections} connections: {report['requests_per_second']:.0f} requests/s, "
+          f"{report['errors']} errors")
+    print(f"latency ms: p50 {report['p50_ms']:.2f}  p90 {report['p90_ms']:.2f}  "
+          f"p99 {report['p99_ms']:.2f}  p99.9 {report['p999_ms']:.2f}  max {report['max_ms']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+from collections import Counter, OrderedDict
+
+from periodic_core import (ELEMENTS, COMPOUNDS, show_element_info, show_compound_info,
+                           composition_key, check_compound)
+
+# Line-delimited JSON lookups for other tools, without the pygame app.
+#
+# Each request is one line of JSON, and gets one line back, in order:
+#   {"id": 1, "op": "element", "symbol": "Na"}       -> {"id": 1, "result": ["Name: Sodium", ...]}
+#   {"id": 2, "op": "compound", "formula": "NaCl"}   -> {"id": 2, "result": ["Name: ...", ...]}
+#   {"id": 3, "op": "check", "elements": ["Na", "Cl"]}  (or {"Na": 1, "Cl": 1})
+#       -> {"id": 3, "result": {"formula": "NaCl", "name": "Sodium Chloride"}}, or null
+# Anything that can't be answered gets {"id": ..., "error": "..."} instead.
+
+DEFAULT_HOST, DEFAULT_PORT = '127.0.0.1', 8765
+# Most answers kept, already encoded as JSON
+CACHE_SIZE = 65536
+# Most bytes read from a connection at once; its complete lines are answered together
+READ_SIZE = 65536
+# Longest request line accepted; a longer one gets an error and the connection is closed
+MAX_LINE = 8192
+# Chunks of lines waiting for the batcher; connections wait for room when it's full
+MAX_QUEUED = 256
+# Most lines answered in one batch
+BATCH_LINES = 4096
+
+
+def request_key(request):
+    # The cache key of a parsed request: its op and its argument, made
+    # canonical so that e.g. the same elements in another order share an answer
+    op = request.get('op')
+    if op == 'element':
+        return 'element', str(request.get('symbol'))
+    if op == 'compound':
+        return 'compound', str(request.get('formula'))
+    if op == 'check':
+        elements = request.get('elements')
+        if isinstance(elements, dict):
+            if not all(isinstance(n, int) and n > 0 for n in elements.values()):
+                raise ValueError("element counts must be positive integers")
+        elif not isinstance(elements, list):
+            raise ValueError("'elements' must be a list of symbols or {symbol: count}")
+        return 'check', composition_key(elements)
+    raise ValueError(f"unknown op {op!r}; use element, compound or check")
+
+
+def lookup(key):
+    # Answer one request key, as the JSON text of a response's result or error part
+    op, argument = key
+    if op == 'element':
+        if argument not in ELEMENTS:
+            return f'"error": {json.dumps(f"unknown element {argument!r}")}'
+        result = show_element_info(argument)
+    elif op == 'compound':
+        if argument not in COMPOUNDS:
+            return f'"error": {json.dumps(f"unknown compound {argument!r}")}'
+        result = show_compound_info(argument)
+    else:
+        formula, name = check_compound(dict(argument))
+        result = {'formula': formula, 'name': name} if formula else None
+    return f'"result": {json.dumps(result)}'
+
+
+class LookupBatcher:
+    # Answers chunks of request lines from every connection. Each turn takes
+    # all the chunks waiting (up to BATCH_LINES lines), parses them, looks up
+    # each distinct key that isn't cached once, then answers every chunk.
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.queue = asyncio.Queue(MAX_QUEUED)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.stats = Counter()
+
+    async def answer(self, lines):
+        # The response lines for a chunk of request lines, in order
+        future = asyncio.get_running_loop().create_future()
+        # Waits while the queue is full, which stops this connection reading more
+        await self.queue.put((lines, future))
+        return await future
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            count = len(batch[0][0])
+            while count < BATCH_LINES and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                count += len(batch[-1][0])
+            self.stats['batches'] += 1
+            self.stats['requests'] += count
+            for lines, future in batch:
+                if future.cancelled():
+                    continue
+                # A chunk that can't be answered fails on its own; the
+                # batcher has to keep going for every other connection
+                try:
+                    future.set_result(self.respond(lines))
+                except Exception as error:
+                    future.set_exception(error)
+
+    def respond(self, lines):
+        # Answer each line from the cache, looking up (and caching) what isn't there.
+        # Anything wrong with one line (even e.g. JSON nested too deep to parse,
+        # which raises RecursionError) is answered as an error for that line.
+        responses = []
+        for line in lines:
+            request_id = 'null'
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+                request_id = json.dumps(request.get('id'))
+                key = request_key(request)
+                body = self.cache.get(key)
+                if body is None:
+                    self.stats['misses'] += 1
+                    body = self.cache[key] = lookup(key)
+                    if len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+                else:
+                    self.stats['hits'] += 1
+                    self.cache.move_to_end(key)
+            except Exception as error:
+                self.stats['malformed'] += 1
+                responses.append('{"id": %s, "error": %s}\n' % (request_id, json.dumps(str(error))))
+                continue
+            responses.append('{"id": %s, %s}\n' % (request_id, body))
+        return ''.join(responses).encode()
+
+
+async def handle_connection(batcher, reader, writer):
+    # Answer a connection's lines a chunk at a time. The next chunk is only
+    # read once the last one's answers are written (and the client has taken
+    # them, if it's slow), so a client that sends faster than it reads just
+    # fills its socket buffer instead of the server's memory.
+    batcher.stats['connections'] += 1
+    pending = b''
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            lines = (pending + data).split(b'\n')
+            pending = lines.pop()
+            # Answer the lines before any that's too long, without parsing that one
+            too_long = next((i for i, line in enumerate(lines) if len(line) > MAX_LINE), None)
+            if too_long is not None:
+                del lines[too_long:]
+            lines = [line for line in lines if line.strip()]
+            if lines:
+                writer.write(await batcher.answer(lines))
+                await writer.drain()
+            if too_long is not None or len(pending) > MAX_LINE:
+                writer.write(b'{"id": null, "error": "request line too long"}\n')
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, path=None, cache_size=CACHE_SIZE,
+                ready=None):
+    # Serve lookups on a TCP port, or on a Unix socket at path, until cancelled.
+    # ready(batcher, server) is called once the socket is listening.
+    batcher = LookupBatcher(cache_size)
+    answering = asyncio.create_task(batcher.run())
+
+    async def connected(reader, writer):
+        await handle_connection(batcher, reader, writer)
+
+    if path:
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(connected, path, limit=READ_SIZE)
+    else:
+        server = await asyncio.start_server(connected, host, port, limit=READ_SIZE)
+    if ready:
+        ready(batcher, server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        answering.cancel()
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve element and compound lookups as line-delimited JSON.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"address (default {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"TCP port (default {DEFAULT_PORT})")
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                        help=f"answers kept in memory (default {CACHE_SIZE})")
+    args = parser.parse_args(argv)
+    stats = {}
+
+    def ready(batcher, server):
+        stats['batcher'] = batcher
+        where = args.unix or ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        # flush, so whoever started the server can wait for this line
+        print(f"listening on {where}", flush=True)
+
+    async def run():
+        # Stop the same way on SIGTERM as on Ctrl-C (where the platform allows it)
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                          asyncio.current_task().cancel)
+        except NotImplementedError:
+            pass
+        await serve(args.host, args.port, args.unix, args.cache_size, ready)
+
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    if 'batcher' in stats:
+        counts = stats['batcher'].stats
+        print(f"{counts['requests']} requests in {counts['batches']} batches "
+              f"from {counts['connections']} connections; "
+              f"cache {counts['hits']} hits, {counts['misses']} misses; "
+              f"{counts['malformed']} malformed requests")
+
+
+if __name__ == "__main__":
+    main()
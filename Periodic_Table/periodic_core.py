@@ -0,0 +1,154 @@
+import os
+import warnings
+from collections import Counter
+
+from catalog import load_catalog
+from element_table import ElementTable
+
+# Pastel colors for element groups
+ALKALI_METALS = (255, 204, 204)
+ALKALINE_EARTH_METALS = (255, 229, 204)
+TRANSITION_METALS = (255, 255, 204)
+POST_TRANSITION_METALS = (229, 255, 204)
+METALLOIDS = (204, 255, 204)
+NONMETALS = (204, 255, 229)
+HALOGENS = (204, 229, 255)
+NOBLE_GASES = (229, 204, 255)
+LANTHANIDES = (255, 204, 229)
+ACTINIDES = (255, 229, 204)
+
+# Group names used in the element data, and the color each group is drawn in
+GROUP_COLORS = {
+    'ALKALI_METALS': ALKALI_METALS,
+    'ALKALINE_EARTH_METALS': ALKALINE_EARTH_METALS,
+    'TRANSITION_METALS': TRANSITION_METALS,
+    'POST_TRANSITION_METALS': POST_TRANSITION_METALS,
+    'METALLOIDS': METALLOIDS,
+    'NONMETALS': NONMETALS,
+    'HALOGENS': HALOGENS,
+    'NOBLE_GASES': NOBLE_GASES,
+    'LANTHANIDES': LANTHANIDES,
+    'ACTINIDES': ACTINIDES,
+}
+
+# Element and compound data files (.json or .csv). Set PERIODIC_COMPOUNDS
+# to use another compound catalog, e.g. a large one for batch matching.
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+ELEMENTS_FILE = os.environ.get('PERIODIC_ELEMENTS', os.path.join(DATA_DIR, 'elements.json'))
+COMPOUNDS_FILE = os.environ.get('PERIODIC_COMPOUNDS', os.path.join(DATA_DIR, 'compounds.json'))
+
+# Load both through the memory mapped catalog cache (see catalog.py)
+element_data, COMPOUNDS = load_catalog(ELEMENTS_FILE, COMPOUNDS_FILE)
+
+# Define elements, stored column by column (see element_table.py)
+ELEMENTS = ElementTable({
+    symbol: {'name': data['name'], 'color': GROUP_COLORS[data['group']],
+             'atomic_number': data['atomic_number'], 'mass': data['mass'],
+             'electron_config': data['electron_config'], 'shells': data['shells']}
+    for symbol, data in element_data.items()
+})
+
+
+# Define the layout of the periodic table
+PERIODIC_TABLE_LAYOUT = [
+    ['H', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', '', 'He'],
+    ['Li', 'Be', '', '', '', '', '', '', '', '', '', '', 'B', 'C', 'N', 'O', 'F', 'Ne'],
+    ['Na', 'Mg', '', '', '', '', '', '', '', '', '', '', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar'],
+    ['K', 'Ca', 'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr'],
+    ['Rb', 'Sr', 'Y', 'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe'],
+    ['Cs', 'Ba', 'La', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn'],
+    ['Fr', 'Ra', 'Ac', 'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og'],
+    ['', '', '*', '', '', '', '', '', '', '', '', '', '', '', '', '', '', ''],
+    ['', '', '#', '', '', '', '', '', '', '', '', '', '', '', '', '', '', ''],
+    ['', '', '*La', 'Ce', 'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu', ''],
+    ['', '', '#Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm', 'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr', '']
+]
+
+
+def show_element_info(element):
+    # Get the information for the given element from the ELEMENTS table
+    info = ELEMENTS[element]
+    # Create a list of formatted strings with element information
+    lines = [
+        f"Name: {info.name}",
+        f"Atomic Number: {info.atomic_number}",
+        f"Mass: {info.mass:g}",
+        f"Electron Config: {info.electron_config}"
+    ]
+    # Return the list of information lines
+    return lines
+
+
+def show_compound_info(compound):
+    # Get the information for compound from the COMPOUNDS dictionary
+    info = COMPOUNDS[compound]
+    # Create a list of formatted strings with compound information
+    lines = [
+        f"Name: {info['name']}",
+        f"Formula: {compound}",
+        f"Uses: {info['uses']}",
+        f"Properties: {info['properties']}"
+    ]
+    # Add the molar mass when every element's mass is known
+    # (molar_mass is memoized, so this is only worked out once per compound;
+    # formula is imported here, as it isn't needed to start up)
+    from formula import molar_mass
+    try:
+        lines.insert(2, f"Molar Mass: {molar_mass(compound):.3f} g/mol")
+    except ValueError:
+        pass
+    # Return the list of information lines
+    return lines
+
+
+def composition_key(elements):
+    # Count each element and sort the (element, count) pairs,
+    # so the key is the same no matter what order the elements came in.
+    # elements can also be {element: count} already, such as the merge area,
+    # which costs one step per element rather than per atom.
+    return tuple(sorted(Counter(elements).items()))
+
+
+def build_compound_index(compounds):
+    # Map each composition key to every compound formula that has it
+    index = {}
+    for compound, data in compounds.items():
+        index.setdefault(composition_key(data['elements']), []).append(compound)
+    # Store the matches as tuples so callers can't change the index
+    return {key: tuple(matches) for key, matches in index.items()}
+
+
+def find_compounds(elements, index=None):
+    # Use the index for the built-in COMPOUNDS unless another one is given
+    if index is None:
+        index = COMPOUND_INDEX
+    # Look up every compound (including isomers) with this exact composition
+    return index.get(composition_key(elements), ())
+
+
+def check_compound(elements):
+    # Find all compounds made of exactly these elements, given as a list
+    # or as {element: count} (the input is left untouched)
+    matches = find_compounds(elements)
+    if matches:
+        # Return the first matching compound formula and its name
+        return matches[0], COMPOUNDS[matches[0]]['name']
+    # If no match is found, return None for both compound and name
+    return None, None
+
+
+# The catalog cache already holds COMPOUNDS indexed by composition,
+# so lookups don't need an index built at startup
+COMPOUND_INDEX = COMPOUNDS.index
+
+# Make sure each compound's element list agrees with its formula
+# (checked once, when the cache was built; None where the formula doesn't parse)
+FORMULA_MISMATCHES = COMPOUNDS.mismatches
+if FORMULA_MISMATCHES:
+    unparsed = [formula for formula, (_, parsed) in FORMULA_MISMATCHES.items() if parsed is None]
+    if unparsed:
+        warnings.warn("Formulas that can't be parsed: " + ", ".join(unparsed))
+    if len(unparsed) < len(FORMULA_MISMATCHES):
+        warnings.warn("Element lists don't match their formulas for "
+                      + ", ".join(formula for formula, (_, parsed) in FORMULA_MISMATCHES.items()
+                                  if parsed is not None))
@@ -0,0 +1,222 @@
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from heapq import heappush, heapreplace
+
+# Words are runs of letters and digits, compared in lower case
+WORD = re.compile(r'\w+')
+# Sorts after every word with the same start, for finding a prefix's range
+PREFIX_END = '\U0010ffff'
+# How close a word must be to count as a fuzzy match: the share of the
+# query's trigrams it has to contain
+FUZZY_THRESHOLD = 0.5
+# Scores for each kind of match, used to rank queries with several words
+EXACT_STRONG, PREFIX_STRONG, EXACT_WEAK, PREFIX_WEAK, FUZZY = 4, 3, 2, 1, 0.5
+
+
+def words(text):
+    return WORD.findall(text.lower())
+
+
+def trigrams(word):
+    # The word's three letter pieces, with its start and end marked
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    # Inverted index over element and compound text.
+    #
+    # Each word maps to two posting lists of entry ids: entries with the word in
+    # a strong field (symbol, formula or name), and entries with it only in a
+    # weak field (uses, properties, electron configuration). Ids go up in the
+    # order entries were added, so elements come before compounds. Prefixes are
+    # found by binary search over the sorted words, and misspellings through
+    # a trigram index of the words.
+
+    def __init__(self):
+        # (kind, key) for every entry, e.g. ('element', 'Na') or ('compound', 'NaCl')
+        self.entries = []
+        self.strong = {}
+        self.weak = {}
+        # Filled in by finish()
+        self.vocabulary = []
+        self.trigram_words = {}
+        # Set once the index can be searched
+        self.ready = False
+
+    def add(self, kind, key, strong_text, weak_text):
+        # Index one entry
+        entry = len(self.entries)
+        self.entries.append((kind, key))
+        strong = set(words(' '.join(strong_text)))
+        for word in strong:
+            postings = self.strong.get(word)
+            if postings is None:
+                postings = self.strong[word] = array('I')
+            postings.append(entry)
+        for word in set(words(' '.join(weak_text))) - strong:
+            postings = self.weak.get(word)
+            if postings is None:
+                postings = self.weak[word] = array('I')
+            postings.append(entry)
+
+    def add_catalog(self, elements, compounds, pause_every=None):
+        # Index every element and compound. With pause_every, let other
+        # threads run after that many entries, so a background build doesn't
+        # hold up the frame loop.
+        for symbol in elements:
+            info = elements[symbol]
+            self.add('element', symbol, (symbol, info['name']), (info['electron_config'],))
+        for i, (formula, info) in enumerate(compounds.items()):
+            self.add('compound', formula, (formula, info['name']),
+                     (info['uses'], info['properties']))
+            if pause_every and i % pause_every == 0:
+                time.sleep(0)
+
+    def finish(self):
+        # Sort the words for prefix search and index their trigrams
+        self.vocabulary = sorted(self.strong.keys() | self.weak.keys())
+        trigram_words = {}
+        for i, word in enumerate(self.vocabulary):
+            # Only words of letters are worth matching loosely; formulas and
+            # numbers would just add noise (and a lot of postings)
+            if len(word) >= 3 and word.isalpha():
+                for gram in trigrams(word):
+                    trigram_words.setdefault(gram, array('I')).append(i)
+        self.trigram_words = trigram_words
+        self.ready = True
+
+    def build(self, elements, compounds, pause_every=None):
+        self.add_catalog(elements, compounds, pause_every)
+        self.finish()
+        return self
+
+    def build_in_background(self, elements, compounds):
+        # Build on a daemon thread; search() returns nothing until it's done
+        thread = threading.Thread(target=self.build, args=(elements, compounds, 200),
+                                  name="search-index", daemon=True)
+        thread.start()
+        return thread
+
+    def prefixed(self, word):
+        # Words that start with word, not counting word itself
+        start = bisect_left(self.vocabulary, word)
+        end = bisect_left(self.vocabulary, word + PREFIX_END)
+        if start < end and self.vocabulary[start] == word:
+            start += 1
+        return (self.vocabulary[i] for i in range(start, end))
+
+    def similar(self, word):
+        # Words sharing most of word's trigrams, closest first
+        grams = trigrams(word)
+        shared = {}
+        for gram in grams:
+            for i in self.trigram_words.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        needed = FUZZY_THRESHOLD * len(grams)
+        close = sorted((-count, i) for i, count in shared.items() if count >= needed)
+        return [self.vocabulary[i] for _, i in close]
+
+    def tiers(self, word):
+        # Posting lists for one query word, best matches first, with their scores
+        yield EXACT_STRONG, self.strong.get(word, ())
+        for other in self.prefixed(word):
+            yield PREFIX_STRONG, self.strong.get(other, ())
+        yield EXACT_WEAK, self.weak.get(word, ())
+        for other in self.prefixed(word):
+            yield PREFIX_WEAK, self.weak.get(other, ())
+
+    def fuzzy_tiers(self, word):
+        # Posting lists for misspellings of word, strong fields first
+        close = self.similar(word)
+        for postings in (self.strong, self.weak):
+            for other in close:
+                yield FUZZY, postings.get(other, ())
+
+    def search(self, query, limit=10):
+        # Return up to limit (kind, key) pairs for the best matches.
+        # Every word of the query must match; each word also matches words it
+        # starts ("Sod" finds Sodium), and "*" may be used to say so ("fertil*").
+        # A word with no exact or prefix match falls back to similar spellings.
+        query_words = words(query)
+        if not self.ready or not query_words:
+            return []
+        if len(query_words) == 1:
+            return self.search_word(query_words[0], limit)
+        return self.search_words(query_words, limit)
+
+    def search_word(self, word, limit):
+        # Only look for misspellings if nothing matches as typed
+        return (self.collect(self.tiers(word), limit)
+                or self.collect(self.fuzzy_tiers(word), limit))
+
+    def collect(self, tiers, limit):
+        # The posting lists come best first, so stop as soon as there are enough
+        found = []
+        seen = set()
+        for _, postings in tiers:
+            for entry in postings:
+                if entry not in seen:
+                    seen.add(entry)
+                    found.append(self.entries[entry])
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def search_words(self, query_words, limit):
+        # Entries matching every word, ranked by the sum of their best score for each.
+        # Walk the posting lists of the word with the fewest matches, best first,
+        # and look each entry up in the other words' lists. Stop once even a
+        # best-case entry still to come couldn't beat the limit-th best so far
+        # (equal scores keep the order they were found in).
+        word_tiers = []
+        for word in query_words:
+            tiers = ([tier for tier in self.tiers(word) if tier[1]]
+                     or [tier for tier in self.fuzzy_tiers(word) if tier[1]])
+            if not tiers:
+                return []
+            word_tiers.append(tiers)
+        word_tiers.sort(key=lambda tiers: sum(len(postings) for _, postings in tiers))
+        walked, others = word_tiers[0], word_tiers[1:]
+        best_others = sum(tiers[0][0] for tiers in others)
+
+        totals = {}
+        # The best limit totals so far, smallest first
+        top = []
+        seen = set()
+        for score, postings in walked:
+            if len(top) == limit and score + best_others <= top[0]:
+                break
+            for entry in postings:
+                if entry in seen:
+                    continue
+                seen.add(entry)
+                total = score
+                for tiers in others:
+                    other = score_of(entry, tiers)
+                    if other is None:
+                        break
+                    total += other
+                else:
+                    totals[entry] = total
+                    if len(top) < limit:
+                        heappush(top, total)
+                    elif total > top[0]:
+                        heapreplace(top, total)
+                    if len(top) == limit and score + best_others <= top[0]:
+                        break
+        best = sorted(totals, key=lambda entry: (-totals[entry], entry))[:limit]
+        return [self.entries[entry] for entry in best]
+
+
+def score_of(entry, tiers):
+    # Score of the first (best) posting list in tiers holding entry, or None.
+    # Posting lists are sorted, so each check is a binary search.
+    for score, postings in tiers:
+        i = bisect_left(postings, entry)
+        if i < len(postings) and postings[i] == entry:
+            return score
+    return None